@@ -0,0 +1,107 @@
+"""partition_price_points
+
+Revision ID: 5498bb7dfbd8
+Revises: 54fb92fca11c
+Create Date: 2026-10-18 14:12:05.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5498bb7dfbd8'
+down_revision: Union[str, None] = '54fb92fca11c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Monthly partitions from the oldest stored point to three months ahead, named
+# and bounded like app.db.partitions.month_partition
+CREATE_MONTHLY_PARTITIONS = """
+DO $$
+DECLARE
+    month timestamp;
+    last_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months';
+BEGIN
+    SELECT date_trunc('month', to_timestamp(min(timestamp) / 1000.0) AT TIME ZONE 'UTC')
+    INTO month FROM price_points_unpartitioned;
+    month := least(coalesce(month, last_month), date_trunc('month', now() AT TIME ZONE 'UTC'));
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE price_points_p%s PARTITION OF price_points FOR VALUES FROM (%s) TO (%s)',
+            to_char(month, 'YYYYMM'),
+            (extract(epoch FROM month) * 1000)::bigint,
+            (extract(epoch FROM month + interval '1 month') * 1000)::bigint
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END $$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table('price_points', 'price_points_unpartitioned')
+    op.drop_index('ix_price_points_id', table_name='price_points_unpartitioned')
+    op.drop_constraint('uq_price_points_asset_currency_timestamp', 'price_points_unpartitioned', type_='unique')
+
+    op.create_table('price_points',
+    sa.Column('asset', sa.String(length=64), server_default='bitcoin', nullable=False),
+    sa.Column('currency', sa.String(length=16), server_default='usd', nullable=False),
+    sa.Column('timestamp', sa.BigInteger(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('asset', 'currency', 'timestamp', name='pk_price_points', postgresql_include=['price']),
+    postgresql_partition_by='RANGE (timestamp)'
+    )
+    op.create_index('ix_price_points_timestamp_brin', 'price_points', ['timestamp'], unique=False, postgresql_using='brin')
+    op.execute('CREATE TABLE price_points_default PARTITION OF price_points DEFAULT')
+    op.execute(CREATE_MONTHLY_PARTITIONS)
+
+    op.execute(
+        'INSERT INTO price_points (asset, currency, timestamp, price, created_at) '
+        'SELECT asset, currency, timestamp, price, created_at FROM price_points_unpartitioned'
+    )
+    op.drop_table('price_points_unpartitioned')
+
+    op.create_table('price_candles',
+    sa.Column('asset', sa.String(length=64), nullable=False),
+    sa.Column('currency', sa.String(length=16), nullable=False),
+    sa.Column('interval_ms', sa.BigInteger(), nullable=False),
+    sa.Column('timestamp', sa.BigInteger(), nullable=False),
+    sa.Column('open', sa.Float(), nullable=False),
+    sa.Column('high', sa.Float(), nullable=False),
+    sa.Column('low', sa.Float(), nullable=False),
+    sa.Column('close', sa.Float(), nullable=False),
+    sa.Column('average', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('asset', 'currency', 'interval_ms', 'timestamp', name='pk_price_candles')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('price_candles')
+
+    op.rename_table('price_points', 'price_points_partitioned')
+    op.create_table('price_points',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('asset', sa.String(length=64), server_default='bitcoin', nullable=False),
+    sa.Column('currency', sa.String(length=16), server_default='usd', nullable=False),
+    sa.Column('timestamp', sa.BigInteger(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('asset', 'currency', 'timestamp', name='uq_price_points_asset_currency_timestamp')
+    )
+    op.create_index('ix_price_points_id', 'price_points', ['id'], unique=False)
+    op.execute(
+        'INSERT INTO price_points (asset, currency, timestamp, price, created_at) '
+        'SELECT asset, currency, timestamp, price, created_at FROM price_points_partitioned '
+        'ORDER BY timestamp'
+    )
+    # Drops every partition with it
+    op.drop_table('price_points_partitioned')
@@ -0,0 +1,46 @@
+"""add_asset_and_currency
+
+Revision ID: 54fb92fca11c
+Revises: 5a84fbc4b2c3
+Create Date: 2026-10-18 11:03:27.540218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '54fb92fca11c'
+down_revision: Union[str, None] = '5a84fbc4b2c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows are all bitcoin/usd, which the server defaults fill in
+    op.add_column('price_points', sa.Column('asset', sa.String(length=64), server_default='bitcoin', nullable=False))
+    op.add_column('price_points', sa.Column('currency', sa.String(length=16), server_default='usd', nullable=False))
+    op.drop_constraint('price_points_timestamp_key', 'price_points', type_='unique')
+    op.create_unique_constraint('uq_price_points_asset_currency_timestamp', 'price_points', ['asset', 'currency', 'timestamp'])
+
+    op.add_column('price_coverage', sa.Column('asset', sa.String(length=64), server_default='bitcoin', nullable=False))
+    op.add_column('price_coverage', sa.Column('currency', sa.String(length=16), server_default='usd', nullable=False))
+    op.drop_index('ix_price_coverage_range', table_name='price_coverage')
+    op.create_index('ix_price_coverage_range', 'price_coverage', ['asset', 'currency', 'granularity_ms', 'from_timestamp', 'to_timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_price_coverage_range', table_name='price_coverage')
+    op.create_index('ix_price_coverage_range', 'price_coverage', ['granularity_ms', 'from_timestamp', 'to_timestamp'], unique=False)
+    op.drop_column('price_coverage', 'currency')
+    op.drop_column('price_coverage', 'asset')
+
+    op.execute("DELETE FROM price_points WHERE asset <> 'bitcoin' OR currency <> 'usd'")
+    op.drop_constraint('uq_price_points_asset_currency_timestamp', 'price_points', type_='unique')
+    op.create_unique_constraint('price_points_timestamp_key', 'price_points', ['timestamp'])
+    op.drop_column('price_points', 'currency')
+    op.drop_column('price_points', 'asset')
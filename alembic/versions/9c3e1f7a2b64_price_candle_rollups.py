@@ -0,0 +1,101 @@
+"""price_candle_rollups
+
+Revision ID: 9c3e1f7a2b64
+Revises: 5498bb7dfbd8
+Create Date: 2026-10-18 16:40:27.512093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e1f7a2b64'
+down_revision: Union[str, None] = '5498bb7dfbd8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Partitions app.db.partitions.compact_partition thinned out to one point an hour
+COMPACTED_PARTITIONS = """
+SELECT objoid FROM pg_description
+WHERE classoid = 'pg_class'::regclass AND objsubid = 0 AND description = 'compacted'
+"""
+
+# Compacted months only have the hourly candles written when they were
+# thinned, so their daily candles are built from those. Runs first, while
+# those are the only candles in the table
+BUILD_DAILY_FROM_HOURLY = """
+INSERT INTO price_candles (
+    asset, currency, interval_ms, timestamp, open, high, low, close,
+    open_timestamp, close_timestamp, price_sum, count
+)
+SELECT
+    asset, currency, 86400000, timestamp - timestamp % 86400000,
+    (array_agg(open ORDER BY open_timestamp))[1],
+    max(high),
+    min(low),
+    (array_agg(close ORDER BY close_timestamp DESC))[1],
+    min(open_timestamp),
+    max(close_timestamp),
+    sum(price_sum),
+    sum(count)
+FROM price_candles
+WHERE interval_ms = 3600000
+GROUP BY asset, currency, timestamp - timestamp % 86400000
+ON CONFLICT ON CONSTRAINT pk_price_candles DO NOTHING
+"""
+
+# Same aggregates as app.db.repository.insert_with_rollups, over the months
+# that still hold every point. Minute candles of compacted months cannot be
+# rebuilt and are left out
+BUILD_ROLLUPS = f"""
+INSERT INTO price_candles (
+    asset, currency, interval_ms, timestamp, open, high, low, close,
+    open_timestamp, close_timestamp, price_sum, count
+)
+SELECT
+    asset, currency, interval_ms, timestamp - timestamp % interval_ms,
+    (array_agg(price ORDER BY timestamp))[1],
+    max(price),
+    min(price),
+    (array_agg(price ORDER BY timestamp DESC))[1],
+    min(timestamp),
+    max(timestamp),
+    sum(price),
+    count(*)
+FROM price_points
+CROSS JOIN (VALUES (60000::bigint), (3600000), (86400000)) AS rollups (interval_ms)
+WHERE price_points.tableoid NOT IN ({COMPACTED_PARTITIONS})
+GROUP BY asset, currency, interval_ms, timestamp - timestamp % interval_ms
+ON CONFLICT ON CONSTRAINT pk_price_candles DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('price_candles', sa.Column('open_timestamp', sa.BigInteger(), nullable=True))
+    op.add_column('price_candles', sa.Column('close_timestamp', sa.BigInteger(), nullable=True))
+    op.add_column('price_candles', sa.Column('price_sum', sa.Float(), nullable=True))
+    op.execute(
+        'UPDATE price_candles SET open_timestamp = timestamp, '
+        'close_timestamp = timestamp + interval_ms - 1, price_sum = average * count'
+    )
+    op.alter_column('price_candles', 'open_timestamp', nullable=False)
+    op.alter_column('price_candles', 'close_timestamp', nullable=False)
+    op.alter_column('price_candles', 'price_sum', nullable=False)
+    op.drop_column('price_candles', 'average')
+    op.execute(BUILD_DAILY_FROM_HOURLY)
+    op.execute(BUILD_ROLLUPS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('price_candles', sa.Column('average', sa.Float(), nullable=True))
+    op.execute('UPDATE price_candles SET average = price_sum / count')
+    op.alter_column('price_candles', 'average', nullable=False)
+    op.drop_column('price_candles', 'price_sum')
+    op.drop_column('price_candles', 'close_timestamp')
+    op.drop_column('price_candles', 'open_timestamp')
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.api.routes.price import _json_response
+from app.db.session import get_async_db
+from app.services.analytics_service import AnalyticsService
+from app.schemas.price import AnalyticsParams, AnalyticsResponse
+
+router = APIRouter(prefix="/api/v1", tags=["analytics"])
+
+
+@router.get("/analytics/{indicator}", response_model=AnalyticsResponse)
+async def get_indicator(
+    request: Request,
+    indicator: str,
+    from_timestamp: int,
+    to_timestamp: int,
+    window: int = 20,
+    interval: Optional[str] = None,
+    max_points: Optional[int] = None,
+    asset: str = "bitcoin",
+    currency: str = "usd",
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """
+    Get an indicator of one asset's price for a specific range
+
+    Computed from the close of each interval, so clients do not need the
+    full price history.
+
+    **Parameters:**
+    - **indicator**: `log_return`, `sma`, `ema`, `volatility` (sample standard
+      deviation of the last `window` log returns) or `drawdown` (fall from the
+      highest close of the last `window` intervals)
+    - **from_timestamp**: Start time in seconds (Unix timestamp)
+    - **to_timestamp**: End time in seconds (Unix timestamp)
+    - **window**: Intervals the indicator looks back over, 20 by default
+    - **interval**: Interval width (1m, 5m, 15m, 30m, 1h, 2h, 4h, 6h, 12h, 1d, 1w),
+      `1h` unless max_points picks one
+    - **max_points**: Optional upper bound on returned values, picks the interval
+    - **asset**: CoinGecko coin id, `bitcoin` by default
+    - **currency**: Quote currency, `usd` by default
+
+    **Returns:** One value per interval start in milliseconds, newest first;
+    `null` until the window has enough history. Responses carry an ETag like
+    `/price-history`.
+    """
+    try:
+        params = AnalyticsParams(
+            indicator=indicator,
+            from_timestamp=from_timestamp,
+            to_timestamp=to_timestamp,
+            window=window,
+            interval=interval,
+            max_points=max_points,
+            asset=asset,
+            currency=currency,
+        )
+
+        analytics_service = AnalyticsService(db)
+        body = await analytics_service.get_indicator_json(
+            params.indicator,
+            params.from_timestamp,
+            params.to_timestamp,
+            params.window,
+            interval=params.interval,
+            max_points=params.max_points,
+            asset=params.asset,
+            currency=params.currency,
+        )
+        return _json_response(request, body)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
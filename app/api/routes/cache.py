@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+from app.cache.local_cache import get_local_cache
+from app.cache.redis_cache import redis_stats
+
+router = APIRouter(prefix="/api/v1", tags=["cache"])
+
+
+@router.get("/cache-stats")
+async def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit and miss counters of both cache tiers in this worker process
+
+    - **l1**: in-process cache, with evictions, replayed upstream errors and size
+    - **redis**: lookups that missed L1 and went to Redis
+    """
+    return {"l1": get_local_cache().info(), "redis": redis_stats.as_dict()}
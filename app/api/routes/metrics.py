@@ -0,0 +1,29 @@
+import os
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from app.core.metrics import StateCollector
+
+router = APIRouter(tags=["metrics"])
+
+
+def _registry() -> CollectorRegistry:
+    """Metrics of every worker when several share PROMETHEUS_MULTIPROC_DIR"""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    # Pool and cache state is only known to the worker answering
+    registry.register(StateCollector())
+    return registry
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Prometheus metrics in the text exposition format"""
+    return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
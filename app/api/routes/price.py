@@ -1,35 +1,186 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Dict, Any
-from app.db.session import get_db
-from app.services.price_service import PriceService
+import hashlib
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from typing import Dict, Any, Optional
+from app.cache.redis_cache import RedisCache
+from app.core.config import get_settings
+from app.core.exceptions import CircuitOpenError, CoinGeckoRateLimitError
+from app.db.session import get_async_db, get_async_session_factory
+from app.services.price_service import PriceService, current_price_cache_key
+from app.services.price_stream import get_price_broadcaster, stream_events
+from app.services.export_service import EXPORT_FORMATS, stream_price_export
 from app.schemas.price import (
     CurrentPriceResponse,
+    CurrentPricesParams,
+    CurrentPricesResponse,
     PriceHistoryRangeParams,
     PriceHistoryResponse,
+    validate_symbol,
 )
 
+settings = get_settings()
 router = APIRouter(prefix="/api/v1", tags=["prices"])
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _json_response(request: Request, body: bytes) -> Response:
+    """Send an encoded JSON body as is, or 304 when the client already has it"""
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/current-price", response_model=CurrentPriceResponse)
-async def get_current_price(db: Session = Depends(get_db)) -> CurrentPriceResponse:
-    """Get current Bitcoin price"""
+async def get_current_price(
+    asset: str = "bitcoin",
+    currency: str = "usd",
+    db: AsyncSession = Depends(get_async_db),
+    session_factory: async_sessionmaker = Depends(get_async_session_factory),
+) -> CurrentPriceResponse:
+    """Get current price of one asset, Bitcoin in USD by default
+
+    While CoinGecko is failing, the latest stored price is served with `stale` set.
+    """
     try:
-        price_service = PriceService(db)
-        return await price_service.get_current_price()
+        asset = validate_symbol(asset, "asset")
+        currency = validate_symbol(currency, "currency")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        price_service = PriceService(db, session_factory)
+        return await price_service.get_current_price(asset, currency)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (CoinGeckoRateLimitError, CircuitOpenError):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch current price: {str(e)}"
         )
 
 
-@router.get("/price-history", response_model=PriceHistoryResponse)
+@router.get("/current-prices", response_model=CurrentPricesResponse)
+async def get_current_prices(
+    assets: str = "bitcoin",
+    currencies: str = "usd",
+    db: AsyncSession = Depends(get_async_db),
+    session_factory: async_sessionmaker = Depends(get_async_session_factory),
+) -> CurrentPricesResponse:
+    """
+    Get current prices for several assets and currencies
+
+    **Parameters:**
+    - **assets**: Comma separated CoinGecko coin ids, e.g. `bitcoin,ethereum`
+    - **currencies**: Comma separated currencies, e.g. `usd,eur`
+
+    **Returns:** One price per asset/currency pair. Cache misses are filled with
+    a single upstream request; pairs CoinGecko does not know are left out.
+    """
+    try:
+        params = CurrentPricesParams(assets=assets, currencies=currencies)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        price_service = PriceService(db, session_factory)
+        return CurrentPricesResponse(
+            prices=await price_service.get_current_prices(
+                params.assets, params.currencies
+            )
+        )
+    except (CoinGeckoRateLimitError, CircuitOpenError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to fetch current prices: {str(e)}"
+        )
+
+
+@router.get("/price-stream")
+async def stream_prices(
+    assets: str = "bitcoin", currencies: str = "usd"
+) -> StreamingResponse:
+    """
+    Stream current prices as Server-Sent Events instead of polling
+
+    **Parameters:**
+    - **assets**: Comma separated CoinGecko coin ids, e.g. `bitcoin,ethereum`
+    - **currencies**: Comma separated currencies, e.g. `usd,eur`
+
+    **Returns:** A `text/event-stream` with a `price` event holding the
+    current price of each pair, then one whenever a price changes. Clients
+    that fall behind get a `dropped` event and are disconnected; reconnecting
+    starts again from the current prices.
+    """
+    try:
+        params = CurrentPricesParams(assets=assets, currencies=currencies)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pairs = [(a, c) for a in params.assets for c in params.currencies]
+    if len(pairs) > settings.PRICE_STREAM_MAX_PAIRS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"at most {settings.PRICE_STREAM_MAX_PAIRS} asset and currency "
+            "pairs can be streamed at once",
+        )
+
+    broadcaster = get_price_broadcaster()
+    # Pairs without an update in this worker yet start from the cache. Done
+    # before subscribing, so they are part of the client's first event
+    missing = [pair for pair in pairs if pair not in broadcaster.latest]
+    if missing:
+        cached = await RedisCache().get_many(
+            [current_price_cache_key(*pair) for pair in missing]
+        )
+        for (asset, currency), data in zip(missing, cached):
+            if data:
+                current = CurrentPriceResponse(**data).model_dump()
+                broadcaster.publish({"asset": asset, "currency": currency, **current})
+
+    subscription = broadcaster.subscribe(pairs)
+    if subscription is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many price stream subscribers",
+            headers={"Retry-After": "5"},
+        )
+
+    return StreamingResponse(
+        stream_events(broadcaster, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/price-history",
+    response_model=PriceHistoryResponse,
+    response_model_exclude_none=True,
+)
 async def get_price_history_range(
-    from_timestamp: int, to_timestamp: int, db: Session = Depends(get_db)
-) -> PriceHistoryResponse:
+    request: Request,
+    from_timestamp: int,
+    to_timestamp: int,
+    interval: Optional[str] = None,
+    max_points: Optional[int] = None,
+    asset: str = "bitcoin",
+    currency: str = "usd",
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
     """
-    Get Bitcoin price history for specific range
+    Get price history of one asset for specific range
 
     **Important**: Query parameters use **seconds** (Unix timestamp).
     **Note**: Responses return timestamps in **milliseconds** for precision.
@@ -37,18 +188,97 @@ async def get_price_history_range(
     **Parameters:**
     - **from_timestamp**: Start time in seconds (Unix timestamp)
     - **to_timestamp**: End time in seconds (Unix timestamp)
+    - **interval**: Optional candle width (1m, 5m, 15m, 30m, 1h, 2h, 4h, 6h, 12h, 1d, 1w)
+    - **max_points**: Optional upper bound on returned points, picks the interval
+    - **asset**: CoinGecko coin id, `bitcoin` by default
+    - **currency**: Quote currency, `usd` by default
 
     **Returns:** Price data with timestamps in milliseconds, ordered newest first.
+    When downsampled, each point is a bucket average and `candles` holds OHLC
+    per bucket, keyed by bucket start. Responses carry an ETag; send it back
+    in `If-None-Match` to get a 304 while the range is unchanged.
     """
     try:
         params = PriceHistoryRangeParams(
-            from_timestamp=from_timestamp, to_timestamp=to_timestamp
+            from_timestamp=from_timestamp,
+            to_timestamp=to_timestamp,
+            interval=interval,
+            max_points=max_points,
+            asset=asset,
+            currency=currency,
         )
 
         price_service = PriceService(db)
-        return await price_service.get_price_history_range(
-            params.from_timestamp, params.to_timestamp
+        body = await price_service.get_price_history_json(
+            params.from_timestamp,
+            params.to_timestamp,
+            interval=params.interval,
+            max_points=params.max_points,
+            asset=params.asset,
+            currency=params.currency,
         )
+        return _json_response(request, body)
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/price-history/export")
+async def export_price_history(
+    from_timestamp: int,
+    to_timestamp: int,
+    format: str = "ndjson",
+    asset: str = "bitcoin",
+    currency: str = "usd",
+    db: AsyncSession = Depends(get_async_db),
+    session_factory: async_sessionmaker = Depends(get_async_session_factory),
+) -> StreamingResponse:
+    """
+    Stream price history of one asset for a range as NDJSON or CSV
+
+    Rows are read through a server-side cursor and sent in chunks, so memory
+    use does not grow with the size of the range.
+
+    **Parameters:**
+    - **from_timestamp**: Start time in seconds (Unix timestamp)
+    - **to_timestamp**: End time in seconds (Unix timestamp)
+    - **format**: `ndjson` (default) or `csv`
+    - **asset**: CoinGecko coin id, `bitcoin` by default
+    - **currency**: Quote currency, `usd` by default
+
+    **Returns:** One row per price point, timestamps in milliseconds, newest first.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"format must be one of {', '.join(EXPORT_FORMATS)}",
+        )
+
+    try:
+        params = PriceHistoryRangeParams(
+            from_timestamp=from_timestamp,
+            to_timestamp=to_timestamp,
+            asset=asset,
+            currency=currency,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    price_service = PriceService(db)
+    from_ms, to_ms = await price_service.prepare_export(
+        params.from_timestamp, params.to_timestamp, params.asset, params.currency
+    )
+
+    media_type = EXPORT_FORMATS[format][0]
+    return StreamingResponse(
+        stream_price_export(
+            session_factory, from_ms, to_ms, format, params.asset, params.currency
+        ),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{params.asset}_{params.currency}_prices'
+                f'_{from_ms}_{to_ms}.{format}"'
+            )
+        },
+    )
@@ -0,0 +1,145 @@
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Negative entries share the LRU with values under their own key space
+ERROR_KEY_PREFIX = "error:"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    def record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    size: int
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with a TTL per key
+
+    Evicts least recently used entries once either max_entries or max_bytes
+    is exceeded. Values are shared between callers, which must not mutate
+    them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = CacheStats()
+        self.evictions = 0
+        self.negative_hits = 0
+        self.bytes = 0
+        # Bumped by every invalidation, see fill
+        self.generation = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get an unexpired value, None on a miss"""
+        value = self._lookup(key)
+        self.stats.record(value is not None)
+        return value
+
+    def get_error(self, key: str) -> Optional[Exception]:
+        """Get the upstream error recently cached for key, if any"""
+        error = self._lookup(ERROR_KEY_PREFIX + key)
+        if error is not None:
+            self.negative_hits += 1
+        return error
+
+    def set_error(self, key: str, error: Exception, ttl: float) -> None:
+        """Remember an upstream error for key, so it is replayed instead of refetched"""
+        self.set(ERROR_KEY_PREFIX + key, error, ttl, len(str(error)))
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: float, size: int) -> None:
+        """Store value for ttl seconds, accounted as size bytes"""
+        self._remove(key)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        self._entries[key] = _Entry(value, self.clock() + ttl, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def fill(
+        self, key: str, value: Any, ttl: float, size: int, generation: int
+    ) -> None:
+        """Store a value read from Redis unless anything was invalidated since
+
+        generation is read before the Redis round trip, so a value that an
+        invalidation overtook in flight is not cached.
+        """
+        if generation == self.generation:
+            self.set(key, value, ttl, size)
+
+    def invalidate(self, key: str) -> None:
+        self.generation += 1
+        self._remove(key)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self.bytes = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def info(self) -> Dict[str, int]:
+        return {
+            **self.stats.as_dict(),
+            "negative_hits": self.negative_hits,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+
+_local_cache: Optional[LocalCache] = None
+
+
+def get_local_cache() -> LocalCache:
+    """Get the process-wide L1 cache, creating it on first use"""
+    global _local_cache
+    if _local_cache is None:
+        _local_cache = LocalCache(
+            settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_MAX_BYTES
+        )
+    return _local_cache
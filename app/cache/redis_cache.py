@@ -1,29 +1,270 @@
-from typing import Optional, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+import asyncio
 import json
-import redis
+import logging
+import redis.asyncio as redis
 from app.core.config import get_settings
+from app.cache.local_cache import CacheStats, LocalCache, get_local_cache
+from app.cache.serializers import get_serializer
+from app.core.tracing import traced
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Tags invalidation messages so a process skips the ones it published itself
+PROCESS_ID = uuid4().hex
+
+# Redis tier hits and misses of this process, L1 ones are in LocalCache.stats
+redis_stats = CacheStats()
+
+# Delete the lock only if we still own it, so an expired lock taken over by
+# another worker is not released by the previous holder
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_pool: Optional[redis.ConnectionPool] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_redis_pool() -> redis.ConnectionPool:
+    """Get the shared connection pool, creating it on first use"""
+    global _pool, _pool_loop
+    loop = _running_loop()
+    # Pooled connections belong to the loop that opened them
+    stale = loop is not None and _pool_loop is not None and loop is not _pool_loop
+    if _pool is None or stale:
+        _pool = redis.ConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+        _pool_loop = loop
+    elif _pool_loop is None:
+        _pool_loop = loop
+    return _pool
+
+
+async def close_redis_pool() -> None:
+    """Disconnect every pooled connection"""
+    global _pool, _pool_loop
+    if _pool is not None:
+        await _pool.aclose()
+        _pool = None
+        _pool_loop = None
 
 
 class RedisCache:
+    """Redis cache, fronted by the in-process L1 cache when CACHE_L1_ENABLED"""
+
     def __init__(self):
-        self.redis_client = redis.Redis(
-            host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True
-        )
+        self.redis_client = redis.Redis(connection_pool=get_redis_pool())
+        self.serializer = get_serializer(settings.CACHE_SERIALIZER)
         self.ttl = settings.CACHE_TTL
+        self.local: Optional[LocalCache] = (
+            get_local_cache() if settings.CACHE_L1_ENABLED else None
+        )
 
-    async def get(self, key: str) -> Optional[dict]:
-        """Get value from cache"""
-        data = self.redis_client.get(key)
+    def _decode(self, data: Optional[bytes]) -> Optional[Any]:
         if data:
-            return json.loads(data)
+            try:
+                return self.serializer.loads(data)
+            except ValueError:
+                # Entry written with a different serializer, treat as a miss
+                return None
         return None
 
-    async def set(self, key: str, value: Any) -> None:
-        """Set value in cache with TTL"""
-        self.redis_client.setex(key, self.ttl, json.dumps(value))
+    def _local_ttl(self, ttl: Optional[int]) -> float:
+        return min(ttl or self.ttl, settings.CACHE_L1_TTL)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from cache"""
+        return (await self.get_many([key]))[0]
+
+    @traced("redis.get_many")
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values in one round trip, None for each miss"""
+        return await self._get_many(keys, self._decode)
+
+    @traced("redis.get_raw_many")
+    async def get_raw_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Get several values stored with set_raw_many, as the stored bytes"""
+        return await self._get_many(keys, lambda data: data or None)
+
+    async def _get_many(
+        self, keys: List[str], decode: Callable[[Optional[bytes]], Optional[Any]]
+    ) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        values: List[Optional[Any]] = [None] * len(keys)
+        if self.local is not None:
+            values = [self.local.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing:
+            return values
+
+        generation = self.local.generation if self.local is not None else 0
+        found = await self.redis_client.mget([keys[i] for i in missing])
+        for i, data in zip(missing, found):
+            values[i] = decode(data)
+            redis_stats.record(values[i] is not None)
+            if values[i] is not None and self.local is not None:
+                self.local.fill(
+                    keys[i], values[i], self._local_ttl(None), len(data), generation
+                )
+        return values
 
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Set value in cache with TTL, CACHE_TTL unless given"""
+        await self.set_many({key: value}, ttl)
+
+    @traced("redis.set_many")
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """Set several values with the same TTL in one round trip"""
+        await self._set_many(
+            {
+                key: (value, self.serializer.dumps(value))
+                for key, value in items.items()
+            },
+            ttl,
+        )
+
+    @traced("redis.set_raw_many")
+    async def set_raw_many(
+        self, items: Dict[str, bytes], ttl: Optional[int] = None
+    ) -> None:
+        """Set already encoded values, stored and returned as is"""
+        await self._set_many({key: (data, data) for key, data in items.items()}, ttl)
+
+    async def _set_many(
+        self, items: Dict[str, Tuple[Any, bytes]], ttl: Optional[int]
+    ) -> None:
+        """Write (value, encoded) pairs to Redis and L1"""
+        if not items:
+            return
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for key, (_, data) in items.items():
+                pipe.setex(key, ttl or self.ttl, data)
+            self._publish_invalidation(pipe, list(items))
+            await pipe.execute()
+
+        if self.local is not None:
+            for key, (value, data) in items.items():
+                self.local.set(key, value, self._local_ttl(ttl), len(data))
+
+    @traced("redis.delete")
     async def delete(self, key: str) -> None:
         """Delete key from cache"""
-        self.redis_client.delete(key)
+        if self.local is not None:
+            self.local.invalidate(key)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            self._publish_invalidation(pipe, [key])
+            await pipe.execute()
+
+    def _publish_invalidation(self, pipe, keys: List[str]) -> None:
+        """Queue a message telling other processes to drop keys from their L1"""
+        if settings.CACHE_L1_ENABLED:
+            pipe.publish(
+                settings.CACHE_INVALIDATION_CHANNEL,
+                json.dumps({"origin": PROCESS_ID, "keys": keys}),
+            )
+
+    @traced("redis.publish")
+    async def publish(self, channel: str, message: str) -> None:
+        """Publish a message to every subscriber of channel"""
+        await self.redis_client.publish(channel, message)
+
+    @traced("redis.exists")
+    async def exists(self, key: str) -> bool:
+        """Check whether key is present"""
+        return bool(await self.redis_client.exists(key))
+
+    @traced("redis.acquire_lock")
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        """Try to take a lock that expires after ttl seconds, returning its token"""
+        token = uuid4().hex
+        if await self.redis_client.set(key, token, nx=True, px=int(ttl * 1000)):
+            return token
+        return None
+
+    @traced("redis.release_lock")
+    async def release_lock(self, key: str, token: str) -> None:
+        """Release a lock previously taken with acquire_lock"""
+        await self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, key, token)
+
+
+class CacheInvalidationListener:
+    """Drop L1 entries that other processes overwrote in Redis
+
+    Pub/sub delivers at most once, so the whole L1 is cleared whenever the
+    subscription is (re)established; CACHE_L1_TTL bounds anything else missed.
+    """
+
+    def __init__(self, local: Optional[LocalCache] = None):
+        self.local = local or get_local_cache()
+        self._task: Optional[asyncio.Task] = None
+        self.subscribed = asyncio.Event()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen_forever(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache invalidation subscription lost: %s", e)
+            self.subscribed.clear()
+            self.local.clear()
+            await asyncio.sleep(1)
+
+    async def _listen(self) -> None:
+        # Own connection without the pool's socket timeout, the channel can
+        # stay quiet for long
+        client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+        try:
+            async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                self.local.clear()
+                self.subscribed.set()
+                async for message in pubsub.listen():
+                    self.handle(message["data"])
+        finally:
+            await client.aclose()
+
+    def handle(self, data: bytes) -> None:
+        """Apply one invalidation message"""
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        if message.get("origin") == PROCESS_ID:
+            return
+        for key in message.get("keys", []):
+            self.local.invalidate(key)
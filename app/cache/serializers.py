@@ -0,0 +1,65 @@
+from typing import Any, Protocol
+import json
+
+
+class Serializer(Protocol):
+    def dumps(self, value: Any) -> bytes: ...
+
+    def loads(self, data: bytes) -> Any: ...
+
+
+class JSONSerializer:
+    """Standard library JSON, kept for compatibility with existing cache entries"""
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer:
+    """orjson encodes and decodes large price lists several times faster than json"""
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, value: Any) -> bytes:
+        return self._orjson.dumps(value)
+
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgpackSerializer:
+    """msgpack stores numbers in binary form, the most compact option in Redis"""
+
+    def __init__(self):
+        import msgpack
+
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self._msgpack.packb(value)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data)
+
+
+SERIALIZERS = {
+    "json": JSONSerializer,
+    "orjson": OrjsonSerializer,
+    "msgpack": MsgpackSerializer,
+}
+
+
+def get_serializer(name: str) -> Serializer:
+    """Build the serializer registered under name"""
+    try:
+        return SERIALIZERS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown cache serializer '{name}', expected one of {sorted(SERIALIZERS)}"
+        )
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight call"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn for key unless a call is already in flight, then share its result"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # Shield so a cancelled caller does not cancel the fetch other waiters share
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Every caller may have been cancelled; the error is theirs, not the loop's
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self, key: str) -> bool:
+        """Check whether a call for key is currently running"""
+        return key in self._calls
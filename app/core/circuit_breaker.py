@@ -0,0 +1,91 @@
+import time
+from typing import Any, Callable, Dict, Optional
+from app.core.config import get_settings
+from app.core.exceptions import CircuitOpenError
+
+settings = get_settings()
+
+
+class CircuitBreaker:
+    """Fail fast while an upstream keeps failing
+
+    Opens after failure_threshold failures in a row and rejects every call
+    for reset_timeout seconds. Then a single trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now
+
+        Every call let through must be followed by record.
+        """
+        if self._opened_at is None:
+            return
+        remaining = self._opened_at + self.reset_timeout - self.clock()
+        if remaining > 0 or self._trial:
+            self.rejected += 1
+            raise CircuitOpenError(
+                "CoinGecko circuit breaker is open", retry_after=max(remaining, 0.0)
+            )
+        self._trial = True
+
+    def record(self, healthy: Optional[bool]) -> None:
+        """Record how a call went; None when it ended before reaching upstream"""
+        trial, self._trial = self._trial, False
+        if healthy is None:
+            return
+        if healthy:
+            self.failures = 0
+            self._opened_at = None
+            return
+        self.failures += 1
+        if trial or self.failures >= self.failure_threshold:
+            if self._opened_at is None or trial:
+                self.opened += 1
+            self._opened_at = self.clock()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+_breaker: Optional[CircuitBreaker] = None
+
+
+def get_circuit_breaker() -> Optional[CircuitBreaker]:
+    """Get the process-wide CoinGecko breaker, None when disabled"""
+    global _breaker
+    if settings.COINGECKO_BREAKER_FAILURES <= 0:
+        return None
+    if _breaker is None:
+        _breaker = CircuitBreaker(
+            settings.COINGECKO_BREAKER_FAILURES, settings.COINGECKO_BREAKER_RESET
+        )
+    return _breaker
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 from functools import lru_cache
+from typing import List
 
 
 class Settings(BaseSettings):
@@ -8,6 +9,21 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "PriceFetch"
 
+    # Server, `python -m app.server`: SERVER_WORKERS processes, one per CPU when
+    # 0, each with its own DB, Redis and HTTP pools sized by the settings below
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_LOOP: str = "auto"  # uvloop when installed
+    SERVER_HTTP: str = "auto"  # httptools when installed
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEPALIVE: int = 5  # seconds an idle client connection stays open
+    SERVER_ACCESS_LOG: bool = False
+    # Before a worker takes traffic it opens its DB and Redis connections and
+    # reads the tracked current prices, fetching them if nothing cached them yet
+    WARMUP_ENABLED: bool = True
+    WARMUP_TIMEOUT: float = 10.0  # seconds, then the worker starts anyway
+
     # Database
     POSTGRES_SERVER: str = "localhost"
     POSTGRES_USER: str
@@ -15,15 +31,113 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_PORT: str = "5434"
     DATABASE_URL: str | None = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_POOL_TIMEOUT: float = 30.0  # seconds
+    INGEST_COPY_THRESHOLD: int = 500  # batches this large are loaded with COPY
+    # Current prices fetched by requests are stored by a background writer,
+    # every INGEST_FLUSH_INTERVAL seconds or once INGEST_FLUSH_ROWS are waiting
+    INGEST_WRITE_BEHIND: bool = True
+    INGEST_FLUSH_INTERVAL: float = 1.0  # seconds
+    INGEST_FLUSH_ROWS: int = 500
+    INGEST_QUEUE_MAX_ROWS: int = 10000  # requests wait for room beyond this
+    INGEST_QUEUE_PUT_TIMEOUT: float = 1.0  # seconds, then the rows are dropped
 
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
-    CACHE_TTL: int = 300  # 5 min in seconds
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5.0  # seconds
+    CACHE_TTL: int = 300  # 5 min in seconds, hard TTL of current prices
+    # Current prices older than this are served as is and refreshed in the background
+    CACHE_SOFT_TTL: int = 60  # seconds
+    CACHE_HISTORY_TTL: int = 7 * 24 * 3600  # closed price-history buckets
+    CACHE_SERIALIZER: str = "orjson"  # json, orjson or msgpack
+    # Share one upstream fetch per cache key across all workers, not just per process
+    CACHE_LOCK_ENABLED: bool = False
+    CACHE_LOCK_TTL: float = 10.0  # seconds
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05  # seconds
+    # In-process L1 cache in front of Redis, kept coherent across workers over
+    # pub/sub; its TTL also bounds staleness if an invalidation is lost
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_TTL: float = 30.0  # seconds, capped by the Redis TTL
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_MAX_BYTES: int = 64 * 1024 * 1024  # serialized size of the entries
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    # Seconds an upstream error is replayed or an unknown pair skipped, 0 off
+    CACHE_NEGATIVE_TTL: float = 5.0
 
     # CoinGecko
     COINGECKO_API_KEY: str
     COINGECKO_BASE_URL: str = "https://api.coingecko.com/api/v3"
+    COINGECKO_TIMEOUT: float = 10.0  # seconds
+    COINGECKO_CONNECT_TIMEOUT: float = 5.0  # seconds
+    COINGECKO_MAX_CONNECTIONS: int = 20
+    COINGECKO_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    COINGECKO_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    COINGECKO_HTTP2: bool = True  # only used when the h2 package is installed
+    COINGECKO_MAX_CONCURRENT_FETCHES: int = 4
+    # Token bucket sized to the API plan: "local" per process, "redis" shared by
+    # all workers, or "off"
+    COINGECKO_RATE_LIMITER: str = "local"
+    COINGECKO_RATE_LIMIT_PER_MINUTE: int = 30  # Demo plan
+    COINGECKO_RATE_LIMIT_BURST: int = 5
+    COINGECKO_RATE_LIMIT_MAX_WAIT: float = 10.0  # seconds, interactive requests only
+    COINGECKO_MAX_RETRIES: int = 3
+    COINGECKO_BACKOFF_BASE: float = 0.5  # seconds
+    COINGECKO_BACKOFF_MAX: float = 30.0  # seconds
+    # Time an API request may spend on CoinGecko calls, retries included
+    COINGECKO_INTERACTIVE_BUDGET: float = 5.0  # seconds
+    # Circuit breaker: fail fast after this many errors in a row (0 disables it),
+    # then let a trial request through after COINGECKO_BREAKER_RESET seconds
+    COINGECKO_BREAKER_FAILURES: int = 5
+    COINGECKO_BREAKER_RESET: float = 30.0  # seconds
+    # Recent data can still change upstream, so it is not recorded as covered
+    COVERAGE_SETTLE_SECONDS: int = 600
+
+    # Assets and currencies fetched together in every /simple/price request
+    TRACKED_ASSETS: List[str] = ["bitcoin"]  # CoinGecko coin ids
+    TRACKED_CURRENCIES: List[str] = ["usd"]
+
+    # Background price poller: "off" fetches on cache misses, "lifespan" polls
+    # inside the API process, "external" expects `python -m app.services.price_poller`
+    PRICE_POLLER_MODE: str = "off"
+    PRICE_POLL_INTERVAL: float = 10.0  # seconds
+    PRICE_POLLER_BATCH_SIZE: int = 6  # new prices buffered before one insert
+    PRICE_STALE_AFTER: int = 180  # seconds since CoinGecko's last update
+
+    # Live price stream: new prices are published on this Redis channel and
+    # fanned out by every API worker to its /price-stream clients
+    PRICE_UPDATES_CHANNEL: str = "prices:updates"
+    PRICE_STREAM_MAX_SUBSCRIBERS: int = 10000  # per worker process
+    PRICE_STREAM_MAX_PAIRS: int = 100  # asset and currency pairs per stream
+    # Events a client may lag, besides one per pair, before it is dropped
+    PRICE_STREAM_QUEUE_SIZE: int = 16
+    PRICE_STREAM_HEARTBEAT: float = 15.0  # seconds between keep-alive comments
+
+    # Backfill, `python -m app.services.backfill`
+    BACKFILL_CONCURRENCY: int = 4  # chunks fetched in parallel
+    BACKFILL_BATCH_SIZE: int = 1000  # rows per insert
+
+    # Storage: price_points is partitioned by month. `python -m app.services.retention`
+    # premakes partitions and thins months older than the retention window to
+    # hourly points; the 1m/1h/1d price_candles rollups keep their full OHLC
+    PRICE_PARTITION_MONTHS_AHEAD: int = 3
+    PRICE_RAW_RETENTION_DAYS: int = 90
+
+    # Export
+    EXPORT_BATCH_SIZE: int = 5000  # rows fetched per cursor round trip
+
+    # Analytics: indicator results are cached per bucket of this many intervals
+    ANALYTICS_BUCKET_POINTS: int = 500
+    ANALYTICS_MAX_WINDOW: int = 1000  # intervals
+
+    # Observability: Prometheus metrics at /metrics, OpenTelemetry spans around
+    # CoinGecko, Redis and repository calls when opentelemetry-api is installed
+    METRICS_ENABLED: bool = True
+    OTEL_ENABLED: bool = False
 
     model_config = ConfigDict(case_sensitive=True, env_file=".env")
 
@@ -32,6 +146,10 @@ class Settings(BaseSettings):
             return self.DATABASE_URL
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    def construct_async_database_url(self) -> str:
+        _, rest = self.construct_database_url().split("://", 1)
+        return f"postgresql+asyncpg://{rest}"
+
 
 @lru_cache()
 def get_settings() -> Settings:
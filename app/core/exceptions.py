@@ -1,10 +1,23 @@
+from typing import Optional
+
+
 class CoinGeckoRateLimitError(Exception):
     """Raised when CoinGecko rate limit is hit"""
 
-    pass
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class CoinGeckoAPIError(Exception):
     """Raised when CoinGecko API returns an error"""
 
     pass
+
+
+class CircuitOpenError(CoinGeckoAPIError):
+    """Raised without calling CoinGecko while its circuit breaker is open"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
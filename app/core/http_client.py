@@ -0,0 +1,47 @@
+from typing import Optional
+import httpx
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support in httpx needs the optional h2 package"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build a pooled keep-alive client from settings"""
+    return httpx.AsyncClient(
+        http2=settings.COINGECKO_HTTP2 and _http2_available(),
+        timeout=httpx.Timeout(
+            settings.COINGECKO_TIMEOUT, connect=settings.COINGECKO_CONNECT_TIMEOUT
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.COINGECKO_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.COINGECKO_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.COINGECKO_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,113 @@
+from typing import Iterator
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+from app.cache.local_cache import get_local_cache
+from app.cache.redis_cache import redis_stats
+from app.core.circuit_breaker import get_circuit_breaker
+from app.core.config import get_settings
+from app.db.session import async_engine
+
+settings = get_settings()
+
+# With several workers, app.server sets PROMETHEUS_MULTIPROC_DIR and /metrics
+# adds these up across them; what StateCollector reads is per worker
+
+STAGE_SECONDS = Histogram(
+    "pricefetch_stage_seconds",
+    "Time spent in each stage of serving prices",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+UPSTREAM_REQUESTS = Counter(
+    "pricefetch_upstream_requests",
+    "CoinGecko requests by HTTP status, error when no response came back",
+    ["status"],
+)
+
+UPSTREAM_SECONDS = Histogram(
+    "pricefetch_upstream_request_seconds",
+    "Latency of single CoinGecko requests, retries counted separately",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+ROWS_INGESTED = Counter(
+    "pricefetch_rows_ingested",
+    "Price points newly stored, by insert path",
+    ["path"],
+)
+
+INGEST_QUEUE_ROWS = Gauge(
+    "pricefetch_ingest_queue_rows",
+    "Price points buffered by the write-behind queue",
+    multiprocess_mode="livesum",
+)
+
+INGEST_DROPPED = Counter(
+    "pricefetch_ingest_dropped",
+    "Price points dropped because the write-behind queue stayed full",
+)
+
+
+def stage_timer(stage: str):
+    """Context manager observing its duration in pricefetch_stage_seconds"""
+    return STAGE_SECONDS.labels(stage).time()
+
+
+class StateCollector(Collector):
+    """Reads counters the app keeps anyway, at scrape time"""
+
+    def collect(self) -> Iterator:
+        hits = CounterMetricFamily(
+            "pricefetch_cache_hits", "Cache lookups that hit, by tier", labels=["tier"]
+        )
+        misses = CounterMetricFamily(
+            "pricefetch_cache_misses",
+            "Cache lookups that missed, by tier",
+            labels=["tier"],
+        )
+        ratio = GaugeMetricFamily(
+            "pricefetch_cache_hit_ratio",
+            "Hits over lookups since the worker started, by tier",
+            labels=["tier"],
+        )
+        tiers = {"redis": redis_stats}
+        if settings.CACHE_L1_ENABLED:
+            tiers["l1"] = get_local_cache().stats
+        for tier, stats in tiers.items():
+            hits.add_metric([tier], stats.hits)
+            misses.add_metric([tier], stats.misses)
+            lookups = stats.hits + stats.misses
+            ratio.add_metric([tier], stats.hits / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+        pool = async_engine.pool
+        capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        checked_out = pool.checkedout()
+        connections = GaugeMetricFamily(
+            "pricefetch_db_pool_connections",
+            "Connections of the async DB pool, by state",
+            labels=["state"],
+        )
+        connections.add_metric(["checked_out"], checked_out)
+        connections.add_metric(["idle"], pool.checkedin())
+        yield connections
+        yield GaugeMetricFamily(
+            "pricefetch_db_pool_saturation",
+            "Checked out connections over pool size plus overflow",
+            value=checked_out / capacity if capacity else 0.0,
+        )
+
+        breaker = get_circuit_breaker()
+        if breaker is not None:
+            yield GaugeMetricFamily(
+                "pricefetch_upstream_circuit_open",
+                "1 while the CoinGecko circuit breaker rejects calls",
+                value=float(breaker.state != "closed"),
+            )
+
+
+REGISTRY.register(StateCollector())
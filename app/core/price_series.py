@@ -0,0 +1,148 @@
+from collections.abc import Sequence
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union, overload
+import numpy as np
+from pydantic_core import from_json as parse_json, to_json
+
+
+class PriceSeries(Sequence):
+    """Price points held as parallel timestamp (int64 ms) and price arrays
+
+    Behaves as a sequence of (timestamp, price) tuples, so it can be passed
+    wherever a list of points is expected; slices are views, not copies.
+    """
+
+    __slots__ = ("timestamps", "prices")
+
+    def __init__(self, timestamps: np.ndarray, prices: np.ndarray):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+
+    @classmethod
+    def empty(cls) -> "PriceSeries":
+        return cls(np.empty(0, np.int64), np.empty(0, np.float64))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, float]]) -> "PriceSeries":
+        """Build from (timestamp, price) rows, e.g. a DB cursor's"""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+        timestamps, prices = zip(*rows)
+        return cls(np.array(timestamps, np.int64), np.array(prices, np.float64))
+
+    @classmethod
+    def from_market_chart(cls, data: Dict[str, Any]) -> "PriceSeries":
+        """Valid points of a market_chart response, dropping null or bad ones"""
+        raw = data.get("prices") or []
+        if not raw:
+            return cls.empty()
+        # Mapping a C itemgetter into fromiter runs no Python code per point,
+        # unlike np.asarray over the nested lists
+        try:
+            timestamps = np.fromiter(map(itemgetter(0), raw), np.int64, len(raw))
+            prices = np.fromiter(map(itemgetter(1), raw), np.float64, len(raw))
+        except (IndexError, KeyError, TypeError, ValueError, OverflowError):
+            # Nulls, short points or non-numbers, check it point by point
+            return cls._from_points(raw)
+        valid = np.isfinite(prices)
+        return cls(timestamps[valid], prices[valid])
+
+    @classmethod
+    def _from_points(cls, raw: List[Any]) -> "PriceSeries":
+        points = []
+        for point in raw:
+            try:
+                if len(point) < 2 or point[0] is None or point[1] is None:
+                    continue
+                points.append((int(point[0]), float(point[1])))
+            except (ValueError, TypeError, OverflowError):
+                continue
+        return cls.from_rows(points)
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "PriceSeries":
+        """Parse a JSON array of {"timestamp", "price"} objects, see to_json"""
+        return cls.from_rows((p["timestamp"], p["price"]) for p in parse_json(data))
+
+    @classmethod
+    def merge(cls, *series: "PriceSeries") -> "PriceSeries":
+        """Combine series in timestamp order; on repeats the earliest series wins"""
+        if not series:
+            return cls.empty()
+        return cls(
+            np.concatenate([s.timestamps for s in series]),
+            np.concatenate([s.prices for s in series]),
+        ).deduplicated()
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @overload
+    def __getitem__(self, index: int) -> Tuple[int, float]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "PriceSeries": ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[Tuple[int, float], "PriceSeries"]:
+        if isinstance(index, slice):
+            return PriceSeries(self.timestamps[index], self.prices[index])
+        return int(self.timestamps[index]), float(self.prices[index])
+
+    def __iter__(self) -> Iterator[Tuple[int, float]]:
+        return zip(self.timestamps.tolist(), self.prices.tolist())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PriceSeries):
+            return NotImplemented
+        return np.array_equal(self.timestamps, other.timestamps) and np.array_equal(
+            self.prices, other.prices
+        )
+
+    def __repr__(self) -> str:
+        return f"PriceSeries({len(self)} points)"
+
+    def between(self, from_timestamp: int, to_timestamp: int) -> "PriceSeries":
+        """Points with from_timestamp <= timestamp <= to_timestamp"""
+        mask = (self.timestamps >= from_timestamp) & (self.timestamps <= to_timestamp)
+        return PriceSeries(self.timestamps[mask], self.prices[mask])
+
+    def sorted(self, descending: bool = False) -> "PriceSeries":
+        order = np.argsort(self.timestamps, kind="stable")
+        if descending:
+            order = order[::-1]
+        return PriceSeries(self.timestamps[order], self.prices[order])
+
+    def deduplicated(self) -> "PriceSeries":
+        """Sorted by timestamp, keeping the first point of each timestamp"""
+        ordered = self.sorted()
+        keep = np.ones(len(ordered), dtype=bool)
+        keep[1:] = ordered.timestamps[1:] != ordered.timestamps[:-1]
+        return PriceSeries(ordered.timestamps[keep], ordered.prices[keep])
+
+    def split(self, starts: List[int], size: int) -> List["PriceSeries"]:
+        """Split an ascending series into the buckets [start, start + size)"""
+        starts = np.asarray(starts, dtype=np.int64)
+        lefts = np.searchsorted(self.timestamps, starts).tolist()
+        rights = np.searchsorted(self.timestamps, starts + size).tolist()
+        return [self[left:right] for left, right in zip(lefts, rights)]
+
+    def to_json(self) -> bytes:
+        """Encode as a JSON array of {"timestamp", "price"} objects
+
+        Each array is encoded as a whole and the numbers are interleaved into
+        the objects, so no dict is built per point.
+        """
+        count = len(self)
+        if not count:
+            return b"[]"
+        parts = [b""] * (4 * count)
+        parts[0::4] = [b'},{"timestamp":'] * count
+        parts[0] = b'[{"timestamp":'
+        parts[1::4] = to_json(self.timestamps.tolist())[1:-1].split(b",")
+        parts[2::4] = [b',"price":'] * count
+        parts[3::4] = to_json(self.prices.tolist())[1:-1].split(b",")
+        parts.append(b"}]")
+        return b"".join(parts)
@@ -0,0 +1,247 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Iterator, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+import redis.asyncio as redis
+from app.core.config import get_settings
+from app.core.exceptions import CoinGeckoRateLimitError
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY = "coingecko:rate_limit"
+RATE_LIMIT_BLOCKED_KEY = "coingecko:rate_limit:blocked"
+
+# Refill the shared bucket and take one token, using the Redis clock so workers
+# on different hosts agree. Returns 0 when a token was taken, otherwise the
+# milliseconds to wait before trying again.
+TAKE_TOKEN_SCRIPT = """
+local blocked = redis.call("pttl", KEYS[2])
+if blocked > 0 then
+    return blocked
+end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call("time")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call("hmget", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "updated", now)
+redis.call("pexpire", KEYS[1], math.ceil(capacity / rate) + 1000)
+return wait
+"""
+
+
+class Priority(IntEnum):
+    """Lower values are served first when requests queue for a token"""
+
+    INTERACTIVE = 0
+    POLLING = 1
+    BACKFILL = 2
+
+
+_priority: ContextVar[Priority] = ContextVar(
+    "coingecko_priority", default=Priority.INTERACTIVE
+)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def priority_scope(priority: Priority) -> Iterator[None]:
+    """Run CoinGecko calls made in this context at the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry attempt"""
+    return random.uniform(
+        0,
+        min(
+            settings.COINGECKO_BACKOFF_MAX, settings.COINGECKO_BACKOFF_BASE * 2**attempt
+        ),
+    )
+
+
+class TokenBucket:
+    """In-process token bucket, rate in tokens per second"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    async def try_acquire(self) -> float:
+        """Take a token, returning 0 or the seconds to wait before retrying"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def block(self, seconds: float) -> None:
+        """Hand out no tokens for the given time, e.g. after a Retry-After"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RedisTokenBucket:
+    """Token bucket kept in Redis so every worker draws from one budget"""
+
+    def __init__(
+        self, rate: float, capacity: int, client: Optional[redis.Redis] = None
+    ):
+        from app.cache.redis_cache import get_redis_pool
+
+        self.rate = rate
+        self.capacity = capacity
+        self.redis_client = client or redis.Redis(connection_pool=get_redis_pool())
+
+    async def try_acquire(self) -> float:
+        """Take a token, returning 0 or the seconds to wait before retrying"""
+        wait_ms = await self.redis_client.eval(
+            TAKE_TOKEN_SCRIPT,
+            2,
+            RATE_LIMIT_KEY,
+            RATE_LIMIT_BLOCKED_KEY,
+            self.rate / 1000,
+            self.capacity,
+        )
+        return int(wait_ms) / 1000
+
+    async def block(self, seconds: float) -> None:
+        """Hand out no tokens to any worker for the given time"""
+        block_ms = int(seconds * 1000)
+        if (
+            block_ms > 0
+            and await self.redis_client.pttl(RATE_LIMIT_BLOCKED_KEY) < block_ms
+        ):
+            await self.redis_client.set(RATE_LIMIT_BLOCKED_KEY, 1, px=block_ms)
+
+
+class RateGovernor:
+    """Grant bucket tokens to waiting callers in priority order
+
+    A single dispatcher task takes tokens from the bucket and hands each to
+    the highest priority waiter, so backfill traffic only gets the budget
+    interactive requests leave over. With a RedisTokenBucket, the budget is
+    shared by all workers while priorities are ordered within each worker.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def acquire(
+        self, priority: Optional[Priority] = None, timeout: Optional[float] = None
+    ) -> None:
+        """Wait for a token, raising CoinGeckoRateLimitError after timeout seconds"""
+        if priority is None:
+            priority = current_priority()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise CoinGeckoRateLimitError(
+                "Timed out waiting for a CoinGecko request slot"
+            )
+
+    async def block(self, seconds: float) -> None:
+        await self.bucket.block(seconds)
+
+    def _drop_abandoned(self) -> None:
+        """Remove waiters that timed out or were cancelled"""
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._drop_abandoned()
+            if not self._waiters:
+                return
+            try:
+                wait = await self.bucket.try_acquire()
+            except Exception as e:
+                logger.exception("Rate limiter unavailable")
+                # Fail the waiters instead of leaving them hanging
+                for _, _, future in self._waiters:
+                    if not future.done():
+                        future.set_exception(e)
+                self._waiters = []
+                return
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            self._drop_abandoned()
+            if self._waiters:
+                heapq.heappop(self._waiters)[2].set_result(None)
+
+
+_governor: Optional[RateGovernor] = None
+_governor_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def create_rate_governor() -> Optional[RateGovernor]:
+    """Build the governor for COINGECKO_RATE_LIMITER, None when it is off"""
+    rate = settings.COINGECKO_RATE_LIMIT_PER_MINUTE / 60
+    capacity = settings.COINGECKO_RATE_LIMIT_BURST
+    if settings.COINGECKO_RATE_LIMITER == "local":
+        return RateGovernor(TokenBucket(rate, capacity))
+    if settings.COINGECKO_RATE_LIMITER == "redis":
+        return RateGovernor(RedisTokenBucket(rate, capacity))
+    if settings.COINGECKO_RATE_LIMITER == "off":
+        return None
+    raise ValueError(
+        f"Unknown COINGECKO_RATE_LIMITER {settings.COINGECKO_RATE_LIMITER!r}"
+    )
+
+
+def get_rate_governor() -> Optional[RateGovernor]:
+    """Get the shared governor, creating it on first use"""
+    global _governor, _governor_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    # Waiters and the dispatcher task belong to the loop that created them
+    stale = (
+        loop is not None and _governor_loop is not None and loop is not _governor_loop
+    )
+    if _governor is None or stale:
+        _governor = create_rate_governor()
+        _governor_loop = loop
+    elif _governor_loop is None:
+        _governor_loop = loop
+    return _governor
@@ -0,0 +1,42 @@
+import functools
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+from app.core.config import get_settings
+
+settings = get_settings()
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+def _get_tracer() -> Optional[Any]:
+    """OpenTelemetry tracer, None unless OTEL_ENABLED and the package is installed
+
+    Exporters and the tracer provider are configured outside the app, for
+    example with opentelemetry-instrument.
+    """
+    if not settings.OTEL_ENABLED:
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer("pricefetch")
+
+
+_tracer = _get_tracer()
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Wrap a coroutine function in a span; returns it unchanged when tracing is off"""
+
+    def decorate(func: F) -> F:
+        if _tracer is None:
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with _tracer.start_as_current_span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
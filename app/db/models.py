@@ -1,4 +1,15 @@
-from sqlalchemy import Column, Integer, Float, DateTime, BigInteger
+from sqlalchemy import (
+    DDL,
+    Column,
+    Integer,
+    Float,
+    DateTime,
+    BigInteger,
+    Index,
+    PrimaryKeyConstraint,
+    String,
+    event,
+)
 from sqlalchemy.orm import DeclarativeBase
 
 
@@ -7,9 +18,91 @@ class Base(DeclarativeBase):
 
 
 class CurrentPrice(Base):
+    """Raw price points, range partitioned by month on timestamp
+
+    Partitions are named price_points_pYYYYMM and managed by app.db.partitions;
+    the default partition catches rows outside the premade months.
+    """
+
     __tablename__ = "price_points"
 
-    id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(BigInteger, nullable=False, unique=True)
+    asset = Column(String(64), nullable=False, server_default="bitcoin")
+    currency = Column(String(16), nullable=False, server_default="usd")
+    timestamp = Column(BigInteger, nullable=False)
     price = Column(Float, nullable=False)
     created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Serves (asset, currency, timestamp range) scans as index-only scans
+        PrimaryKeyConstraint(
+            "asset",
+            "currency",
+            "timestamp",
+            name="pk_price_points",
+            postgresql_include=["price"],
+        ),
+        # Tiny index for time-only scans, rows arrive roughly in time order
+        Index("ix_price_points_timestamp_brin", "timestamp", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+
+event.listen(
+    CurrentPrice.__table__,
+    "after_create",
+    DDL("CREATE TABLE price_points_default PARTITION OF price_points DEFAULT"),
+)
+
+
+class PriceCandle(Base):
+    """OHLC rollup of price points over interval_ms, keyed by bucket start
+
+    open_timestamp/close_timestamp and price_sum let new points be merged in
+    without rereading the bucket.
+    """
+
+    __tablename__ = "price_candles"
+
+    asset = Column(String(64), nullable=False)
+    currency = Column(String(16), nullable=False)
+    interval_ms = Column(BigInteger, nullable=False)
+    timestamp = Column(BigInteger, nullable=False)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    open_timestamp = Column(BigInteger, nullable=False)
+    close_timestamp = Column(BigInteger, nullable=False)
+    price_sum = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "asset", "currency", "interval_ms", "timestamp", name="pk_price_candles"
+        ),
+    )
+
+
+class PriceCoverage(Base):
+    """Time interval already fetched from CoinGecko at a given granularity"""
+
+    __tablename__ = "price_coverage"
+
+    id = Column(Integer, primary_key=True)
+    asset = Column(String(64), nullable=False, server_default="bitcoin")
+    currency = Column(String(16), nullable=False, server_default="usd")
+    from_timestamp = Column(BigInteger, nullable=False)
+    to_timestamp = Column(BigInteger, nullable=False)
+    granularity_ms = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index(
+            "ix_price_coverage_range",
+            "asset",
+            "currency",
+            "granularity_ms",
+            "from_timestamp",
+            "to_timestamp",
+        ),
+    )
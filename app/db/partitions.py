@@ -0,0 +1,189 @@
+from datetime import datetime, timezone
+from typing import List, NamedTuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+PARENT_TABLE = "price_points"
+DEFAULT_PARTITION = "price_points_default"
+COMPACTED_COMMENT = "compacted"
+
+
+class Partition(NamedTuple):
+    name: str
+    start: int  # inclusive, ms
+    end: int  # exclusive, ms
+
+
+def _to_ms(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+
+def month_partition(timestamp: int) -> Partition:
+    """Monthly partition holding a millisecond timestamp, in UTC"""
+    moment = datetime.fromtimestamp(timestamp / 1000, timezone.utc)
+    start = datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return Partition(f"{PARENT_TABLE}_p{start:%Y%m}", _to_ms(start), _to_ms(end))
+
+
+def month_partitions(from_timestamp: int, to_timestamp: int) -> List[Partition]:
+    """Monthly partitions overlapping the range, oldest first"""
+    partitions = []
+    partition = month_partition(from_timestamp)
+    while partition.start <= to_timestamp:
+        partitions.append(partition)
+        partition = month_partition(partition.end)
+    return partitions
+
+
+async def list_partitions(db: AsyncSession) -> List[Partition]:
+    """Monthly partitions currently attached to price_points"""
+    result = await db.execute(
+        text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent AND child.relname <> :default
+            """),
+        {"parent": PARENT_TABLE, "default": DEFAULT_PARTITION},
+    )
+    partitions = []
+    for (name,) in result:
+        moment = datetime.strptime(name[-6:], "%Y%m").replace(tzinfo=timezone.utc)
+        partitions.append(month_partition(_to_ms(moment)))
+    return sorted(partitions)
+
+
+async def default_partition_months(db: AsyncSession) -> List[Partition]:
+    """Months with rows parked in the default partition, oldest first"""
+    result = await db.execute(text(f"""
+            SELECT DISTINCT (extract(epoch FROM date_trunc(
+                'month', to_timestamp(timestamp / 1000.0) AT TIME ZONE 'UTC'
+            )) * 1000)::bigint
+            FROM {DEFAULT_PARTITION}
+            """))
+    return sorted(month_partition(start) for (start,) in result)
+
+
+async def ensure_partitions(
+    db: AsyncSession, from_timestamp: int, to_timestamp: int
+) -> List[Partition]:
+    """Create the monthly partitions covering the range, returning new ones
+
+    Rows that already landed in the default partition for a new month are
+    moved into it, since attaching would otherwise fail on them.
+    """
+    existing = set(await list_partitions(db))
+    created = []
+    try:
+        for partition in month_partitions(from_timestamp, to_timestamp):
+            if partition in existing:
+                continue
+            await db.execute(
+                text(
+                    f"CREATE TABLE {partition.name} "
+                    f"(LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                )
+            )
+            bounds = {"start": partition.start, "end": partition.end}
+            # Rows written to the month between the move and the attach would
+            # make the attach fail, so writers to the default partition wait
+            await db.execute(
+                text(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE")
+            )
+            await db.execute(
+                text(f"""
+                    WITH moved AS (
+                        DELETE FROM {DEFAULT_PARTITION}
+                        WHERE timestamp >= :start AND timestamp < :end
+                        RETURNING *
+                    )
+                    INSERT INTO {partition.name} SELECT * FROM moved
+                    """),
+                bounds,
+            )
+            await _attach(db, partition)
+            created.append(partition)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return created
+
+
+async def compact_partition(
+    db: AsyncSession, partition: Partition, interval_ms: int
+) -> None:
+    """Thin a partition out to the last point of each interval_ms
+
+    The price_candles rollups already hold the open, high, low and close of
+    every interval, so no detail is lost from them. Coverage stays recorded,
+    so the dropped points are not fetched and rolled up again. The thinned rows are
+    written to a new table that is swapped in, so the old one is dropped
+    instead of leaving dead tuples behind.
+    """
+    bucket = f"timestamp - timestamp % {int(interval_ms)}"
+    compacted = f"{partition.name}_compacted"
+    try:
+        # Writes to the month wait until the swap, so none is copied too late
+        # and dropped with the old table; reads go on meanwhile
+        await db.execute(
+            text(f"LOCK TABLE {partition.name} IN SHARE ROW EXCLUSIVE MODE")
+        )
+        await db.execute(
+            text(
+                f"CREATE TABLE {compacted} "
+                f"(LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+        )
+        await db.execute(text(f"""
+                INSERT INTO {compacted}
+                SELECT DISTINCT ON (asset, currency, {bucket}) *
+                FROM {partition.name}
+                ORDER BY asset, currency, {bucket}, timestamp DESC
+                """))
+        await db.execute(
+            text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition.name}")
+        )
+        await db.execute(text(f"DROP TABLE {partition.name}"))
+        await db.execute(text(f"ALTER TABLE {compacted} RENAME TO {partition.name}"))
+        await _attach(db, partition)
+        await db.execute(
+            text(f"COMMENT ON TABLE {partition.name} IS '{COMPACTED_COMMENT}'")
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+
+async def is_compacted(db: AsyncSession, partition: Partition) -> bool:
+    result = await db.execute(
+        text("SELECT obj_description(to_regclass(:name), 'pg_class')"),
+        {"name": partition.name},
+    )
+    return result.scalar() == COMPACTED_COMMENT
+
+
+async def _attach(db: AsyncSession, partition: Partition) -> None:
+    """Attach a filled table as the partition for its month"""
+    # A matching CHECK constraint lets ATTACH skip its validation scan
+    await db.execute(
+        text(
+            f"ALTER TABLE {partition.name} ADD CONSTRAINT {partition.name}_bounds "
+            f"CHECK (timestamp >= {partition.start} AND timestamp < {partition.end})"
+        )
+    )
+    await db.execute(
+        text(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {partition.name} "
+            f"FOR VALUES FROM ({partition.start}) TO ({partition.end})"
+        )
+    )
+    await db.execute(
+        text(f"ALTER TABLE {partition.name} DROP CONSTRAINT {partition.name}_bounds")
+    )
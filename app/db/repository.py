@@ -1,28 +1,205 @@
+from sqlalchemy import (
+    BigInteger,
+    Float,
+    case,
+    column,
+    delete,
+    func,
+    select,
+    table,
+    text,
+    true,
+    values,
+)
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import ARRAY, Insert, aggregate_order_by
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime, timezone
-from typing import List, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from app.core.config import get_settings
+from app.core.metrics import ROWS_INGESTED
+from app.core.price_series import PriceSeries
+from app.core.tracing import traced
 from . import models
 
+settings = get_settings()
+
+CONFLICT_COLUMNS = ["asset", "currency", "timestamp"]
+
+# asyncpg allows 32767 bind parameters per statement, five per row
+MAX_INSERT_ROWS = 5000
+
+STAGING_TABLE = "price_points_staging"
+STAGING_COLUMNS = ["asset", "currency", "timestamp", "price", "created_at"]
+
+# Kept per connection, so pooled connections do not recreate it every batch
+CREATE_STAGING_TABLE = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+    asset VARCHAR(64) NOT NULL,
+    currency VARCHAR(16) NOT NULL,
+    timestamp BIGINT NOT NULL,
+    price DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP NOT NULL
+) ON COMMIT DELETE ROWS
+"""
+
+# price_candles widths updated on every insert: 1m, 1h and 1d
+ROLLUP_INTERVALS_MS = (60_000, 3_600_000, 86_400_000)
+
+
+def rollup_interval(
+    interval_ms: int, from_timestamp: int, to_timestamp: int
+) -> Optional[int]:
+    """Coarsest rollup whose candles add up exactly to interval_ms buckets
+
+    The range has to start and end on rollup bounds too, otherwise the
+    edge candles would cover points outside it.
+    """
+    for rollup in sorted(ROLLUP_INTERVALS_MS, reverse=True):
+        if (
+            interval_ms % rollup == 0
+            and from_timestamp % rollup == 0
+            and (to_timestamp + 1) % rollup == 0
+        ):
+            return rollup
+    return None
+
+
+def _first(value, order):
+    """First value of a group in the given order"""
+    return func.array_agg(aggregate_order_by(value, order), type_=ARRAY(Float))[1]
+
+
+def _upsert_rollups(points) -> Insert:
+    """Merge (asset, currency, timestamp, price) rows into every rollup width"""
+    intervals = values(column("interval_ms", BigInteger), name="rollups").data(
+        [(interval,) for interval in ROLLUP_INTERVALS_MS]
+    )
+    bucket = points.c.timestamp - points.c.timestamp % intervals.c.interval_ms
+    aggregates = (
+        select(
+            points.c.asset,
+            points.c.currency,
+            intervals.c.interval_ms,
+            bucket,
+            _first(points.c.price, points.c.timestamp.asc()),
+            func.max(points.c.price),
+            func.min(points.c.price),
+            _first(points.c.price, points.c.timestamp.desc()),
+            func.min(points.c.timestamp),
+            func.max(points.c.timestamp),
+            func.sum(points.c.price),
+            func.count(),
+        )
+        .select_from(points.join(intervals, true()))
+        .group_by(points.c.asset, points.c.currency, intervals.c.interval_ms, bucket)
+    )
+
+    candle = models.PriceCandle
+    stmt = pg_insert(candle).from_select(
+        [
+            "asset",
+            "currency",
+            "interval_ms",
+            "timestamp",
+            "open",
+            "high",
+            "low",
+            "close",
+            "open_timestamp",
+            "close_timestamp",
+            "price_sum",
+            "count",
+        ],
+        aggregates,
+    )
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        constraint="pk_price_candles",
+        set_={
+            "open": case(
+                (new.open_timestamp < candle.open_timestamp, new.open),
+                else_=candle.open,
+            ),
+            "high": func.greatest(candle.high, new.high),
+            "low": func.least(candle.low, new.low),
+            "close": case(
+                (new.close_timestamp > candle.close_timestamp, new.close),
+                else_=candle.close,
+            ),
+            "open_timestamp": func.least(candle.open_timestamp, new.open_timestamp),
+            "close_timestamp": func.greatest(
+                candle.close_timestamp, new.close_timestamp
+            ),
+            "price_sum": candle.price_sum + new.price_sum,
+            "count": candle.count + new.count,
+        },
+    )
+
+
+def insert_with_rollups(insert: Insert):
+    """Run a price_points insert and fold the rows it added into the rollups
+
+    Stored points are skipped, so the rollups never count a point twice.
+    Selects the number of new rows.
+    """
+    point = models.CurrentPrice
+    inserted = (
+        insert.on_conflict_do_nothing(index_elements=CONFLICT_COLUMNS)
+        .returning(point.asset, point.currency, point.timestamp, point.price)
+        .cte("inserted")
+    )
+    return (
+        select(func.count())
+        .select_from(inserted)
+        .add_cte(_upsert_rollups(inserted).cte("rollups"))
+    )
+
+
+def _merge_staging_rows():
+    """Insert the staged rows into price_points and the rollups"""
+    # Empties the staging table as it merges, even inside an uncommitted transaction
+    staging = table(STAGING_TABLE, *(column(name) for name in STAGING_COLUMNS))
+    staged = delete(staging).returning(*staging.c).cte("staged")
+    return insert_with_rollups(
+        pg_insert(models.CurrentPrice).from_select(STAGING_COLUMNS, select(staged))
+    )
+
+
+def _series(asset: str, currency: str) -> tuple:
+    """Filter clauses selecting one asset/currency price series"""
+    return (
+        models.CurrentPrice.asset == asset,
+        models.CurrentPrice.currency == currency,
+    )
+
+
+def _utcnow() -> datetime:
+    """created_at is a naive UTC column, which asyncpg only accepts naive values for"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class PriceRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_price_point(self, timestamp: int, price: float) -> models.CurrentPrice:
+    def create_price_point(
+        self,
+        timestamp: int,
+        price: float,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> models.CurrentPrice:
         """Create a single price point"""
-        db_price = models.CurrentPrice(
-            timestamp=timestamp,
-            price=price,
-            created_at=datetime.now(timezone.utc),
-        )
-        self.db.add(db_price)
-        self.db.commit()
-        self.db.refresh(db_price)
-        return db_price
+        self.create_price_points_batch([(timestamp, price)], asset, currency)
+        return self.db.get(models.CurrentPrice, (asset, currency, timestamp))
 
     def create_price_points_batch(
-        self, price_points: List[Tuple[int, float]]
+        self,
+        price_points: List[Tuple[int, float]],
+        asset: str = "bitcoin",
+        currency: str = "usd",
     ) -> List[models.CurrentPrice]:
         """Create multiple price points from range endpoint"""
         if not price_points:
@@ -31,34 +208,402 @@ class PriceRepository:
         now = datetime.now(timezone.utc)
 
         valid_points = [
-            {"timestamp": ts, "price": price, "created_at": now}
+            {
+                "asset": asset,
+                "currency": currency,
+                "timestamp": ts,
+                "price": price,
+                "created_at": now,
+            }
             for ts, price in price_points
         ]
 
         try:
-            stmt = (
-                pg_insert(models.CurrentPrice)
-                .values(valid_points)
-                .on_conflict_do_nothing(index_elements=["timestamp"])
+            self.db.execute(
+                insert_with_rollups(pg_insert(models.CurrentPrice).values(valid_points))
             )
-
-            self.db.execute(stmt)
             self.db.commit()
         except Exception as e:
             self.db.rollback()
             raise
 
         return self.get_price_range(
-            min(ts for ts, _ in price_points), max(ts for ts, _ in price_points)
+            min(ts for ts, _ in price_points),
+            max(ts for ts, _ in price_points),
+            asset,
+            currency,
         )
 
     def get_price_range(
-        self, from_timestamp: int, to_timestamp: int
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
     ) -> list[models.CurrentPrice]:
         """Get price points within timestamp range"""
         return (
             self.db.query(models.CurrentPrice)
-            .filter(models.CurrentPrice.timestamp.between(from_timestamp, to_timestamp))
+            .filter(
+                *_series(asset, currency),
+                models.CurrentPrice.timestamp.between(from_timestamp, to_timestamp),
+            )
             .order_by(models.CurrentPrice.timestamp.desc())
             .all()
         )
+
+
+class AsyncPriceRepository:
+    """PriceRepository for AsyncSession, used by the request path"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @traced("repository.create_price_point")
+    async def create_price_point(
+        self,
+        timestamp: int,
+        price: float,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> models.CurrentPrice:
+        """Create a single price point"""
+        await self.insert_price_points(
+            [(timestamp, price)], asset, currency, use_copy=False
+        )
+        return await self.db.get(models.CurrentPrice, (asset, currency, timestamp))
+
+    @traced("repository.create_price_points_batch")
+    async def create_price_points_batch(
+        self,
+        price_points: List[Tuple[int, float]],
+        asset: str = "bitcoin",
+        currency: str = "usd",
+        return_rows: bool = True,
+    ) -> List[models.CurrentPrice]:
+        """Create multiple price points from range endpoint
+
+        With return_rows=False the stored range is not read back.
+        """
+        if not price_points:
+            return []
+
+        await self.insert_price_points(price_points, asset, currency)
+        if not return_rows:
+            return []
+
+        return await self.get_price_range(
+            min(ts for ts, _ in price_points),
+            max(ts for ts, _ in price_points),
+            asset,
+            currency,
+        )
+
+    @traced("repository.insert_price_points")
+    async def insert_price_points(
+        self,
+        price_points: Sequence[Tuple[int, float]],
+        asset: str = "bitcoin",
+        currency: str = "usd",
+        use_copy: Optional[bool] = None,
+    ) -> int:
+        """Insert price points, skipping stored ones, and return how many were new
+
+        Batches of INGEST_COPY_THRESHOLD rows or more go through COPY unless
+        use_copy says otherwise.
+        """
+        if not price_points:
+            return 0
+        if use_copy is None:
+            use_copy = len(price_points) >= settings.INGEST_COPY_THRESHOLD
+
+        try:
+            if use_copy:
+                inserted = await self._copy_price_points(price_points, asset, currency)
+            else:
+                now = _utcnow()
+                inserted = await self._insert_price_values(
+                    [
+                        {
+                            "asset": asset,
+                            "currency": currency,
+                            "timestamp": ts,
+                            "price": price,
+                            "created_at": now,
+                        }
+                        for ts, price in price_points
+                    ]
+                )
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        ROWS_INGESTED.labels("copy" if use_copy else "insert").inc(inserted)
+        return inserted
+
+    async def _insert_price_values(self, rows: List[Dict[str, Any]]) -> int:
+        """Multi-row INSERT ... ON CONFLICT DO NOTHING, split below the bind limit"""
+        inserted = 0
+        for start in range(0, len(rows), MAX_INSERT_ROWS):
+            result = await self.db.execute(
+                insert_with_rollups(
+                    pg_insert(models.CurrentPrice).values(
+                        rows[start : start + MAX_INSERT_ROWS]
+                    )
+                )
+            )
+            inserted += result.scalar()
+        return inserted
+
+    async def _copy_price_points(
+        self, price_points: Sequence[Tuple[int, float]], asset: str, currency: str
+    ) -> int:
+        """COPY rows into a temp staging table, then merge them in one statement"""
+        # Runs through the session first so the COPY joins its transaction
+        await self.db.execute(text(CREATE_STAGING_TABLE))
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+
+        now = _utcnow()
+        await raw_connection.driver_connection.copy_records_to_table(
+            STAGING_TABLE,
+            records=((asset, currency, ts, price, now) for ts, price in price_points),
+            columns=STAGING_COLUMNS,
+        )
+        result = await self.db.execute(_merge_staging_rows())
+        return result.scalar()
+
+    @traced("repository.create_latest_prices")
+    async def create_latest_prices(
+        self, prices: List[Tuple[str, str, int, float]]
+    ) -> None:
+        """Store (asset, currency, timestamp, price) rows, skipping ones already stored"""
+        if not prices:
+            return
+
+        now = _utcnow()
+        try:
+            inserted = await self._insert_price_values(
+                [
+                    {
+                        "asset": asset,
+                        "currency": currency,
+                        "timestamp": ts,
+                        "price": price,
+                        "created_at": now,
+                    }
+                    for asset, currency, ts, price in prices
+                ]
+            )
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        ROWS_INGESTED.labels("latest").inc(inserted)
+
+    @traced("repository.get_price_range")
+    async def get_price_range(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> list[models.CurrentPrice]:
+        """Get price points within timestamp range"""
+        result = await self.db.execute(
+            select(models.CurrentPrice)
+            .where(
+                *_series(asset, currency),
+                models.CurrentPrice.timestamp.between(from_timestamp, to_timestamp),
+            )
+            .order_by(models.CurrentPrice.timestamp.desc())
+        )
+        return list(result.scalars().all())
+
+    @traced("repository.get_price_series")
+    async def get_price_series(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> PriceSeries:
+        """Get price points within timestamp range, oldest first, without ORM objects"""
+        result = await self.db.execute(
+            select(models.CurrentPrice.timestamp, models.CurrentPrice.price)
+            .where(
+                *_series(asset, currency),
+                models.CurrentPrice.timestamp.between(from_timestamp, to_timestamp),
+            )
+            .order_by(models.CurrentPrice.timestamp)
+        )
+        return PriceSeries.from_rows(result.tuples())
+
+    @traced("repository.get_latest_price")
+    async def get_latest_price(
+        self, asset: str = "bitcoin", currency: str = "usd"
+    ) -> Optional[models.CurrentPrice]:
+        """Get the most recent price point"""
+        result = await self.db.execute(
+            select(models.CurrentPrice)
+            .where(*_series(asset, currency))
+            .order_by(models.CurrentPrice.timestamp.desc())
+            .limit(1)
+        )
+        return result.scalars().first()
+
+    async def stream_price_range(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        batch_size: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> AsyncIterator[Sequence]:
+        """Stream (timestamp, price) rows newest first through a server-side cursor"""
+        result = await self.db.stream(
+            select(models.CurrentPrice.timestamp, models.CurrentPrice.price)
+            .where(
+                *_series(asset, currency),
+                models.CurrentPrice.timestamp.between(from_timestamp, to_timestamp),
+            )
+            .order_by(models.CurrentPrice.timestamp.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    @traced("repository.get_price_candles")
+    async def get_price_candles(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        interval_ms: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> list:
+        """OHLC buckets of interval_ms, newest first
+
+        Read from the coarsest rollup that divides the buckets when the range
+        is aligned to it, otherwise aggregated from the raw points.
+        """
+        rollup = rollup_interval(interval_ms, from_timestamp, to_timestamp)
+        if rollup is None:
+            query = self._raw_candles_query(interval_ms, asset, currency)
+            timestamp = models.CurrentPrice.timestamp
+        else:
+            query = self._rollup_candles_query(interval_ms, rollup, asset, currency)
+            timestamp = models.PriceCandle.timestamp
+
+        result = await self.db.execute(
+            query.where(timestamp.between(from_timestamp, to_timestamp))
+        )
+        return list(result)
+
+    def _raw_candles_query(self, interval_ms: int, asset: str, currency: str):
+        price = models.CurrentPrice.price
+        timestamp = models.CurrentPrice.timestamp
+        bucket = (timestamp - timestamp % interval_ms).label("timestamp")
+        return (
+            select(
+                bucket,
+                _first(price, timestamp.asc()).label("open"),
+                func.max(price).label("high"),
+                func.min(price).label("low"),
+                _first(price, timestamp.desc()).label("close"),
+                func.avg(price).label("average"),
+                func.count().label("count"),
+            )
+            .where(*_series(asset, currency))
+            .group_by(bucket)
+            .order_by(bucket.desc())
+        )
+
+    def _rollup_candles_query(
+        self, interval_ms: int, rollup: int, asset: str, currency: str
+    ):
+        candle = models.PriceCandle
+        bucket = (candle.timestamp - candle.timestamp % interval_ms).label("timestamp")
+        return (
+            select(
+                bucket,
+                _first(candle.open, candle.timestamp.asc()).label("open"),
+                func.max(candle.high).label("high"),
+                func.min(candle.low).label("low"),
+                _first(candle.close, candle.timestamp.desc()).label("close"),
+                (func.sum(candle.price_sum) / func.sum(candle.count)).label("average"),
+                func.sum(candle.count).label("count"),
+            )
+            .where(
+                candle.asset == asset,
+                candle.currency == currency,
+                candle.interval_ms == rollup,
+            )
+            .group_by(bucket)
+            .order_by(bucket.desc())
+        )
+
+    @traced("repository.get_coverage")
+    async def get_coverage(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        max_granularity_ms: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> List[Tuple[int, int]]:
+        """Get stored intervals overlapping the range at this granularity or finer"""
+        result = await self.db.execute(
+            select(
+                models.PriceCoverage.from_timestamp, models.PriceCoverage.to_timestamp
+            ).where(
+                models.PriceCoverage.asset == asset,
+                models.PriceCoverage.currency == currency,
+                models.PriceCoverage.granularity_ms <= max_granularity_ms,
+                models.PriceCoverage.from_timestamp <= to_timestamp,
+                models.PriceCoverage.to_timestamp >= from_timestamp,
+            )
+        )
+        return [(row.from_timestamp, row.to_timestamp) for row in result]
+
+    @traced("repository.add_coverage")
+    async def add_coverage(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        granularity_ms: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> None:
+        """Record an interval as stored, merging it with touching intervals"""
+        coverage = models.PriceCoverage
+        try:
+            result = await self.db.execute(
+                delete(coverage)
+                .where(
+                    coverage.asset == asset,
+                    coverage.currency == currency,
+                    coverage.granularity_ms == granularity_ms,
+                    coverage.from_timestamp <= to_timestamp + 1,
+                    coverage.to_timestamp >= from_timestamp - 1,
+                )
+                .returning(coverage.from_timestamp, coverage.to_timestamp)
+            )
+            for row in result:
+                from_timestamp = min(from_timestamp, row.from_timestamp)
+                to_timestamp = max(to_timestamp, row.to_timestamp)
+
+            self.db.add(
+                coverage(
+                    asset=asset,
+                    currency=currency,
+                    from_timestamp=from_timestamp,
+                    to_timestamp=to_timestamp,
+                    granularity_ms=granularity_ms,
+                    created_at=_utcnow(),
+                )
+            )
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
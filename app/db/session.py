@@ -1,12 +1,28 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(settings.construct_database_url())
+pool_options = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+)
+
+engine = create_engine(settings.construct_database_url(), **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    settings.construct_async_database_url(), **pool_options
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db():
     db = SessionLocal()
@@ -14,3 +30,13 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    """Session factory for work that outlives the request, such as streamed responses"""
+    return AsyncSessionLocal
@@ -1,14 +1,100 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.core.config import get_settings
-from app.api.routes import price
+from app.core.exceptions import CircuitOpenError, CoinGeckoRateLimitError
+from app.core.http_client import get_http_client, close_http_client
+from app.cache.redis_cache import (
+    CacheInvalidationListener,
+    close_redis_pool,
+    get_redis_pool,
+)
+from app.db.session import async_engine
+from app.services.ingest_queue import get_ingest_queue
+from app.services.price_poller import PricePoller
+from app.services.price_stream import get_price_broadcaster
+from app.services.warmup import warm_up
+from app.api.routes import analytics, cache, metrics, price
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_http_client()
+    get_redis_pool()
+
+    ingest = None
+    if settings.INGEST_WRITE_BEHIND:
+        ingest = get_ingest_queue()
+        ingest.start()
+
+    invalidation = None
+    if settings.CACHE_L1_ENABLED:
+        invalidation = CacheInvalidationListener()
+        invalidation.start()
+
+    broadcaster = get_price_broadcaster()
+    broadcaster.start()
+
+    poller = None
+    if settings.PRICE_POLLER_MODE == "lifespan":
+        poller = PricePoller()
+        poller.start()
+
+    # Runs before the worker accepts connections
+    if settings.WARMUP_ENABLED:
+        await warm_up()
+
+    yield
+
+    if poller is not None:
+        await poller.stop()
+    await broadcaster.stop()
+    if invalidation is not None:
+        await invalidation.stop()
+    if ingest is not None:
+        await ingest.stop()
+    await close_http_client()
+    await close_redis_pool()
+    await async_engine.dispose()
+
+
 app = FastAPI(
-    title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 app.include_router(price.router)
+app.include_router(cache.router)
+app.include_router(analytics.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
+
+
+@app.exception_handler(CoinGeckoRateLimitError)
+async def coingecko_rate_limit_handler(
+    request: Request, exc: CoinGeckoRateLimitError
+) -> JSONResponse:
+    """Upstream budget exhausted, tell clients when to come back"""
+    retry_after = max(1, round(exc.retry_after or settings.COINGECKO_BACKOFF_MAX))
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"CoinGecko rate limit reached: {exc}"},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError) -> JSONResponse:
+    """CoinGecko keeps failing and nothing stored could stand in"""
+    retry_after = max(1, round(exc.retry_after or settings.COINGECKO_BREAKER_RESET))
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"CoinGecko is unavailable: {exc}"},
+        headers={"Retry-After": str(retry_after)},
+    )
 
 
 @app.get("/")
@@ -1,25 +1,116 @@
 from pydantic import BaseModel, ConfigDict, field_validator
-from typing import List
+from typing import Dict, List, Optional, Union
+import re
 from datetime import datetime, timedelta, timezone
+from app.core.config import get_settings
+
+settings = get_settings()
+
+MAX_POINTS_LIMIT = 10000
+MINUTE_MS = 60 * 1000
+# Supported candle widths for /price-history downsampling
+INTERVALS_MS: Dict[str, int] = {
+    "1m": MINUTE_MS,
+    "5m": 5 * MINUTE_MS,
+    "15m": 15 * MINUTE_MS,
+    "30m": 30 * MINUTE_MS,
+    "1h": 60 * MINUTE_MS,
+    "2h": 2 * 60 * MINUTE_MS,
+    "4h": 4 * 60 * MINUTE_MS,
+    "6h": 6 * 60 * MINUTE_MS,
+    "12h": 12 * 60 * MINUTE_MS,
+    "1d": 24 * 60 * MINUTE_MS,
+    "1w": 7 * 24 * 60 * MINUTE_MS,
+}
+# Indicators of /analytics, computed by app.services.indicators
+INDICATOR_NAMES = ("log_return", "sma", "ema", "volatility", "drawdown")
+MAX_ASSETS_PER_REQUEST = 50
+MAX_CURRENCIES_PER_REQUEST = 10
+# CoinGecko coin ids and vs_currencies are lowercase slugs
+SYMBOL_PATTERN = re.compile(r"^[a-z0-9-]{1,64}$")
+
+
+def validate_symbol(symbol: str, name: str) -> str:
+    """Validate an asset or currency, normalized to lowercase"""
+    symbol = symbol.strip().lower()
+    if not SYMBOL_PATTERN.match(symbol):
+        raise ValueError(f"invalid {name}: {symbol!r}")
+    return symbol
+
+
+def validate_symbols(
+    symbols: Union[str, List[str]], name: str, limit: int
+) -> List[str]:
+    """Validate a comma separated or list of symbols, dropping repeats"""
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    symbols = list(dict.fromkeys(validate_symbol(s, name) for s in symbols))
+    if not 1 <= len(symbols) <= limit:
+        raise ValueError(f"between 1 and {limit} {name}s are allowed")
+    return symbols
 
 
 class CurrentPriceResponse(BaseModel):
     price: float
     timestamp: int
+    stale: bool = False
 
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
                 "price": 105487.095,
                 "timestamp": 1749994297000,
+                "stale": False,
             }
         }
     )
 
 
+class AssetPriceResponse(CurrentPriceResponse):
+    asset: str
+    currency: str
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "asset": "bitcoin",
+                "currency": "usd",
+                "price": 105487.095,
+                "timestamp": 1749994297000,
+                "stale": False,
+            }
+        }
+    )
+
+
+class CurrentPricesResponse(BaseModel):
+    prices: List[AssetPriceResponse]
+
+
+class CurrentPricesParams(BaseModel):
+    assets: List[str]
+    currencies: List[str]
+
+    @field_validator("assets", mode="before")
+    @classmethod
+    def validate_assets(cls, assets: Union[str, List[str]]) -> List[str]:
+        """Validate assets, given as a list or comma separated"""
+        return validate_symbols(assets, "asset", MAX_ASSETS_PER_REQUEST)
+
+    @field_validator("currencies", mode="before")
+    @classmethod
+    def validate_currencies(cls, currencies: Union[str, List[str]]) -> List[str]:
+        """Validate currencies, given as a list or comma separated"""
+        return validate_symbols(currencies, "currency", MAX_CURRENCIES_PER_REQUEST)
+
+
 class PriceHistoryRangeParams(BaseModel):
     from_timestamp: int
     to_timestamp: int
+    interval: Optional[str] = None
+    max_points: Optional[int] = None
+    asset: str = "bitcoin"
+    currency: str = "usd"
 
     @field_validator("from_timestamp")
     @classmethod
@@ -48,6 +139,34 @@ class PriceHistoryRangeParams(BaseModel):
 
         return to_timestamp
 
+    @field_validator("interval")
+    @classmethod
+    def validate_interval(cls, interval: Optional[str]) -> Optional[str]:
+        """Validate interval is a supported candle width"""
+        if interval is not None and interval not in INTERVALS_MS:
+            raise ValueError(f"interval must be one of {', '.join(INTERVALS_MS)}")
+        return interval
+
+    @field_validator("max_points")
+    @classmethod
+    def validate_max_points(cls, max_points: Optional[int]) -> Optional[int]:
+        """Validate max_points is within limits"""
+        if max_points is not None and not 1 <= max_points <= MAX_POINTS_LIMIT:
+            raise ValueError(f"max_points must be between 1 and {MAX_POINTS_LIMIT}")
+        return max_points
+
+    @field_validator("asset")
+    @classmethod
+    def validate_asset(cls, asset: str) -> str:
+        """Validate asset is a CoinGecko coin id"""
+        return validate_symbol(asset, "asset")
+
+    @field_validator("currency")
+    @classmethod
+    def validate_currency(cls, currency: str) -> str:
+        """Validate currency is a CoinGecko vs_currency"""
+        return validate_symbol(currency, "currency")
+
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
@@ -58,6 +177,29 @@ class PriceHistoryRangeParams(BaseModel):
     )
 
 
+class AnalyticsParams(PriceHistoryRangeParams):
+    indicator: str
+    window: int = 20
+
+    @field_validator("indicator")
+    @classmethod
+    def validate_indicator(cls, indicator: str) -> str:
+        """Validate indicator is a supported one"""
+        if indicator not in INDICATOR_NAMES:
+            raise ValueError(f"indicator must be one of {', '.join(INDICATOR_NAMES)}")
+        return indicator
+
+    @field_validator("window")
+    @classmethod
+    def validate_window(cls, window: int) -> int:
+        """Validate window is within limits"""
+        if not 2 <= window <= settings.ANALYTICS_MAX_WINDOW:
+            raise ValueError(
+                f"window must be between 2 and {settings.ANALYTICS_MAX_WINDOW}"
+            )
+        return window
+
+
 class PricePoint(BaseModel):
     timestamp: int
     price: float
@@ -72,8 +214,34 @@ class PricePoint(BaseModel):
     )
 
 
+class PriceCandle(BaseModel):
+    timestamp: int
+    open: float
+    high: float
+    low: float
+    close: float
+    average: float
+    count: int
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "timestamp": 1749978000000,
+                "open": 105211.979,
+                "high": 105320.5,
+                "low": 104890.12,
+                "close": 104941.085,
+                "average": 105102.447,
+                "count": 12,
+            }
+        }
+    )
+
+
 class PriceHistoryResponse(BaseModel):
     prices: List[PricePoint]
+    interval: Optional[int] = None
+    candles: Optional[List[PriceCandle]] = None
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -85,3 +253,29 @@ class PriceHistoryResponse(BaseModel):
             }
         }
     )
+
+
+class IndicatorValue(BaseModel):
+    timestamp: int
+    value: Optional[float]
+
+
+class AnalyticsResponse(BaseModel):
+    indicator: str
+    interval: int
+    window: int
+    values: List[IndicatorValue]
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "indicator": "sma",
+                "interval": 3600000,
+                "window": 20,
+                "values": [
+                    {"timestamp": 1749981600000, "value": 105102.447},
+                    {"timestamp": 1749978000000, "value": 105087.113},
+                ],
+            }
+        }
+    )
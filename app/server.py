@@ -0,0 +1,61 @@
+import logging
+import os
+import tempfile
+from pathlib import Path
+import uvicorn
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def worker_count() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def prepare_metrics_dir(workers: int) -> None:
+    """Let /metrics add up counters of every worker, not just the one answering
+
+    prometheus_client writes each worker's samples to PROMETHEUS_MULTIPROC_DIR.
+    Files of a previous run would be counted again, so they are removed.
+    """
+    if workers < 2 or not settings.METRICS_ENABLED:
+        return
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="pricefetch-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+    for path in Path(directory).glob("*.db"):
+        path.unlink()
+
+
+def main() -> None:
+    """Serve the API with SERVER_WORKERS worker processes
+
+    Workers are spawned, not forked, and import the app themselves, so each
+    creates its DB engine, Redis pool and HTTP client in its own process.
+    """
+    logging.basicConfig(level=logging.INFO)
+    workers = worker_count()
+    prepare_metrics_dir(workers)
+    logger.info(
+        "Starting %d workers, up to %d DB connections",
+        workers,
+        workers * (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+    )
+    uvicorn.run(
+        "app.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE,
+        access_log=settings.SERVER_ACCESS_LOG,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from pydantic_core import to_json
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.price_series import PriceSeries
+from app.schemas.price import INTERVALS_MS, MAX_POINTS_LIMIT
+from app.services.coverage import bucket_starts
+from app.services.downsampling import interval_for_max_points
+from app.services.indicators import INDICATORS, RollingState, extend
+from app.services.price_service import PriceService, normalize_timestamp
+
+settings = get_settings()
+
+DEFAULT_INTERVAL = "1h"
+
+
+def _json_values(values: np.ndarray) -> List[Optional[float]]:
+    """Values as JSON numbers, NaN where the indicator is undefined becoming null"""
+    return [value if value == value else None for value in values.tolist()]
+
+
+class AnalyticsService:
+    """Indicators over the close of each interval, cached per range bucket
+
+    A bucket entry holds the values of its settled intervals and the rolling
+    state after the last one. Entries still filling up are extended from that
+    state with only the intervals stored since; unsettled intervals are
+    computed per request and never cached.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.price_service = PriceService(db)
+        self.repository = self.price_service.repository
+        self.cache = self.price_service.cache
+
+    def _now(self) -> int:
+        return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+    async def get_indicator_json(
+        self,
+        indicator: str,
+        from_timestamp: int,
+        to_timestamp: int,
+        window: int,
+        interval: Optional[str] = None,
+        max_points: Optional[int] = None,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> bytes:
+        """Get an indicator over the range as the JSON response body, newest first"""
+        from_timestamp = normalize_timestamp(from_timestamp)
+        to_timestamp = normalize_timestamp(to_timestamp)
+        if interval:
+            interval_ms = INTERVALS_MS[interval]
+        elif max_points:
+            interval_ms = interval_for_max_points(
+                from_timestamp, to_timestamp, max_points
+            )
+        else:
+            interval_ms = INTERVALS_MS[DEFAULT_INTERVAL]
+        if (to_timestamp - from_timestamp) // interval_ms >= MAX_POINTS_LIMIT:
+            raise ValueError(
+                f"range holds more than {MAX_POINTS_LIMIT} intervals, "
+                "use a wider interval"
+            )
+
+        now = self._now()
+        settled_before = now - settings.COVERAGE_SETTLE_SECONDS * 1000
+        bucket_size = interval_ms * settings.ANALYTICS_BUCKET_POINTS
+        starts = bucket_starts(from_timestamp, to_timestamp, bucket_size)
+        keys = [
+            self._bucket_key(asset, currency, indicator, window, interval_ms, start)
+            for start in starts
+        ]
+        entries = await self.cache.get_many(keys)
+
+        # Intervals ending by then no longer change and are cached
+        settled_end = settled_before - settled_before % interval_ms
+        stale = [
+            start
+            for start, entry in zip(starts, entries)
+            if entry is None or entry["through"] < min(start + bucket_size, settled_end)
+        ]
+        if stale:
+            warmup = INDICATORS[indicator].warmup(window) * interval_ms
+            fill_to = min(stale[-1] + bucket_size, settled_end) - 1
+            if fill_to > stale[0] - warmup:
+                await self.price_service.fill_range(
+                    stale[0] - warmup, fill_to, asset, currency
+                )
+
+        values: List[Tuple[List[int], List[Optional[float]]]] = []
+        updated: Dict[str, Any] = {}
+        for start, key, entry in zip(starts, keys, entries):
+            bucket_end = start + bucket_size
+            through = min(bucket_end, settled_end)
+            if entry is None or entry["through"] < through:
+                entry = await self._update_bucket(
+                    entry,
+                    indicator,
+                    window,
+                    interval_ms,
+                    start,
+                    through,
+                    asset,
+                    currency,
+                )
+                updated[key] = entry
+            timestamps, bucket_values = entry["timestamps"], entry["values"]
+
+            if entry["through"] < bucket_end:
+                # Unsettled intervals, stored by ingestion and continued from the
+                # cached state on every request
+                closes = await self._closes(
+                    entry["through"],
+                    min(bucket_end - 1, now),
+                    interval_ms,
+                    asset,
+                    currency,
+                )
+                recent, _ = extend(indicator, window, closes.prices, self._state(entry))
+                keep = closes.timestamps >= start
+                timestamps = timestamps + closes.timestamps[keep].tolist()
+                bucket_values = bucket_values + _json_values(recent[keep])
+            values.append((timestamps, bucket_values))
+
+        if updated:
+            await self.cache.set_many(updated, ttl=settings.CACHE_HISTORY_TTL)
+
+        first = from_timestamp - from_timestamp % interval_ms
+        return to_json(
+            {
+                "indicator": indicator,
+                "interval": interval_ms,
+                "window": window,
+                "values": [
+                    {"timestamp": timestamp, "value": value}
+                    for timestamps, bucket_values in reversed(values)
+                    for timestamp, value in zip(
+                        reversed(timestamps), reversed(bucket_values)
+                    )
+                    if first <= timestamp <= to_timestamp
+                ],
+            }
+        )
+
+    def _bucket_key(
+        self,
+        asset: str,
+        currency: str,
+        indicator: str,
+        window: int,
+        interval_ms: int,
+        start: int,
+    ) -> str:
+        return (
+            f"{asset}_{currency}_analytics_{indicator}_{window}_{interval_ms}_{start}"
+        )
+
+    def _state(self, entry: Dict[str, Any]) -> RollingState:
+        return RollingState(np.asarray(entry["tail"], dtype=np.float64), entry["last"])
+
+    async def _update_bucket(
+        self,
+        entry: Optional[Dict[str, Any]],
+        indicator: str,
+        window: int,
+        interval_ms: int,
+        start: int,
+        through: int,
+        asset: str,
+        currency: str,
+    ) -> Dict[str, Any]:
+        """Compute a bucket's settled intervals before through, or extend its entry
+
+        A new bucket is computed from warm-up intervals before its start on,
+        so its values do not depend on which buckets were cached before.
+        """
+        if entry is None:
+            read_from = start - INDICATORS[indicator].warmup(window) * interval_ms
+            entry = {"timestamps": [], "values": [], "tail": [], "last": None}
+            state = None
+        else:
+            read_from = entry["through"]
+            state = self._state(entry)
+
+        closes = await self._closes(
+            read_from, through - 1, interval_ms, asset, currency
+        )
+        values, state = extend(indicator, window, closes.prices, state)
+        keep = closes.timestamps >= start
+        return {
+            "through": through,
+            "timestamps": entry["timestamps"] + closes.timestamps[keep].tolist(),
+            "values": entry["values"] + _json_values(values[keep]),
+            "tail": state.tail.tolist(),
+            "last": state.last,
+        }
+
+    async def _closes(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        interval_ms: int,
+        asset: str,
+        currency: str,
+    ) -> PriceSeries:
+        """Close of each interval with data in the range, oldest first"""
+        if to_timestamp < from_timestamp:
+            return PriceSeries.empty()
+        rows = await self.repository.get_price_candles(
+            from_timestamp, to_timestamp, interval_ms, asset, currency
+        )
+        return PriceSeries.from_rows(
+            (row.timestamp, row.close) for row in reversed(rows)
+        )
@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.cache.redis_cache import close_redis_pool
+from app.core.config import get_settings
+from app.core.http_client import close_http_client
+from app.core.price_series import PriceSeries
+from app.core.rate_limiter import Priority, priority_scope
+from app.db.partitions import ensure_partitions
+from app.db.repository import AsyncPriceRepository
+from app.db.session import AsyncSessionLocal
+from app.services.coingecko_service import CoinGeckoService
+from app.services.coverage import (
+    DAY_MS,
+    FIVE_MINUTES_MS,
+    HOUR_MS,
+    MAX_FETCH_SPAN_MS,
+    Interval,
+    granularity_for_range,
+    missing_intervals,
+    split_interval,
+)
+from app.services.price_service import normalize_timestamp, parse_price_points
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Daily ranges have no upper bound, a year per request keeps chunks small
+# enough to checkpoint often
+DAILY_CHUNK_SPAN_MS = 365 * DAY_MS
+
+GRANULARITIES = {"auto": None, "hourly": HOUR_MS, "daily": DAY_MS}
+
+
+@dataclass
+class BackfillStats:
+    chunks: int = 0
+    failed: int = 0
+    fetched: int = 0
+    inserted: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.fetched / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def plan_segments(
+    from_timestamp: int, to_timestamp: int, now: int, granularity: Optional[int]
+) -> List[Tuple[Interval, int]]:
+    """Split the window into parts fetched at one granularity each
+
+    Auto picks the finest data CoinGecko has: 5-minutely for the last day,
+    hourly before that.
+    """
+    if granularity is not None:
+        return [((from_timestamp, to_timestamp), granularity)]
+
+    recent_from = max(from_timestamp, now - DAY_MS)
+    segments = []
+    if from_timestamp < recent_from:
+        segments.append(((from_timestamp, min(to_timestamp, recent_from - 1)), HOUR_MS))
+    if to_timestamp >= recent_from:
+        segments.append(((recent_from, to_timestamp), FIVE_MINUTES_MS))
+    return segments
+
+
+def chunk_span(granularity: int) -> Optional[int]:
+    """Widest request that still comes back at this granularity"""
+    if granularity == DAY_MS:
+        return DAILY_CHUNK_SPAN_MS
+    return MAX_FETCH_SPAN_MS[granularity]
+
+
+class Backfill:
+    """Load a long window of history in parallel chunks under the rate limit
+
+    Completed chunks are recorded in price_coverage, which doubles as the
+    checkpoint: a rerun only fetches what is not covered yet.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+        granularity: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.asset = asset
+        self.currency = currency
+        self.granularity = granularity
+        self.concurrency = concurrency or settings.BACKFILL_CONCURRENCY
+        self.batch_size = batch_size or settings.BACKFILL_BATCH_SIZE
+        self.coingecko = CoinGeckoService()
+
+    def _now(self) -> int:
+        return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+    async def plan(
+        self,
+        repository: AsyncPriceRepository,
+        from_timestamp: int,
+        to_timestamp: int,
+        now: int,
+    ) -> List[Tuple[Interval, int]]:
+        """Chunks of the window not covered yet, with the granularity to record"""
+        chunks = []
+        for (seg_from, seg_to), granularity in plan_segments(
+            from_timestamp, to_timestamp, now, self.granularity
+        ):
+            covered = await repository.get_coverage(
+                seg_from, seg_to, granularity, self.asset, self.currency
+            )
+            for gap in missing_intervals(seg_from, seg_to, covered):
+                if gap[1] - gap[0] < granularity:
+                    continue
+                chunks.extend(
+                    (chunk, granularity_for_range(*chunk, now))
+                    for chunk in split_interval(gap, chunk_span(granularity))
+                )
+        return chunks
+
+    async def run(self, from_timestamp: int, to_timestamp: int) -> BackfillStats:
+        """Fetch every uncovered chunk of the window and store it"""
+        with priority_scope(Priority.BACKFILL):
+            return await self._run(
+                normalize_timestamp(from_timestamp), normalize_timestamp(to_timestamp)
+            )
+
+    async def _run(self, from_timestamp: int, to_timestamp: int) -> BackfillStats:
+        stats = BackfillStats()
+        now = self._now()
+
+        async with self.session_factory() as db:
+            repository = AsyncPriceRepository(db)
+            # Old months would otherwise all land in the default partition
+            await ensure_partitions(db, from_timestamp, to_timestamp)
+            chunks = await self.plan(repository, from_timestamp, to_timestamp, now)
+            logger.info(
+                "Backfilling %s/%s: %d chunks", self.asset, self.currency, len(chunks)
+            )
+
+            # Fetchers hand results to this session through a bounded queue, so
+            # memory stays at a few chunks however long the window is
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def fetch(chunk: Interval, granularity: int) -> None:
+                async with semaphore:
+                    try:
+                        data = await self.coingecko.get_price_history_range(
+                            *chunk, asset=self.asset, currency=self.currency
+                        )
+                        result = parse_price_points(data)
+                    except Exception as e:
+                        result = e
+                    await queue.put((chunk, granularity, result))
+
+            fetchers = [
+                asyncio.create_task(fetch(chunk, granularity))
+                for chunk, granularity in chunks
+            ]
+            try:
+                for _ in chunks:
+                    chunk, granularity, result = await queue.get()
+                    if isinstance(result, Exception):
+                        stats.failed += 1
+                        logger.warning("Chunk %s failed: %s", chunk, result)
+                        continue
+                    await self._store(
+                        repository, chunk, granularity, result, now, stats
+                    )
+            finally:
+                for task in fetchers:
+                    task.cancel()
+                await asyncio.gather(*fetchers, return_exceptions=True)
+
+        logger.info(
+            "Backfilled %d rows (%d new) in %d chunks, %d failed, %.1fs, %.0f rows/s",
+            stats.fetched,
+            stats.inserted,
+            stats.chunks,
+            stats.failed,
+            stats.elapsed,
+            stats.rows_per_second,
+        )
+        return stats
+
+    async def _store(
+        self,
+        repository: AsyncPriceRepository,
+        chunk: Interval,
+        granularity: int,
+        points: PriceSeries,
+        now: int,
+        stats: BackfillStats,
+    ) -> None:
+        """Insert a chunk in fixed-size batches, then checkpoint it"""
+        for start in range(0, len(points), self.batch_size):
+            stats.inserted += await repository.insert_price_points(
+                points[start : start + self.batch_size], self.asset, self.currency
+            )
+        stats.fetched += len(points)
+        stats.chunks += 1
+
+        chunk_from, chunk_to = chunk
+        covered_to = min(chunk_to, now - settings.COVERAGE_SETTLE_SECONDS * 1000)
+        if covered_to > chunk_from:
+            await repository.add_coverage(
+                chunk_from, covered_to, granularity, self.asset, self.currency
+            )
+
+        logger.info(
+            "Stored %d rows for %s, %d chunks done, %.0f rows/s",
+            len(points),
+            chunk,
+            stats.chunks,
+            stats.rows_per_second,
+        )
+
+
+def parse_time(value: str) -> int:
+    """Millisecond timestamp from Unix seconds or milliseconds, or an ISO date"""
+    if value.isdigit():
+        return normalize_timestamp(int(value))
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    """Backfill price history from the command line"""
+    parser = argparse.ArgumentParser(
+        prog="python -m app.services.backfill",
+        description="Load price history into price_points, resuming where a "
+        "previous run stopped",
+    )
+    parser.add_argument("--from", dest="from_time", type=parse_time, required=True)
+    parser.add_argument("--to", dest="to_time", type=parse_time, default=None)
+    parser.add_argument("--asset", default="bitcoin")
+    parser.add_argument("--currency", default="usd")
+    parser.add_argument("--granularity", choices=GRANULARITIES, default="auto")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    backfill = Backfill(
+        asset=args.asset,
+        currency=args.currency,
+        granularity=GRANULARITIES[args.granularity],
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+    )
+    try:
+        stats = await backfill.run(args.from_time, args.to_time or backfill._now())
+    finally:
+        await close_http_client()
+        await close_redis_pool()
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
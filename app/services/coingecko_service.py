@@ -1,60 +1,197 @@
-from typing import Dict, Any
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional
+import asyncio
 import httpx
+from app.core.circuit_breaker import CircuitBreaker, get_circuit_breaker
 from app.core.config import get_settings
+from app.core.http_client import get_http_client
 from app.core.exceptions import CoinGeckoRateLimitError, CoinGeckoAPIError
+from app.core.metrics import UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+from app.core.rate_limiter import (
+    Priority,
+    RateGovernor,
+    backoff_delay,
+    current_priority,
+    get_rate_governor,
+)
+from app.core.tracing import traced
 
 settings = get_settings()
 
 
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
 class CoinGeckoService:
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        governor: Optional[RateGovernor] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.client = client or get_http_client()
+        self.governor = governor or get_rate_governor()
+        self.breaker = breaker or get_circuit_breaker()
         self.base_url = settings.COINGECKO_BASE_URL
         self.api_key = settings.COINGECKO_API_KEY
         self.headers = {"accept": "application/json", "x-cg-demo-api-key": self.api_key}
 
+    @traced("coingecko.request")
     async def _make_request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
-        """Make HTTP request with error handling"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.request(method, url, **kwargs)
+        """Make HTTP request through the rate governor, retrying transient errors
+
+        429s honor Retry-After across every caller sharing the governor, 5xx
+        and network errors back off exponentially with jitter. Interactive
+        requests give up once COINGECKO_INTERACTIVE_BUDGET seconds are spent,
+        and every request fails fast while the circuit breaker is open.
+        """
+        priority = current_priority()
+        loop = asyncio.get_running_loop()
+        deadline = (
+            loop.time() + settings.COINGECKO_INTERACTIVE_BUDGET
+            if priority == Priority.INTERACTIVE
+            else None
+        )
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.before_call()
+
+            delay = None
+            give_up = False
+            # Whether CoinGecko answered sanely, None if it was not reached
+            healthy: Optional[bool] = None
+            try:
+                if self.governor is not None:
+                    wait_limit = None
+                    if deadline is not None:
+                        # Waiting for a slot is spent from the request budget
+                        wait_limit = min(
+                            settings.COINGECKO_RATE_LIMIT_MAX_WAIT,
+                            deadline - loop.time(),
+                        )
+                        if wait_limit <= 0:
+                            raise CoinGeckoAPIError(
+                                "CoinGecko request budget exhausted"
+                            )
+                    await self.governor.acquire(priority, timeout=wait_limit)
+                if deadline is not None:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise CoinGeckoAPIError("CoinGecko request budget exhausted")
+                    # Keeps the short connect timeout, so a dead host fails fast
+                    kwargs["timeout"] = httpx.Timeout(
+                        min(remaining, settings.COINGECKO_TIMEOUT),
+                        connect=min(remaining, settings.COINGECKO_CONNECT_TIMEOUT),
+                    )
+                started = loop.time()
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                except httpx.RequestError:
+                    UPSTREAM_REQUESTS.labels("error").inc()
+                    raise
+                finally:
+                    UPSTREAM_SECONDS.observe(loop.time() - started)
+                UPSTREAM_REQUESTS.labels(str(response.status_code)).inc()
+                healthy = response.status_code < 500
 
                 if response.status_code == 429:
-                    raise CoinGeckoRateLimitError("Rate limit exceeded")
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    error = CoinGeckoRateLimitError(
+                        "Rate limit exceeded", retry_after=retry_after
+                    )
+                    if retry_after is not None:
+                        delay = retry_after
+                        if self.governor is not None:
+                            # The governor holds back every caller until then
+                            await self.governor.block(retry_after)
+                            delay = 0.0
+                        # Too long for a user to wait, fail without retrying
+                        give_up = (
+                            priority == Priority.INTERACTIVE
+                            and retry_after > settings.COINGECKO_RATE_LIMIT_MAX_WAIT
+                        )
+                    raise error
 
                 response.raise_for_status()
                 return response.json()
 
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 400:
-                raise CoinGeckoAPIError(f"Bad request: {e.response.text}")
-            raise CoinGeckoAPIError(f"API error: {str(e)}")
-        except httpx.RequestError as e:
-            raise CoinGeckoAPIError(f"Network error: {str(e)}")
+            except CoinGeckoRateLimitError as e:
+                if give_up:
+                    raise
+                error = e
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 400:
+                    raise CoinGeckoAPIError(f"Bad request: {e.response.text}")
+                if e.response.status_code < 500:
+                    raise CoinGeckoAPIError(f"API error: {str(e)}")
+                error = CoinGeckoAPIError(f"API error: {str(e)}")
+            except httpx.RequestError as e:
+                healthy = False
+                error = CoinGeckoAPIError(f"Network error: {str(e)}")
+            finally:
+                if self.breaker is not None:
+                    self.breaker.record(healthy)
+
+            if attempt >= settings.COINGECKO_MAX_RETRIES:
+                raise error
+            wait = backoff_delay(attempt) if delay is None else delay
+            if deadline is not None and loop.time() + wait >= deadline:
+                raise error
+            await asyncio.sleep(wait)
+            attempt += 1
 
-    async def get_current_price(self) -> Dict[str, Any]:
-        """Fetch current Bitcoin price in USD"""
+    async def get_current_prices(
+        self, assets: List[str], currencies: List[str]
+    ) -> Dict[str, Any]:
+        """Fetch current prices for several assets and currencies in one request"""
         return await self._make_request(
             "GET",
             f"{self.base_url}/simple/price",
             params={
-                "ids": "bitcoin",
-                "vs_currencies": "usd",
+                "ids": ",".join(assets),
+                "vs_currencies": ",".join(currencies),
                 "include_last_updated_at": "true",
                 "precision": "3",
             },
             headers=self.headers,
         )
 
+    async def get_current_price(
+        self, asset: str = "bitcoin", currency: str = "usd"
+    ) -> Dict[str, Any]:
+        """Fetch current price of one asset, Bitcoin in USD by default"""
+        return await self.get_current_prices([asset], [currency])
+
     async def get_price_history_range(
-        self, from_timestamp: int, to_timestamp: int
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
     ) -> Dict[str, Any]:
-        """Fetch Bitcoin price history for specific range"""
+        """Fetch price history of one asset for specific range"""
         from_seconds = from_timestamp // 1000
         to_seconds = to_timestamp // 1000
 
-        url = f"{self.base_url}/coins/bitcoin/market_chart/range"
+        url = f"{self.base_url}/coins/{asset}/market_chart/range"
         params = {
-            "vs_currency": "usd",
+            "vs_currency": currency,
             "from": from_seconds,
             "to": to_seconds,
             "precision": "3",
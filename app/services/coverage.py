@@ -0,0 +1,88 @@
+from typing import Iterable, List, Optional, Tuple
+
+Interval = Tuple[int, int]
+
+FIVE_MINUTES_MS = 5 * 60 * 1000
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+
+# Longest window CoinGecko answers at each granularity, None means unbounded
+MAX_FETCH_SPAN_MS = {
+    FIVE_MINUTES_MS: DAY_MS,
+    HOUR_MS: 90 * DAY_MS,
+    DAY_MS: None,
+}
+
+# Cache bucket width for each granularity, so a bucket holds a few dozen points
+BUCKET_SIZE_MS = {
+    FIVE_MINUTES_MS: HOUR_MS,
+    HOUR_MS: DAY_MS,
+    DAY_MS: 30 * DAY_MS,
+}
+
+
+def granularity_for_range(from_timestamp: int, to_timestamp: int, now: int) -> int:
+    """Granularity CoinGecko's market_chart/range returns for a window in ms
+
+    5-minutely data only exists for the last day, windows up to 90 days are
+    hourly and anything longer is daily.
+    """
+    span = to_timestamp - from_timestamp
+    if span <= DAY_MS and from_timestamp >= now - DAY_MS:
+        return FIVE_MINUTES_MS
+    if span <= 90 * DAY_MS:
+        return HOUR_MS
+    return DAY_MS
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Merge overlapping or touching intervals into a sorted disjoint list"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_intervals(
+    from_timestamp: int, to_timestamp: int, covered: Iterable[Interval]
+) -> List[Interval]:
+    """Parts of [from_timestamp, to_timestamp] not inside any covered interval"""
+    missing: List[Interval] = []
+    cursor = from_timestamp
+    for start, end in merge_intervals(covered):
+        if end < cursor:
+            continue
+        if start > to_timestamp:
+            break
+        if start > cursor:
+            missing.append((cursor, start - 1))
+        cursor = end + 1
+        if cursor > to_timestamp:
+            return missing
+    missing.append((cursor, to_timestamp))
+    return missing
+
+
+def split_interval(interval: Interval, max_span: Optional[int]) -> List[Interval]:
+    """Split an interval into consecutive chunks no longer than max_span"""
+    start, end = interval
+    if max_span is None or end - start <= max_span:
+        return [interval]
+
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + max_span, end)
+        chunks.append((start, chunk_end))
+        start = chunk_end + 1
+    return chunks
+
+
+def bucket_starts(
+    from_timestamp: int, to_timestamp: int, bucket_size: int
+) -> List[int]:
+    """Starts of the epoch-aligned buckets overlapping the range, oldest first"""
+    first = from_timestamp - from_timestamp % bucket_size
+    return list(range(first, to_timestamp + 1, bucket_size))
@@ -0,0 +1,21 @@
+from app.schemas.price import INTERVALS_MS
+
+
+def bucket_count(from_timestamp: int, to_timestamp: int, interval: int) -> int:
+    """Number of epoch-aligned buckets of width interval the range touches"""
+    first = from_timestamp - from_timestamp % interval
+    last = to_timestamp - to_timestamp % interval
+    return (last - first) // interval + 1
+
+
+def interval_for_max_points(
+    from_timestamp: int, to_timestamp: int, max_points: int
+) -> int:
+    """Smallest supported interval that keeps the range within max_points buckets"""
+    for interval in sorted(INTERVALS_MS.values()):
+        if bucket_count(from_timestamp, to_timestamp, interval) <= max_points:
+            return interval
+    raise ValueError(
+        f"range holds more than {max_points} buckets of the widest interval, "
+        "raise max_points"
+    )
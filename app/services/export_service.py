@@ -0,0 +1,50 @@
+from typing import AsyncIterator, Callable, Dict, Tuple
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.config import get_settings
+from app.db.repository import AsyncPriceRepository
+
+settings = get_settings()
+
+
+def _ndjson_row(timestamp: int, price: float) -> str:
+    return f'{{"timestamp":{timestamp},"price":{price!r}}}\n'
+
+
+def _csv_row(timestamp: int, price: float) -> str:
+    return f"{timestamp},{price!r}\n"
+
+
+# format -> (media type, header line, row formatter)
+EXPORT_FORMATS: Dict[str, Tuple[str, str, Callable[[int, float], str]]] = {
+    "ndjson": ("application/x-ndjson", "", _ndjson_row),
+    "csv": ("text/csv", "timestamp,price\n", _csv_row),
+}
+
+
+async def stream_price_export(
+    session_factory: async_sessionmaker,
+    from_timestamp: int,
+    to_timestamp: int,
+    export_format: str,
+    asset: str = "bitcoin",
+    currency: str = "usd",
+) -> AsyncIterator[str]:
+    """Yield a price range as NDJSON or CSV, one chunk per cursor batch
+
+    Opens its own session because the request session is closed before a
+    streamed body is sent.
+    """
+    _, header, format_row = EXPORT_FORMATS[export_format]
+    if header:
+        yield header
+
+    async with session_factory() as db:
+        repository = AsyncPriceRepository(db)
+        async for rows in repository.stream_price_range(
+            from_timestamp,
+            to_timestamp,
+            settings.EXPORT_BATCH_SIZE,
+            asset,
+            currency,
+        ):
+            yield "".join(format_row(timestamp, price) for timestamp, price in rows)
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Kernels take prices oldest first and return one value per price, NaN where
+# the window does not have enough history yet
+
+
+def log_returns(prices: np.ndarray, window: int = 1) -> np.ndarray:
+    """Log return of each price over the previous one"""
+    values = np.full(len(prices), np.nan)
+    if len(prices) > 1:
+        values[1:] = np.diff(np.log(prices))
+    return values
+
+
+def sma(prices: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average of the last window prices"""
+    values = np.full(len(prices), np.nan)
+    if len(prices) >= window:
+        sums = np.cumsum(np.concatenate(([0.0], prices)))
+        values[window - 1 :] = (sums[window:] - sums[:-window]) / window
+    return values
+
+
+def ema(prices: np.ndarray, window: int, initial: Optional[float] = None) -> np.ndarray:
+    """Exponential moving average with alpha = 2 / (window + 1)
+
+    Continues from initial, the average before the first price, or starts at
+    the first price. Uses the closed form
+    ema[k] = decay^k * (initial + alpha * sum(prices[i] / decay^i, i <= k)),
+    evaluated in blocks short enough that decay^-k cannot overflow.
+    """
+    values = np.empty(len(prices))
+    if not len(prices):
+        return values
+    alpha = 2.0 / (window + 1)
+    decay = 1.0 - alpha
+    block = max(1, int(600 / -np.log(decay)))
+    last = prices[0] if initial is None else initial
+    for start in range(0, len(prices), block):
+        chunk = prices[start : start + block]
+        weights = decay ** np.arange(1, len(chunk) + 1)
+        values[start : start + len(chunk)] = weights * (
+            last + alpha * np.cumsum(chunk / weights)
+        )
+        last = values[start + len(chunk) - 1]
+    return values
+
+
+def rolling_volatility(prices: np.ndarray, window: int) -> np.ndarray:
+    """Sample standard deviation of the last window log returns, not annualized"""
+    values = np.full(len(prices), np.nan)
+    if len(prices) > window:
+        returns = np.diff(np.log(prices))
+        values[window:] = sliding_window_view(returns, window).std(axis=1, ddof=1)
+    return values
+
+
+def drawdown(prices: np.ndarray, window: int) -> np.ndarray:
+    """Fall of each price from the highest of the last window prices, <= 0"""
+    values = np.full(len(prices), np.nan)
+    if len(prices) >= window:
+        peaks = sliding_window_view(prices, window).max(axis=1)
+        values[window - 1 :] = prices[window - 1 :] / peaks - 1.0
+    return values
+
+
+class Indicator(NamedTuple):
+    kernel: Callable[..., np.ndarray]
+    # Trailing prices a new value depends on, besides its own
+    lookback: Callable[[int], int]
+    # Prices read before a range to warm the indicator up
+    warmup: Callable[[int], int]
+    # Continues from its last value rather than from trailing prices
+    recursive: bool = False
+
+
+INDICATORS: Dict[str, Indicator] = {
+    "log_return": Indicator(log_returns, lambda w: 1, lambda w: 1),
+    "sma": Indicator(sma, lambda w: w - 1, lambda w: w - 1),
+    # Older prices weigh under (1 - alpha)^(4 * window), about e^-8
+    "ema": Indicator(ema, lambda w: 0, lambda w: 4 * w, recursive=True),
+    "volatility": Indicator(rolling_volatility, lambda w: w, lambda w: w),
+    "drawdown": Indicator(drawdown, lambda w: w - 1, lambda w: w - 1),
+}
+
+
+@dataclass
+class RollingState:
+    """What continuing an indicator needs: its trailing prices and last value"""
+
+    tail: np.ndarray
+    last: Optional[float] = None
+
+
+def extend(
+    name: str, window: int, prices: np.ndarray, state: Optional[RollingState] = None
+) -> Tuple[np.ndarray, RollingState]:
+    """Values of an indicator for new prices, continuing from state
+
+    Only the new prices and the few trailing ones kept in state are computed
+    over, so appending to a series does not recompute it from the start.
+    """
+    indicator = INDICATORS[name]
+    tail = state.tail if state is not None else np.empty(0)
+    inputs = np.concatenate((tail, prices))
+    if indicator.recursive:
+        initial = state.last if state is not None else None
+        values = indicator.kernel(prices, window, initial)
+    else:
+        values = indicator.kernel(inputs, window)[len(tail) :]
+
+    lookback = indicator.lookback(window)
+    last = values[-1] if len(values) else (state.last if state is not None else None)
+    return values, RollingState(
+        inputs[max(len(inputs) - lookback, 0) :] if lookback else np.empty(0),
+        None if last is None or np.isnan(last) else float(last),
+    )
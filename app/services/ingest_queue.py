@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.config import get_settings
+from app.core.metrics import INGEST_DROPPED, INGEST_QUEUE_ROWS
+from app.db.repository import AsyncPriceRepository
+from app.db.session import AsyncSessionLocal
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# (asset, currency, timestamp, price), as taken by create_latest_prices
+Row = Tuple[str, str, int, float]
+
+
+class IngestQueue:
+    """Write-behind buffer storing current prices off the request path
+
+    Rows are kept by (asset, currency, timestamp), so a price fetched by
+    several requests is written once. A background task stores them every
+    flush_interval seconds, or as soon as batch_size rows wait, in one
+    ON CONFLICT DO NOTHING insert. At most max_rows wait besides the batch
+    being written: put waits for a flush to make room and drops its rows
+    after put_timeout seconds, so a database that is down does not hold
+    requests up for long.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        put_timeout: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.INGEST_FLUSH_ROWS
+        self.flush_interval = flush_interval or settings.INGEST_FLUSH_INTERVAL
+        self.max_rows = max_rows or settings.INGEST_QUEUE_MAX_ROWS
+        self.put_timeout = (
+            settings.INGEST_QUEUE_PUT_TIMEOUT if put_timeout is None else put_timeout
+        )
+        self.pending: Dict[Tuple[str, str, int], float] = {}
+        self.flushed = 0
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self._reset_events()
+
+    def _reset_events(self) -> None:
+        # Waiting binds these to the running loop, each start gets its own
+        self._wakeup = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def put(self, rows: Iterable[Row]) -> None:
+        """Buffer rows for the next flush, waiting while the buffer is full"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.put_timeout
+        rows = list(rows)
+        for i, (asset, currency, timestamp, price) in enumerate(rows):
+            key = (asset, currency, timestamp)
+            while key not in self.pending and len(self.pending) >= self.max_rows:
+                self._room.clear()
+                self._wakeup.set()
+                try:
+                    await asyncio.wait_for(
+                        self._room.wait(), max(deadline - loop.time(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    self._drop(len(rows) - i)
+                    return
+            self.pending[key] = price
+        INGEST_QUEUE_ROWS.set(len(self.pending))
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def _drop(self, count: int) -> None:
+        self.dropped += count
+        INGEST_DROPPED.inc(count)
+        logger.warning("Ingest queue full, dropped %d price points", count)
+
+    async def flush(self) -> int:
+        """Store every buffered row in one insert, returning how many there were
+
+        Rows that fail to store go back to the buffer, as far as it has room.
+        """
+        async with self._lock:
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+            self._room.set()
+            try:
+                async with self.session_factory() as db:
+                    await AsyncPriceRepository(db).create_latest_prices(
+                        [(*key, price) for key, price in batch.items()]
+                    )
+            except Exception:
+                # Newer rows stay ahead of the ones being retried
+                retry = dict(list(batch.items())[: self.max_rows - len(self.pending)])
+                if len(retry) < len(batch):
+                    self._drop(len(batch) - len(retry))
+                self.pending = {**retry, **self.pending}
+                raise
+            finally:
+                INGEST_QUEUE_ROWS.set(len(self.pending))
+            self.flushed += len(batch)
+            return len(batch)
+
+    def info(self) -> Dict[str, int]:
+        return {
+            "pending": len(self.pending),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+        }
+
+    def start(self) -> None:
+        if self._task is None:
+            self._reset_events()
+            self._task = asyncio.create_task(self._flush_forever())
+
+    async def stop(self) -> None:
+        """Stop the background writer and store what is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Lost %d buffered price points: %s", len(self.pending), e)
+
+    async def _flush_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Storing buffered price points failed: %s", e)
+                # Give the database a moment rather than retrying right away
+                await asyncio.sleep(self.flush_interval)
+
+
+_queue: Optional[IngestQueue] = None
+
+
+def get_ingest_queue() -> IngestQueue:
+    """Get the process-wide queue, creating it on first use"""
+    global _queue
+    if _queue is None:
+        _queue = IngestQueue()
+    return _queue
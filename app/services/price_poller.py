@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.cache.redis_cache import RedisCache, close_redis_pool
+from app.core.config import get_settings
+from app.core.http_client import close_http_client
+from app.core.rate_limiter import Priority, priority_scope
+from app.db.repository import AsyncPriceRepository
+from app.db.session import AsyncSessionLocal
+from app.schemas.price import CurrentPriceResponse
+from app.services.coingecko_service import CoinGeckoService
+from app.services.price_service import (
+    current_price_cache_key,
+    current_price_cache_value,
+    parse_current_prices,
+)
+from app.services.price_stream import publish_prices
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class PricePoller:
+    """Poll CoinGecko on a schedule, writing through to Redis and batching inserts
+
+    Every tracked asset/currency pair is refreshed with one /simple/price request.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval or settings.PRICE_POLL_INTERVAL
+        self.batch_size = batch_size or settings.PRICE_POLLER_BATCH_SIZE
+        self.coingecko = CoinGeckoService()
+        self.cache = RedisCache()
+        self.assets = list(settings.TRACKED_ASSETS)
+        self.currencies = list(settings.TRACKED_CURRENCIES)
+        self.pending: List[Tuple[str, str, int, float]] = []
+        self.last_timestamps: Dict[Tuple[str, str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def poll_once(self) -> Dict[Tuple[str, str], CurrentPriceResponse]:
+        """Fetch current prices of all tracked pairs, cache them and queue them"""
+        prices = parse_current_prices(
+            await self.coingecko.get_current_prices(self.assets, self.currencies),
+            self.assets,
+            self.currencies,
+        )
+        now = int(datetime.now(timezone.utc).timestamp() * 1000)
+        await self.cache.set_many(
+            {
+                current_price_cache_key(*pair): current_price_cache_value(current, now)
+                for pair, current in prices.items()
+            }
+        )
+
+        # CoinGecko only updates every few polls, skip repeats of the same point
+        changed = {}
+        for (asset, currency), current in prices.items():
+            if current.timestamp != self.last_timestamps.get((asset, currency)):
+                self.last_timestamps[(asset, currency)] = current.timestamp
+                self.pending.append((asset, currency, current.timestamp, current.price))
+                changed[(asset, currency)] = current
+        await publish_prices(self.cache, changed)
+
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        return prices
+
+    async def flush(self) -> None:
+        """Insert buffered prices in one batch"""
+        if not self.pending:
+            return
+        points, self.pending = self.pending, []
+        try:
+            async with self.session_factory() as db:
+                await AsyncPriceRepository(db).create_latest_prices(points)
+        except Exception:
+            # Keep the points for the next flush rather than dropping them
+            self.pending = points + self.pending
+            raise
+
+    async def run(self) -> None:
+        """Poll until cancelled, queued behind interactive CoinGecko requests"""
+        with priority_scope(Priority.POLLING):
+            await self._poll_forever()
+
+    async def _poll_forever(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+            except Exception:
+                logger.exception("Price poll failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start polling in a background task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop polling and store anything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+async def main() -> None:
+    """Run the poller as its own process, for PRICE_POLLER_MODE=external"""
+    logging.basicConfig(level=logging.INFO)
+    poller = PricePoller()
+    try:
+        await poller.run()
+    finally:
+        await poller.flush()
+        await close_http_client()
+        await close_redis_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
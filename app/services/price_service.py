@@ -1,86 +1,748 @@
-from app.db.repository import PriceRepository
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from app.core.config import get_settings
+from app.core.exceptions import CoinGeckoAPIError, CoinGeckoRateLimitError
+from app.core.metrics import stage_timer
+from app.core.price_series import PriceSeries
+from app.core.rate_limiter import Priority, priority_scope
+from app.db.repository import AsyncPriceRepository
+from app.db.session import AsyncSessionLocal
 from app.schemas.price import (
+    INTERVALS_MS,
+    AssetPriceResponse,
     CurrentPriceResponse,
+    PriceCandle,
     PriceHistoryResponse,
     PricePoint,
 )
 from app.services.coingecko_service import CoinGeckoService
+from app.services.price_stream import publish_prices
+from app.services.downsampling import interval_for_max_points
+from app.services.ingest_queue import get_ingest_queue
+from app.services.coverage import (
+    BUCKET_SIZE_MS,
+    MAX_FETCH_SPAN_MS,
+    bucket_starts,
+    granularity_for_range,
+    missing_intervals,
+    split_interval,
+)
+from app.cache.local_cache import get_local_cache
 from app.cache.redis_cache import RedisCache
-from sqlalchemy.orm import Session
+from app.cache.singleflight import SingleFlight
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Shared by every PriceService in the process so concurrent cache misses coalesce
+single_flight = SingleFlight()
+
+# Background refreshes of current prices past their soft TTL, by flight key
+_refreshes: Dict[str, asyncio.Task] = {}
+
+Pair = Tuple[str, str]
+
+T = TypeVar("T")
+
+
+def normalize_timestamp(timestamp: int) -> int:
+    """Convert timestamp to milliseconds if needed"""
+    return timestamp * 1000 if len(str(timestamp)) == 10 else timestamp
+
+
+def current_price_cache_key(asset: str, currency: str) -> str:
+    return f"{asset}_{currency}_current_price"
+
+
+def current_price_cache_value(
+    current: CurrentPriceResponse, cached_at: int
+) -> Dict[str, Any]:
+    """Cache entry of a current price, with when it was cached for the soft TTL"""
+    return {**current.model_dump(), "cached_at": cached_at}
+
+
+def parse_current_prices(
+    data: Dict[str, Any], assets: List[str], currencies: List[str]
+) -> Dict[Tuple[str, str], CurrentPriceResponse]:
+    """Build current prices from a /simple/price response, keyed by (asset, currency)
+
+    CoinGecko leaves out unknown ids and currencies, so those pairs are missing.
+    """
+    prices = {}
+    for asset in assets:
+        price_data = data.get(asset) or {}
+        last_updated_at = price_data.get("last_updated_at")
+        for currency in currencies:
+            if price_data.get(currency) is None or last_updated_at is None:
+                continue
+            prices[(asset, currency)] = CurrentPriceResponse(
+                price=price_data[currency],
+                timestamp=normalize_timestamp(last_updated_at),
+            )
+    return prices
+
+
+def parse_price_points(data: Dict[str, Any]) -> PriceSeries:
+    """Extract valid (timestamp, price) points from a market_chart response"""
+    return PriceSeries.from_market_chart(data)
+
+
+def _union(*lists: List[str]) -> List[str]:
+    """Concatenate lists, dropping repeats but keeping order"""
+    return list(dict.fromkeys(item for items in lists for item in items))
 
 
 class PriceService:
-    def __init__(self, db: Session):
-        self.repository = PriceRepository(db)
+    def __init__(
+        self, db: AsyncSession, session_factory: Optional[async_sessionmaker] = None
+    ):
+        self.repository = AsyncPriceRepository(db)
         self.coingecko = CoinGeckoService()
         self.cache = RedisCache()
-        self.cache_key = "bitcoin_current_price"
+        # For background work that outlives the request session
+        self.session_factory = session_factory or AsyncSessionLocal
+
+    def _now(self) -> int:
+        return int(datetime.now(timezone.utc).timestamp() * 1000)
 
     def _normalize_timestamp(self, timestamp: int) -> int:
         """Convert timestamp to milliseconds if needed"""
-        return timestamp * 1000 if len(str(timestamp)) == 10 else timestamp
+        return normalize_timestamp(timestamp)
+
+    async def _coalesce(
+        self,
+        flight_key: str,
+        fetch: Callable[[], Awaitable[T]],
+        load_cached: Callable[[], Awaitable[Optional[T]]],
+    ) -> T:
+        """Run fetch for a cache miss at most once per key
+
+        load_cached re-reads the result from the cache and returns None while
+        it is still missing, which lets waiters on another worker pick it up.
+        Upstream errors are replayed for CACHE_NEGATIVE_TTL seconds instead of
+        retried by every request.
+        """
+        errors = get_local_cache()
+        error = errors.get_error(flight_key)
+        if error is not None:
+            raise error.with_traceback(None)
+
+        try:
+            return await single_flight.do(
+                flight_key,
+                lambda: self._fetch_with_lock(flight_key, fetch, load_cached),
+            )
+        except (CoinGeckoAPIError, CoinGeckoRateLimitError) as e:
+            errors.set_error(flight_key, e, settings.CACHE_NEGATIVE_TTL)
+            raise
+
+    async def _fetch_with_lock(
+        self,
+        flight_key: str,
+        fetch: Callable[[], Awaitable[T]],
+        load_cached: Callable[[], Awaitable[Optional[T]]],
+    ) -> T:
+        """Guard fetch with a Redis lock so only one worker refills the key"""
+        if not settings.CACHE_LOCK_ENABLED:
+            return await fetch()
+
+        lock_key = f"lock:{flight_key}"
+        token = await self.cache.acquire_lock(lock_key, settings.CACHE_LOCK_TTL)
+        if token is None:
+            cached = await self._wait_for_cache(lock_key, load_cached)
+            if cached is not None:
+                return cached
+            return await fetch()
+
+        try:
+            # Another worker may have refilled the key before we took the lock
+            cached = await load_cached()
+            if cached is not None:
+                return cached
+            return await fetch()
+        finally:
+            await self.cache.release_lock(lock_key, token)
+
+    async def _wait_for_cache(
+        self, lock_key: str, load_cached: Callable[[], Awaitable[Optional[T]]]
+    ) -> Optional[T]:
+        """Poll the cache while another worker holds the lock"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.CACHE_LOCK_TTL
+        while loop.time() < deadline:
+            await asyncio.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+            cached = await load_cached()
+            if cached is not None:
+                return cached
+            if not await self.cache.exists(lock_key):
+                # Holder finished without filling the cache, fetch ourselves
+                break
+        return None
+
+    async def get_current_price(
+        self, asset: str = "bitcoin", currency: str = "usd"
+    ) -> CurrentPriceResponse:
+        """Get current price of one asset from cache or API"""
+        prices = await self.get_current_prices([asset], [currency])
+        if not prices:
+            raise LookupError(f"No price for {asset} in {currency}")
+        return CurrentPriceResponse(
+            price=prices[0].price, timestamp=prices[0].timestamp, stale=prices[0].stale
+        )
+
+    async def get_current_prices(
+        self, assets: List[str], currencies: List[str]
+    ) -> List[AssetPriceResponse]:
+        """Get current prices for every asset/currency pair from cache or API
+
+        When a poller keeps the cache warm this is a pure cache read. If the
+        poller falls behind, the latest stored price is served marked stale.
+        Otherwise all missing pairs, plus the tracked ones, are filled with a
+        single /simple/price request. Pairs CoinGecko does not know are left out,
+        and not fetched again for CACHE_NEGATIVE_TTL seconds.
+
+        Cached prices past CACHE_SOFT_TTL are served as is while a background
+        task refreshes them. When CoinGecko fails, or its circuit breaker is
+        open, the latest stored prices are served marked stale instead.
+        """
+        pairs = [(asset, currency) for asset in assets for currency in currencies]
+        with stage_timer("current_cache_read"):
+            entries = await self._read_current_prices(pairs)
+        prices = {pair: current for pair, (current, _) in entries.items()}
+        now = self._now()
+
+        if settings.PRICE_POLLER_MODE != "off":
+            for pair, cached in prices.items():
+                stale = now - cached.timestamp > settings.PRICE_STALE_AFTER * 1000
+                prices[pair] = cached.model_copy(update={"stale": stale})
+
+            prices.update(
+                await self._latest_stored_prices(
+                    [pair for pair in pairs if pair not in prices]
+                )
+            )
+            # Pairs nothing was polled for yet are fetched directly
+        else:
+            expired = [
+                pair
+                for pair, (_, cached_at) in entries.items()
+                if now - cached_at > settings.CACHE_SOFT_TTL * 1000
+            ]
+            if expired:
+                self._refresh_in_background(expired)
+
+        # Pairs CoinGecko did not know a moment ago are not asked for again,
+        # each request would otherwise refetch every tracked pair with them
+        unknown = get_local_cache()
+        missing = [
+            pair
+            for pair in pairs
+            if pair not in prices
+            and unknown.get_error(current_price_cache_key(*pair)) is None
+        ]
+        if missing:
+            fetch_assets, fetch_currencies = self._fetch_scope(missing)
+            with stage_timer("current_fetch"):
+                try:
+                    fetched = await self._coalesce(
+                        self._current_prices_flight_key(fetch_assets, fetch_currencies),
+                        lambda: self._fetch_current_prices(
+                            fetch_assets, fetch_currencies
+                        ),
+                        lambda: self._cached_current_prices(missing, complete=True),
+                    )
+                except (CoinGeckoAPIError, CoinGeckoRateLimitError):
+                    fetched = await self._latest_stored_prices(missing)
+                    if not fetched:
+                        raise
+                else:
+                    for pair in missing:
+                        if pair not in fetched:
+                            unknown.set_error(
+                                current_price_cache_key(*pair),
+                                LookupError(f"No price for {pair[0]} in {pair[1]}"),
+                                settings.CACHE_NEGATIVE_TTL,
+                            )
+            prices.update((pair, fetched[pair]) for pair in missing if pair in fetched)
+
+        return [
+            AssetPriceResponse(
+                asset=asset, currency=currency, **prices[(asset, currency)].model_dump()
+            )
+            for asset, currency in pairs
+            if (asset, currency) in prices
+        ]
+
+    def _fetch_scope(self, pairs: List[Pair]) -> Tuple[List[str], List[str]]:
+        """Assets and currencies to fetch for pairs, tracked ones included"""
+        return (
+            _union(settings.TRACKED_ASSETS, [asset for asset, _ in pairs]),
+            _union(settings.TRACKED_CURRENCIES, [currency for _, currency in pairs]),
+        )
+
+    def _current_prices_flight_key(
+        self, assets: List[str], currencies: List[str]
+    ) -> str:
+        return (
+            f"current_prices_{','.join(sorted(assets))}_{','.join(sorted(currencies))}"
+        )
+
+    async def _read_current_prices(
+        self, pairs: List[Pair]
+    ) -> Dict[Pair, Tuple[CurrentPriceResponse, int]]:
+        """Cached current prices with the time each was cached, keyed by pair"""
+        cached = await self.cache.get_many(
+            [current_price_cache_key(*pair) for pair in pairs]
+        )
+        return {
+            pair: (CurrentPriceResponse(**data), data.get("cached_at", 0))
+            for pair, data in zip(pairs, cached)
+            if data
+        }
+
+    async def _cached_current_prices(
+        self,
+        pairs: List[Pair],
+        complete: bool = False,
+        max_age: Optional[int] = None,
+    ) -> Optional[Dict[Pair, CurrentPriceResponse]]:
+        """Read current prices from the cache, keyed by (asset, currency)
 
-    async def get_current_price(self) -> CurrentPriceResponse:
-        """Get current price from cache or API"""
-        cached_data = await self.cache.get(self.cache_key)
-        if cached_data:
-            return CurrentPriceResponse(**cached_data)
+        With complete=True, returns None unless every pair is cached; max_age
+        in ms leaves out entries cached longer ago.
+        """
+        now = self._now()
+        prices = {
+            pair: current
+            for pair, (current, cached_at) in (
+                await self._read_current_prices(pairs)
+            ).items()
+            if max_age is None or now - cached_at <= max_age
+        }
+        if complete and len(prices) < len(pairs):
+            return None
+        return prices
 
-        data = await self.coingecko.get_current_price()
-        price_data = data["bitcoin"]
-        normalized_timestamp = self._normalize_timestamp(price_data["last_updated_at"])
+    async def _latest_stored_prices(
+        self, pairs: List[Pair]
+    ) -> Dict[Pair, CurrentPriceResponse]:
+        """Latest stored price of each pair that has one, marked stale"""
+        prices = {}
+        for pair in pairs:
+            latest = await self.repository.get_latest_price(*pair)
+            if latest is not None:
+                prices[pair] = CurrentPriceResponse(
+                    price=latest.price, timestamp=latest.timestamp, stale=True
+                )
+        return prices
 
-        stored_price = self.repository.create_price_point(
-            timestamp=normalized_timestamp, price=price_data["usd"]
+    def _refresh_in_background(self, pairs: List[Pair]) -> None:
+        """Start refetching current prices, unless a refresh is already running"""
+        assets, currencies = self._fetch_scope(pairs)
+        flight_key = self._current_prices_flight_key(assets, currencies)
+        if flight_key in _refreshes:
+            return
+        task = asyncio.create_task(
+            self._refresh_current_prices(flight_key, pairs, assets, currencies)
         )
+        _refreshes[flight_key] = task
+        task.add_done_callback(lambda _: _refreshes.pop(flight_key, None))
+
+    async def _refresh_current_prices(
+        self,
+        flight_key: str,
+        pairs: List[Pair],
+        assets: List[str],
+        currencies: List[str],
+    ) -> None:
+        # The request session is closed by the time this runs
+        try:
+            with priority_scope(Priority.POLLING):
+                async with self.session_factory() as db:
+                    service = PriceService(db, self.session_factory)
+                    await service._coalesce(
+                        flight_key,
+                        lambda: service._fetch_current_prices(assets, currencies),
+                        lambda: service._cached_current_prices(
+                            pairs, complete=True, max_age=settings.CACHE_SOFT_TTL * 1000
+                        ),
+                    )
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", flight_key, e)
 
-        response = CurrentPriceResponse(
-            price=stored_price.price,
-            timestamp=stored_price.timestamp,
+    async def _fetch_current_prices(
+        self, assets: List[str], currencies: List[str]
+    ) -> Dict[Pair, CurrentPriceResponse]:
+        """Fetch current prices in one API call, store them and cache them"""
+        prices = parse_current_prices(
+            await self.coingecko.get_current_prices(assets, currencies),
+            assets,
+            currencies,
         )
 
-        await self.cache.set(self.cache_key, response.model_dump())
-        return response
+        rows = [
+            (asset, currency, current.timestamp, current.price)
+            for (asset, currency), current in prices.items()
+        ]
+        ingest = get_ingest_queue()
+        if ingest.running:
+            # Stored in the background, the response does not wait on a commit
+            await ingest.put(rows)
+        else:
+            await self.repository.create_latest_prices(rows)
+        now = self._now()
+        await self.cache.set_many(
+            {
+                current_price_cache_key(*pair): current_price_cache_value(current, now)
+                for pair, current in prices.items()
+            }
+        )
+        await publish_prices(self.cache, prices)
+        return prices
 
     async def get_price_history_range(
-        self, from_timestamp: int, to_timestamp: int
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        interval: Optional[str] = None,
+        max_points: Optional[int] = None,
+        asset: str = "bitcoin",
+        currency: str = "usd",
     ) -> PriceHistoryResponse:
-        """Get price history for specific range"""
+        """Get price history of one asset for specific range"""
+        return PriceHistoryResponse.model_validate_json(
+            await self.get_price_history_json(
+                from_timestamp, to_timestamp, interval, max_points, asset, currency
+            )
+        )
+
+    async def get_price_history_json(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        interval: Optional[str] = None,
+        max_points: Optional[int] = None,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> bytes:
+        """Get price history of one asset as the JSON response body
+
+        The range is served from aligned time buckets so overlapping windows
+        share cache entries. With interval or max_points, points are
+        downsampled into OHLC candles in the database. Cache entries hold
+        JSON, so hits are spliced together without building models.
+        """
         from_timestamp = self._normalize_timestamp(from_timestamp)
         to_timestamp = self._normalize_timestamp(to_timestamp)
 
-        cache_key = f"bitcoin_price_range_{from_timestamp}_{to_timestamp}"
-        cached_data = await self.cache.get(cache_key)
-        if cached_data:
-            return PriceHistoryResponse(**cached_data)
+        if interval or max_points:
+            interval_ms = (
+                INTERVALS_MS[interval]
+                if interval
+                else interval_for_max_points(from_timestamp, to_timestamp, max_points)
+            )
+            return await self._get_price_candles(
+                from_timestamp, to_timestamp, interval_ms, asset, currency
+            )
+
+        now = self._now()
+        granularity = granularity_for_range(from_timestamp, to_timestamp, now)
+        bucket_size = BUCKET_SIZE_MS[granularity]
+        starts = bucket_starts(from_timestamp, to_timestamp, bucket_size)
+
+        with stage_timer("history_cache_read"):
+            buckets = await self._cached_buckets(asset, currency, granularity, starts)
+        missing = [start for start in starts if start not in buckets]
+        if missing:
+            flight_key = (
+                f"{asset}_{currency}_price_buckets_{granularity}"
+                f"_{missing[0]}_{missing[-1]}"
+            )
+            with stage_timer("history_load"):
+                buckets.update(
+                    await self._coalesce(
+                        flight_key,
+                        lambda: self._load_buckets(
+                            asset, currency, granularity, missing, now
+                        ),
+                        lambda: self._cached_buckets(
+                            asset, currency, granularity, missing, complete=True
+                        ),
+                    )
+                )
+
+        with stage_timer("history_encode"):
+            parts = []
+            for start in reversed(starts):
+                points = buckets[start]
+                if from_timestamp > start or start + bucket_size - 1 > to_timestamp:
+                    # Only the edge buckets are decoded, to trim them to the range
+                    points = (
+                        PriceSeries.from_json(points)
+                        .between(from_timestamp, to_timestamp)
+                        .to_json()
+                    )
+                # Strip the brackets of the bucket's JSON array
+                if len(points) > 2:
+                    parts.append(memoryview(points)[1:-1])
+            return b'{"prices":[' + b",".join(parts) + b"]}"
+
+    def _bucket_key(
+        self, asset: str, currency: str, granularity: int, start: int
+    ) -> str:
+        return f"{asset}_{currency}_price_bucket_{granularity}_{start}.json"
 
-        data = await self.coingecko.get_price_history_range(
-            from_timestamp, to_timestamp
+    async def _cached_buckets(
+        self,
+        asset: str,
+        currency: str,
+        granularity: int,
+        starts: List[int],
+        complete: bool = False,
+    ) -> Optional[Dict[int, bytes]]:
+        """Read buckets as JSON arrays of points from the cache, keyed by start
+
+        With complete=True, returns None unless every bucket is cached.
+        """
+        cached = await self.cache.get_raw_many(
+            [self._bucket_key(asset, currency, granularity, start) for start in starts]
+        )
+        buckets = {
+            start: points for start, points in zip(starts, cached) if points is not None
+        }
+        if complete and len(buckets) < len(starts):
+            return None
+        return buckets
+
+    async def _load_buckets(
+        self, asset: str, currency: str, granularity: int, starts: List[int], now: int
+    ) -> Dict[int, bytes]:
+        """Fill buckets from the DB, fetching missing intervals first, and cache them"""
+        bucket_size = BUCKET_SIZE_MS[granularity]
+        from_timestamp = starts[0]
+        to_timestamp = min(starts[-1] + bucket_size - 1, now)
+
+        await self._fill_missing_intervals(
+            from_timestamp, to_timestamp, granularity, asset, currency
+        )
+        series = await self.repository.get_price_series(
+            from_timestamp, to_timestamp, asset, currency
         )
+        # Buckets hold their points newest first, like the response
+        encoded = {
+            start: bucket[::-1].to_json()
+            for start, bucket in zip(starts, series.split(starts, bucket_size))
+        }
 
-        if data.get("prices"):
-            valid_prices = []
-            for price_point in data["prices"]:
-                if (
-                    len(price_point) >= 2
-                    and price_point[0] is not None
-                    and price_point[1] is not None
-                ):
-                    try:
-                        timestamp = int(price_point[0])
-                        price = float(price_point[1])
-                        valid_prices.append((timestamp, price))
-                    except (ValueError, TypeError):
-                        continue
+        # Closed buckets no longer change, only the newest one needs a short TTL
+        settled_before = now - settings.COVERAGE_SETTLE_SECONDS * 1000
+        closed: Dict[str, bytes] = {}
+        recent: Dict[str, bytes] = {}
+        for start, data in encoded.items():
+            key = self._bucket_key(asset, currency, granularity, start)
+            if start + bucket_size <= settled_before:
+                closed[key] = data
+            else:
+                recent[key] = data
+        await self.cache.set_raw_many(closed, ttl=settings.CACHE_HISTORY_TTL)
+        await self.cache.set_raw_many(recent)
+        return encoded
 
-            if valid_prices:
-                self.repository.create_price_points_batch(valid_prices)
+    async def prepare_export(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> Tuple[int, int]:
+        """Store any missing intervals of the range before it is streamed out"""
+        from_timestamp = self._normalize_timestamp(from_timestamp)
+        to_timestamp = self._normalize_timestamp(to_timestamp)
+        await self.fill_range(from_timestamp, to_timestamp, asset, currency)
+        return from_timestamp, to_timestamp
+
+    async def fill_range(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> None:
+        """Store any missing intervals of a millisecond range, once across callers"""
+        granularity = granularity_for_range(from_timestamp, to_timestamp, self._now())
 
-        db_prices = self.repository.get_price_range(from_timestamp, to_timestamp)
+        async def fill() -> bool:
+            await self._fill_missing_intervals(
+                from_timestamp, to_timestamp, granularity, asset, currency
+            )
+            return True
 
+        async def nothing_cached() -> None:
+            return None
+
+        await self._coalesce(
+            f"{asset}_{currency}_price_fill_{granularity}"
+            f"_{from_timestamp}_{to_timestamp}",
+            fill,
+            nothing_cached,
+        )
+
+    async def _get_price_candles(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        interval_ms: int,
+        asset: str,
+        currency: str,
+    ) -> bytes:
+        """Get candles covering the range, aligned to interval_ms, as JSON"""
+        from_timestamp -= from_timestamp % interval_ms
+        to_timestamp -= to_timestamp % interval_ms
+        cache_key = (
+            f"{asset}_{currency}_price_candles_{interval_ms}"
+            f"_{from_timestamp}_{to_timestamp}.json"
+        )
+
+        with stage_timer("candles_cache_read"):
+            cached = await self._cached_history(cache_key)
+        if cached is not None:
+            return cached
+
+        with stage_timer("candles_load"):
+            return await self._coalesce(
+                cache_key,
+                lambda: self._load_price_candles(
+                    cache_key,
+                    from_timestamp,
+                    to_timestamp,
+                    interval_ms,
+                    asset,
+                    currency,
+                ),
+                lambda: self._cached_history(cache_key),
+            )
+
+    async def _cached_history(self, cache_key: str) -> Optional[bytes]:
+        return (await self.cache.get_raw_many([cache_key]))[0]
+
+    async def _load_price_candles(
+        self,
+        cache_key: str,
+        from_timestamp: int,
+        last_bucket: int,
+        interval_ms: int,
+        asset: str,
+        currency: str,
+    ) -> bytes:
+        """Aggregate candles in the DB, fetching missing intervals first, and cache them"""
+        now = self._now()
+        to_timestamp = min(last_bucket + interval_ms - 1, now)
+        granularity = granularity_for_range(from_timestamp, to_timestamp, now)
+
+        await self._fill_missing_intervals(
+            from_timestamp, to_timestamp, granularity, asset, currency
+        )
+        # The aligned end lets the query read rollups; nothing is stored past now
+        rows = await self.repository.get_price_candles(
+            from_timestamp, last_bucket + interval_ms - 1, interval_ms, asset, currency
+        )
+
+        candles = [
+            PriceCandle(
+                timestamp=row.timestamp,
+                open=row.open,
+                high=row.high,
+                low=row.low,
+                close=row.close,
+                average=row.average,
+                count=row.count,
+            )
+            for row in rows
+        ]
         response = PriceHistoryResponse(
-            prices=[PricePoint(timestamp=p.timestamp, price=p.price) for p in db_prices]
+            prices=[
+                PricePoint(timestamp=c.timestamp, price=c.average) for c in candles
+            ],
+            interval=interval_ms,
+            candles=candles,
         )
 
-        await self.cache.set(cache_key, response.model_dump())
-        return response
+        settled_before = now - settings.COVERAGE_SETTLE_SECONDS * 1000
+        closed = last_bucket + interval_ms <= settled_before
+        body = response.model_dump_json(exclude_none=True).encode()
+        await self.cache.set_raw_many(
+            {cache_key: body}, ttl=settings.CACHE_HISTORY_TTL if closed else None
+        )
+        return body
+
+    async def _fill_missing_intervals(
+        self,
+        from_timestamp: int,
+        to_timestamp: int,
+        granularity: int,
+        asset: str = "bitcoin",
+        currency: str = "usd",
+    ) -> None:
+        """Fetch only the parts of the range not already stored at granularity"""
+        now = self._now()
+
+        with stage_timer("coverage_read"):
+            covered = await self.repository.get_coverage(
+                from_timestamp, to_timestamp, granularity, asset, currency
+            )
+        chunks = [
+            chunk
+            for gap in missing_intervals(from_timestamp, to_timestamp, covered)
+            # A gap shorter than one step holds at most one point
+            if gap[1] - gap[0] >= granularity
+            for chunk in split_interval(gap, MAX_FETCH_SPAN_MS[granularity])
+        ]
+        if not chunks:
+            return
+
+        semaphore = asyncio.Semaphore(settings.COINGECKO_MAX_CONCURRENT_FETCHES)
+
+        async def fetch(chunk):
+            async with semaphore:
+                return await self.coingecko.get_price_history_range(
+                    *chunk, asset=asset, currency=currency
+                )
+
+        with stage_timer("upstream_fetch"):
+            results = await asyncio.gather(
+                *(fetch(chunk) for chunk in chunks), return_exceptions=True
+            )
+
+        errors = [data for data in results if isinstance(data, Exception)]
+        fetched = [
+            (chunk, self._parse_price_points(data))
+            for chunk, data in zip(chunks, results)
+            if not isinstance(data, Exception)
+        ]
+        # One insert for every chunk, points returned twice are stored once
+        points = PriceSeries.merge(*(series for _, series in fetched))
+        if len(points):
+            with stage_timer("db_write"):
+                await self.repository.insert_price_points(points, asset, currency)
+
+        settled_before = now - settings.COVERAGE_SETTLE_SECONDS * 1000
+        for (chunk_from, chunk_to), _ in fetched:
+            covered_to = min(chunk_to, settled_before)
+            if covered_to > chunk_from:
+                await self.repository.add_coverage(
+                    chunk_from,
+                    covered_to,
+                    granularity_for_range(chunk_from, chunk_to, now),
+                    asset,
+                    currency,
+                )
+
+        if errors:
+            raise errors[0]
+
+    def _parse_price_points(self, data: Dict[str, Any]) -> PriceSeries:
+        """Extract valid (timestamp, price) points from a market_chart response"""
+        return parse_price_points(data)
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+import redis.asyncio as redis
+from app.cache.redis_cache import RedisCache
+from app.core.config import get_settings
+from app.schemas.price import CurrentPriceResponse
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[str, str]
+
+# Sent first, so EventSource clients reconnect after this many ms
+RETRY_EVENT = b"retry: 3000\n\n"
+KEEP_ALIVE_EVENT = b": keep-alive\n\n"
+# Tells a client it fell behind and was disconnected; reconnecting resyncs it
+DROPPED_EVENT = b"event: dropped\ndata: {}\n\n"
+
+
+async def publish_prices(
+    cache: RedisCache, prices: Dict[Pair, CurrentPriceResponse]
+) -> None:
+    """Announce current prices to the stream of every API worker"""
+    if not prices:
+        return
+    await cache.publish(
+        settings.PRICE_UPDATES_CHANNEL,
+        json.dumps(
+            [
+                {"asset": asset, "currency": currency, **current.model_dump()}
+                for (asset, currency), current in prices.items()
+            ]
+        ),
+    )
+
+
+def _price_event(update: dict) -> bytes:
+    return b"event: price\ndata: " + json.dumps(update).encode() + b"\n\n"
+
+
+class Subscription:
+    """One stream client: the pairs it follows and a bounded queue of events"""
+
+    def __init__(self, pairs: Iterable[Pair], queue_size: int):
+        self.pairs: Set[Pair] = set(pairs)
+        # None marks the end of the stream
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(queue_size)
+        self.dropped = False
+
+    def push(self, event: bytes) -> bool:
+        """Queue an event without waiting, False if the client fell behind"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def close(self) -> None:
+        """End the stream, discarding whatever the client did not read yet"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class PriceBroadcaster:
+    """Fan price updates out to every stream client of this process
+
+    A single Redis subscription per worker reads the updates that the poller
+    and fresh fetches publish. Each price change is encoded once and offered
+    to the bounded queue of every client following its pair; a client whose
+    queue is full is dropped rather than slowing the others or growing memory.
+    """
+
+    def __init__(
+        self,
+        max_subscribers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ):
+        self.max_subscribers = max_subscribers or settings.PRICE_STREAM_MAX_SUBSCRIBERS
+        self.queue_size = queue_size or settings.PRICE_STREAM_QUEUE_SIZE
+        self.subscribers: Dict[Pair, Set[Subscription]] = defaultdict(set)
+        self.subscriptions = 0
+        self.dropped = 0
+        # Last update of each pair, as (timestamp, encoded event)
+        self.latest: Dict[Pair, Tuple[int, bytes]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.subscribed = asyncio.Event()
+
+    def subscribe(self, pairs: Iterable[Pair]) -> Optional[Subscription]:
+        """Follow pairs, starting with their latest known prices; None when full"""
+        if self.subscriptions >= self.max_subscribers:
+            return None
+        pairs = set(pairs)
+        # Room for a change of every pair at once, plus the allowed lag
+        subscription = Subscription(pairs, len(pairs) + self.queue_size)
+        snapshot = []
+        for pair in subscription.pairs:
+            self.subscribers[pair].add(subscription)
+            if pair in self.latest:
+                snapshot.append(self.latest[pair][1])
+        if snapshot:
+            # One queue entry however many pairs, sent in one write
+            subscription.push(b"".join(snapshot))
+        self.subscriptions += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for pair in subscription.pairs:
+            subscribers = self.subscribers.get(pair)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[pair]
+        if not subscription.dropped:
+            self.subscriptions -= 1
+            subscription.dropped = True
+
+    def publish(self, update: dict) -> int:
+        """Send one price to the clients following its pair, returning how many
+
+        Repeats and prices older than the latest one are skipped, so each
+        change goes out once however many times it is published.
+        """
+        pair = (update["asset"], update["currency"])
+        latest = self.latest.get(pair)
+        if latest is not None and update["timestamp"] <= latest[0]:
+            return 0
+        event = _price_event(update)
+        self.latest[pair] = (update["timestamp"], event)
+
+        slow: List[Subscription] = []
+        sent = 0
+        for subscription in self.subscribers.get(pair, ()):
+            if subscription.push(event):
+                sent += 1
+            else:
+                slow.append(subscription)
+        for subscription in slow:
+            self.unsubscribe(subscription)
+            subscription.close()
+            self.dropped += 1
+        return sent
+
+    def handle(self, data: bytes) -> None:
+        """Apply one message from the updates channel"""
+        try:
+            updates = json.loads(data)
+        except ValueError:
+            return
+        for update in updates:
+            try:
+                self.publish(update)
+            except (KeyError, TypeError):
+                continue
+
+    def info(self) -> Dict[str, int]:
+        return {
+            "subscribers": self.subscriptions,
+            "dropped": self.dropped,
+            "pairs": len(self.latest),
+        }
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen_forever(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Price updates subscription lost: %s", e)
+            self.subscribed.clear()
+            await asyncio.sleep(1)
+
+    async def _listen(self) -> None:
+        # Own connection without the pool's socket timeout, prices can stay
+        # unchanged for a while
+        client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+        try:
+            async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(settings.PRICE_UPDATES_CHANNEL)
+                self.subscribed.set()
+                async for message in pubsub.listen():
+                    self.handle(message["data"])
+        finally:
+            await client.aclose()
+
+
+async def stream_events(
+    broadcaster: PriceBroadcaster,
+    subscription: Subscription,
+    heartbeat: Optional[float] = None,
+) -> AsyncIterator[bytes]:
+    """Yield a subscription's events as a text/event-stream body
+
+    Events queued while the client was busy are sent in one write. A comment
+    goes out every heartbeat seconds of quiet, keeping proxies from closing
+    the connection.
+    """
+    heartbeat = heartbeat or settings.PRICE_STREAM_HEARTBEAT
+    try:
+        yield RETRY_EVENT
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield KEEP_ALIVE_EVENT
+                continue
+            events = [event]
+            while event is not None and not subscription.queue.empty():
+                event = subscription.queue.get_nowait()
+                events.append(event)
+            if events[-1] is None:
+                if len(events) > 1:
+                    yield b"".join(events[:-1])
+                yield DROPPED_EVENT
+                return
+            yield b"".join(events)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+_broadcaster: Optional[PriceBroadcaster] = None
+
+
+def get_price_broadcaster() -> PriceBroadcaster:
+    """Get the process-wide broadcaster, creating it on first use"""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = PriceBroadcaster()
+    return _broadcaster
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.config import get_settings
+from app.db.partitions import (
+    Partition,
+    compact_partition,
+    default_partition_months,
+    ensure_partitions,
+    is_compacted,
+    list_partitions,
+)
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services.coverage import DAY_MS, HOUR_MS
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Data older than a day is hourly upstream anyway, so this loses no detail
+# a history request could have fetched again
+COMPACTION_INTERVAL_MS = HOUR_MS
+
+
+async def run_retention(
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+    now: Optional[int] = None,
+) -> List[Partition]:
+    """Premake upcoming partitions and compact the ones past retention
+
+    Returns the partitions compacted by this run.
+    """
+    if now is None:
+        now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    retain_after = now - settings.PRICE_RAW_RETENTION_DAYS * DAY_MS
+
+    async with session_factory() as db:
+        created = await ensure_partitions(
+            db, now, now + settings.PRICE_PARTITION_MONTHS_AHEAD * 31 * DAY_MS
+        )
+        # Months written before any partition existed for them, e.g. history
+        # fills of old ranges
+        for month in await default_partition_months(db):
+            created += await ensure_partitions(db, month.start, month.start)
+        for partition in created:
+            logger.info("Created partition %s", partition.name)
+
+        compacted = []
+        for partition in await list_partitions(db):
+            if partition.end > retain_after or await is_compacted(db, partition):
+                continue
+            await compact_partition(db, partition, COMPACTION_INTERVAL_MS)
+            logger.info("Compacted partition %s", partition.name)
+            compacted.append(partition)
+    return compacted
+
+
+async def main() -> None:
+    """Run one retention pass, e.g. from a daily cron job"""
+    logging.basicConfig(level=logging.INFO)
+    try:
+        await run_retention()
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
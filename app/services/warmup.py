@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable
+import redis.asyncio as redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.cache.redis_cache import get_redis_pool
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services.price_service import PriceService
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+async def connect_database(connections: int) -> None:
+    """Open pool connections up front, so first requests skip the handshake"""
+
+    async def connect() -> None:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    # Held at the same time, so each is a new connection left idle in the pool
+    await asyncio.gather(*(connect() for _ in range(connections)))
+
+
+async def connect_redis(connections: int) -> None:
+    client = redis.Redis(connection_pool=get_redis_pool())
+    await asyncio.gather(*(client.ping() for _ in range(connections)))
+
+
+async def prime_current_prices(
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+) -> int:
+    """Read the tracked current prices, filling L1 and, if needed, Redis"""
+    async with session_factory() as db:
+        prices = await PriceService(db, session_factory).get_current_prices(
+            settings.TRACKED_ASSETS, settings.TRACKED_CURRENCIES
+        )
+    return len(prices)
+
+
+async def _step(name: str, step: Awaitable) -> None:
+    try:
+        await asyncio.wait_for(step, settings.WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Warm-up of %s timed out after %.0fs", name, settings.WARMUP_TIMEOUT
+        )
+    except Exception as e:
+        logger.warning("Warm-up of %s failed: %s", name, e)
+
+
+async def warm_up(session_factory: async_sessionmaker = AsyncSessionLocal) -> None:
+    """Get a worker ready for traffic; failures are logged, not raised"""
+    started = time.monotonic()
+    await asyncio.gather(
+        _step("database", connect_database(settings.DB_POOL_SIZE)),
+        # A request holds at most one connection of each
+        _step(
+            "redis",
+            connect_redis(min(settings.DB_POOL_SIZE, settings.REDIS_MAX_CONNECTIONS)),
+        ),
+        _step("current prices", prime_current_prices(session_factory)),
+    )
+    logger.info("Warm-up took %.2fs", time.monotonic() - started)
@@ -0,0 +1,150 @@
+"""Local stand-in for the CoinGecko endpoints PriceFetch calls
+
+    python -m benchmarks.fake_coingecko --port 8900 --latency 0.05 --rate-limit-ratio 0.01
+
+Point the app at it with COINGECKO_BASE_URL=http://127.0.0.1:8900. Prices
+are a deterministic function of time, so runs are reproducible.
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+from typing import List
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+FIVE_MINUTES = 300
+HOUR = 3600
+DAY = 86400
+
+
+def price_at(timestamp: float, asset: str = "bitcoin") -> float:
+    """Smooth made-up price, different per asset"""
+    base = 1000.0 * (1 + sum(map(ord, asset)) % 100)
+    return round(base * (1 + 0.1 * math.sin(timestamp / DAY)), 3)
+
+
+def range_points(from_seconds: int, to_seconds: int, points: int, asset: str) -> List:
+    """Points spaced like CoinGecko's, or exactly points of them when given
+
+    CoinGecko returns 5-minutely data up to a day, hourly up to 90 days and
+    daily beyond.
+    """
+    span = max(to_seconds - from_seconds, 0)
+    if points:
+        step = max(span / points, 1)
+    elif span <= DAY:
+        step = FIVE_MINUTES
+    elif span <= 90 * DAY:
+        step = HOUR
+    else:
+        step = DAY
+    count = int(span // step) + 1 if not points else points
+    timestamps = (from_seconds + i * step for i in range(count))
+    return [[int(ts * 1000), price_at(ts, asset)] for ts in timestamps]
+
+
+def create_app(
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    rate_limit_ratio: float = 0.0,
+    retry_after: int = 1,
+    points: int = 0,
+    seed: int = 0,
+) -> Starlette:
+    """Fake API answering after latency +- jitter seconds, with 429s at rate_limit_ratio"""
+    rng = random.Random(seed)
+    stats = {"requests": 0, "rate_limited": 0}
+
+    async def delay() -> None:
+        wait = latency + rng.uniform(-jitter, jitter)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def rate_limited() -> Response:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"status": {"error_code": 429, "error_message": "rate limited"}},
+            status_code=429,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    async def simple_price(request: Request) -> Response:
+        stats["requests"] += 1
+        await delay()
+        if rng.random() < rate_limit_ratio:
+            return rate_limited()
+        now = int(time.time())
+        # Like CoinGecko, the price moves once a minute
+        updated = now - now % 60
+        ids = request.query_params.get("ids", "").split(",")
+        currencies = request.query_params.get("vs_currencies", "").split(",")
+        return JSONResponse(
+            {
+                asset: {
+                    **{currency: price_at(updated, asset) for currency in currencies},
+                    "last_updated_at": updated,
+                }
+                for asset in ids
+                if asset
+            }
+        )
+
+    async def market_chart_range(request: Request) -> Response:
+        stats["requests"] += 1
+        await delay()
+        if rng.random() < rate_limit_ratio:
+            return rate_limited()
+        asset = request.path_params["asset"]
+        prices = range_points(
+            int(request.query_params["from"]),
+            min(int(request.query_params["to"]), int(time.time())),
+            points,
+            asset,
+        )
+        return JSONResponse({"prices": prices, "market_caps": [], "total_volumes": []})
+
+    async def get_stats(request: Request) -> Response:
+        return JSONResponse(stats)
+
+    return Starlette(
+        routes=[
+            Route("/simple/price", simple_price),
+            Route("/coins/{asset}/market_chart/range", market_chart_range),
+            Route("/stats", get_stats),
+        ]
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1, help="seconds")
+    parser.add_argument(
+        "--points", type=int, default=0, help="points per range response, 0 natural"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(
+        args.latency,
+        args.jitter,
+        args.rate_limit_ratio,
+        args.retry_after,
+        args.points,
+        args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare price_points ingest paths
+
+Run against the configured database with:
+
+    python -m benchmarks.ingest --sizes 1000,10000,100000
+
+Rows are written under a throwaway asset and deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List, Tuple
+from sqlalchemy import delete
+from app.db import models
+from app.db.repository import AsyncPriceRepository
+from app.db.session import AsyncSessionLocal, async_engine
+
+ASSET = "benchmark-ingest"
+START = 1_500_000_000_000
+STEP = 60_000
+
+
+async def values_with_read_back(
+    repository: AsyncPriceRepository, points: List[Tuple[int, float]]
+) -> None:
+    """The previous create_price_points_batch: multi-VALUES insert, then read back"""
+    await repository.insert_price_points(points, ASSET, use_copy=False)
+    await repository.get_price_range(points[0][0], points[-1][0], ASSET)
+
+
+async def values(
+    repository: AsyncPriceRepository, points: List[Tuple[int, float]]
+) -> None:
+    await repository.insert_price_points(points, ASSET, use_copy=False)
+
+
+async def copy(
+    repository: AsyncPriceRepository, points: List[Tuple[int, float]]
+) -> None:
+    await repository.insert_price_points(points, ASSET, use_copy=True)
+
+
+PATHS: Dict[str, Callable[..., Awaitable[None]]] = {
+    "values+read-back": values_with_read_back,
+    "values": values,
+    "copy": copy,
+}
+
+
+async def clear() -> None:
+    async with AsyncSessionLocal() as db:
+        for model in (models.CurrentPrice, models.PriceCandle):
+            await db.execute(delete(model).where(model.asset == ASSET))
+        await db.commit()
+
+
+async def measure(
+    path: Callable[..., Awaitable[None]], size: int
+) -> Tuple[float, float]:
+    """Seconds and peak traced MiB to ingest size new rows"""
+    points = [(START + i * STEP, 100.0 + i % 1000) for i in range(size)]
+    await clear()
+    async with AsyncSessionLocal() as db:
+        repository = AsyncPriceRepository(db)
+        tracemalloc.start()
+        started = time.perf_counter()
+        await path(repository, points)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    print(f"{'path':<18} {'rows':>8} {'best s':>9} {'rows/s':>11} {'peak MiB':>9}")
+    try:
+        for size in sizes:
+            for name, path in PATHS.items():
+                runs = [await measure(path, size) for _ in range(args.repeat)]
+                elapsed, peak = min(runs)
+                print(
+                    f"{name:<18} {size:>8} {elapsed:>9.3f} "
+                    f"{size / elapsed:>11.0f} {peak:>9.1f}"
+                )
+    finally:
+        await clear()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
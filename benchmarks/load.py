@@ -0,0 +1,267 @@
+"""End-to-end load scenarios for /current-price and /price-history
+
+    python -m benchmarks.load --fake-redis --duration 20 --concurrency 32
+    python -m benchmarks.load --save-baseline
+
+Starts the fake CoinGecko server and the API with uvicorn, both on this
+machine, so nothing leaves it. Postgres is the configured one and Redis the
+configured one unless --fake-redis starts fakeredis in its own process. With
+--app-url the API is not started and that deployment is loaded instead.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+import httpx
+from benchmarks.report import Results, check_baseline, latency_summary, print_table
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+
+
+FAKE_REDIS = """
+import sys
+from fakeredis import TcpFakeServer
+TcpFakeServer(("127.0.0.1", int(sys.argv[1])), server_type="redis").serve_forever()
+"""
+
+
+def start_process(args: List[str], env: Optional[Dict[str, str]] = None):
+    return subprocess.Popen([sys.executable, *args], env={**os.environ, **(env or {})})
+
+
+def start_fake_redis(port: int):
+    """Serve fakeredis on port from its own process"""
+    try:
+        import fakeredis  # noqa: F401
+    except ImportError:
+        raise SystemExit("--fake-redis needs the fakeredis package")
+    return start_process(["-c", FAKE_REDIS, str(port)])
+
+
+async def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise SystemExit(f"Nothing listens on port {port} after {timeout:.0f}s")
+            await asyncio.sleep(0.2)
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise SystemExit(f"{url} did not come up in {timeout:.0f}s")
+                await asyncio.sleep(0.2)
+
+
+def history_paths(windows: int, seed: int) -> List[str]:
+    """Day-long windows ending on hour boundaries of the last 30 days
+
+    A fixed set, so repeated windows are served from cache like they would be
+    for many clients looking at the same charts.
+    """
+    rng = random.Random(seed)
+    now = int(time.time() * 1000)
+    now -= now % HOUR_MS
+    paths = []
+    for _ in range(windows):
+        to_timestamp = now - rng.randrange(0, 30 * 24) * HOUR_MS
+        paths.append(
+            "/api/v1/price-history"
+            f"?from_timestamp={to_timestamp - DAY_MS}&to_timestamp={to_timestamp}"
+        )
+    return paths
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    paths: List[str],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    seed: int,
+) -> Dict[str, float]:
+    """Request random paths from concurrency clients, recording after warmup"""
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors = 0
+    loop = asyncio.get_running_loop()
+    record_from = loop.time() + warmup
+    stop_at = record_from + duration
+
+    async def worker() -> None:
+        nonlocal errors
+        while True:
+            started = loop.time()
+            if started >= stop_at:
+                return
+            try:
+                response = await client.get(rng.choice(paths))
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if started >= record_from:
+                latencies.append(loop.time() - started)
+                errors += failed
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {**latency_summary(latencies, duration), "errors": float(errors)}
+
+
+async def start_dependencies(
+    args: argparse.Namespace, processes: List[subprocess.Popen]
+) -> str:
+    """Start fakeredis if asked and the fake CoinGecko, returning its URL"""
+    if args.fake_redis:
+        args.redis_host = "127.0.0.1"
+        processes.append(start_fake_redis(args.redis_port))
+        await wait_for_port(args.redis_port)
+    processes.append(
+        start_process(
+            [
+                "-m",
+                "benchmarks.fake_coingecko",
+                f"--port={args.upstream_port}",
+                f"--latency={args.upstream_latency}",
+                f"--rate-limit-ratio={args.rate_limit_ratio}",
+                f"--points={args.points}",
+            ]
+        )
+    )
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    await wait_until_ready(f"{upstream_url}/stats")
+    return upstream_url
+
+
+def app_env(args: argparse.Namespace, upstream_url: str) -> Dict[str, str]:
+    """Settings pointing the API at the local stand-ins"""
+    return {
+        "COINGECKO_BASE_URL": upstream_url,
+        "COINGECKO_RATE_LIMIT_PER_MINUTE": str(args.upstream_rpm),
+        "COINGECKO_RATE_LIMIT_BURST": str(args.upstream_rpm // 60 + 1),
+        "REDIS_HOST": args.redis_host,
+        "REDIS_PORT": str(args.redis_port),
+    }
+
+
+def stop_processes(processes: List[subprocess.Popen]) -> None:
+    # The API first, so it does not see Redis or CoinGecko go away
+    for process in reversed(processes):
+        process.terminate()
+        process.wait()
+
+
+def scenario_paths(args: argparse.Namespace) -> Dict[str, List[str]]:
+    return {
+        "current-price": ["/api/v1/current-price"],
+        "price-history": history_paths(args.history_windows, args.seed),
+    }
+
+
+def load_client(url: str, concurrency: int) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=url,
+        limits=httpx.Limits(max_connections=concurrency),
+        timeout=30.0,
+    )
+
+
+async def run(args: argparse.Namespace) -> Results:
+    processes: List[subprocess.Popen] = []
+    app_url = args.app_url
+    try:
+        upstream_url = await start_dependencies(args, processes)
+        if app_url is None:
+            app_url = f"http://127.0.0.1:{args.port}"
+            processes.append(
+                start_process(
+                    [
+                        "-m",
+                        "uvicorn",
+                        "app.main:app",
+                        f"--port={args.port}",
+                        "--log-level=warning",
+                    ],
+                    app_env(args, upstream_url),
+                )
+            )
+        await wait_until_ready(f"{app_url}/")
+
+        paths = scenario_paths(args)
+        results: Results = {}
+        async with load_client(app_url, args.concurrency) as client:
+            for name in args.scenarios.split(","):
+                results[name] = await run_scenario(
+                    client,
+                    paths[name],
+                    args.concurrency,
+                    args.duration,
+                    args.warmup,
+                    args.seed,
+                )
+        return results
+    finally:
+        stop_processes(processes)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options shared with benchmarks.scaling"""
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds")
+    parser.add_argument("--history-windows", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--upstream-port", type=int, default=8900)
+    parser.add_argument("--upstream-latency", type=float, default=0.05)
+    parser.add_argument("--upstream-rpm", type=int, default=6000)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--points", type=int, default=0)
+    parser.add_argument("--fake-redis", action="store_true")
+    parser.add_argument(
+        "--redis-host", default=os.environ.get("REDIS_HOST", "127.0.0.1")
+    )
+    parser.add_argument("--redis-port", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", action="store_true")
+
+
+def parse_args(parser: argparse.ArgumentParser) -> argparse.Namespace:
+    args = parser.parse_args()
+    if args.redis_port is None:
+        args.redis_port = (
+            6380 if args.fake_redis else int(os.environ.get("REDIS_PORT", 6379))
+        )
+    return args
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default="current-price,price-history")
+    parser.add_argument("--app-url", default=None)
+    add_arguments(parser)
+    args = parse_args(parser)
+
+    results = asyncio.run(run(args))
+    print_table(results)
+    return check_baseline("load", results, args.tolerance, args.save_baseline)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
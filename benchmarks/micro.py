@@ -0,0 +1,182 @@
+"""Micro-benchmarks of the request hot paths
+
+    python -m benchmarks.micro            # compare with benchmarks/baseline.json
+    python -m benchmarks.micro --save-baseline
+    python -m benchmarks.micro --no-db    # skip the Postgres benchmark
+
+The batch insert runs against the configured database under a throwaway
+asset, deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pydantic_core import to_json
+from sqlalchemy import delete
+from benchmarks.fake_coingecko import range_points
+from benchmarks.report import Results, check_baseline, print_table
+from app.core.price_series import PriceSeries
+from app.db import models
+from app.db.repository import AsyncPriceRepository
+from app.db.session import AsyncSessionLocal, async_engine
+from app.schemas.price import PriceHistoryResponse, PricePoint
+from app.services.price_service import normalize_timestamp, parse_price_points
+
+ASSET = "benchmark-micro"
+# A day of 5-minutely points and 90 days of hourly ones
+DAY_START = 1_700_000_000
+DAY_POINTS = 288
+HISTORY_POINTS = 2160
+# About two years of hourly points, a long backfill chunk
+LONG_HISTORY_POINTS = 20000
+
+
+def bench(func: Callable[[], object], min_time: float) -> Dict[str, float]:
+    """Best time per call over rounds of at least min_time seconds"""
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 5:
+            break
+        calls *= 2
+    best = elapsed / calls
+    for _ in range(4):
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - started) / calls)
+    return {"ops_per_s": 1 / best, "us_per_op": best * 1e6}
+
+
+async def bench_async(
+    func: Callable[[], Awaitable[object]],
+    rounds: int,
+    setup: Optional[Callable[[], Awaitable[object]]] = None,
+) -> Dict[str, float]:
+    """Best time of rounds calls, each after an untimed setup"""
+    best = float("inf")
+    for _ in range(rounds):
+        if setup is not None:
+            await setup()
+        started = time.perf_counter()
+        await func()
+        best = min(best, time.perf_counter() - started)
+    return {"ops_per_s": 1 / best, "us_per_op": best * 1e6}
+
+
+def parse_points_loop(data: Dict[str, Any]) -> List[Tuple[int, float]]:
+    """The per-point loop parse_price_points used before PriceSeries"""
+    points = []
+    for point in data.get("prices") or []:
+        if len(point) >= 2 and point[0] is not None and point[1] is not None:
+            try:
+                points.append((int(point[0]), float(point[1])))
+            except (ValueError, TypeError):
+                continue
+    return points
+
+
+def market_chart(points: int) -> Dict[str, Any]:
+    """A market_chart body of hourly points, decoded like a real response"""
+    return json.loads(
+        json.dumps(
+            {
+                "prices": range_points(
+                    DAY_START, DAY_START + points * 3600, points, "bitcoin"
+                )
+            }
+        )
+    )
+
+
+def cpu_benchmarks(min_time: float) -> Results:
+    timestamps = [DAY_START + i * 300 for i in range(1000)]
+    history = market_chart(HISTORY_POINTS)
+    long_history = market_chart(LONG_HISTORY_POINTS)
+    series = parse_price_points(history)
+    model = PriceHistoryResponse(
+        prices=[PricePoint(timestamp=ts, price=price) for ts, price in series]
+    )
+    return {
+        "normalize_timestamp_x1000": bench(
+            lambda: [normalize_timestamp(ts) for ts in timestamps], min_time
+        ),
+        "parse_price_points_2160": bench(lambda: parse_price_points(history), min_time),
+        "parse_points_loop_2160": bench(lambda: parse_points_loop(history), min_time),
+        "parse_price_points_20000": bench(
+            lambda: parse_price_points(long_history), min_time
+        ),
+        "parse_points_loop_20000": bench(
+            lambda: parse_points_loop(long_history), min_time
+        ),
+        "serialize_model_2160": bench(
+            lambda: model.model_dump_json(exclude_none=True), min_time
+        ),
+        # What history buckets were encoded with before PriceSeries
+        "serialize_dicts_2160": bench(
+            lambda: to_json(
+                [{"timestamp": ts, "price": price} for ts, price in series]
+            ),
+            min_time,
+        ),
+        "serialize_series_2160": bench(series.to_json, min_time),
+        "decode_series_2160": bench(
+            lambda: PriceSeries.from_json(series.to_json()), min_time
+        ),
+    }
+
+
+async def db_benchmarks(rounds: int) -> Results:
+    points = [
+        tuple(point)
+        for point in range_points(
+            DAY_START, DAY_START + (DAY_POINTS - 1) * 300, 0, ASSET
+        )
+    ]
+
+    async def clear() -> None:
+        async with AsyncSessionLocal() as db:
+            for model in (models.CurrentPrice, models.PriceCandle):
+                await db.execute(delete(model).where(model.asset == ASSET))
+            await db.commit()
+
+    async def insert_batch() -> None:
+        async with AsyncSessionLocal() as db:
+            await AsyncPriceRepository(db).create_price_points_batch(
+                points, ASSET, return_rows=False
+            )
+
+    try:
+        return {
+            f"create_price_points_batch_{DAY_POINTS}": await bench_async(
+                insert_batch, rounds, setup=clear
+            )
+        }
+    finally:
+        await clear()
+        await async_engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds")
+    parser.add_argument("--db-rounds", type=int, default=20)
+    parser.add_argument("--no-db", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = cpu_benchmarks(args.min_time)
+    if not args.no_db:
+        results.update(asyncio.run(db_benchmarks(args.db_rounds)))
+    print_table(results)
+    return check_baseline("micro", results, args.tolerance, args.save_baseline)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
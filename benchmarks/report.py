@@ -0,0 +1,101 @@
+"""Percentiles, result tables and regression checks shared by the benchmarks"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+# Metrics where a lower value is better; all others are throughputs
+LOWER_IS_BETTER = ("us_per_op", "p50_ms", "p95_ms", "p99_ms", "errors")
+
+Results = Dict[str, Dict[str, float]]
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of samples, q in 0-100"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(latencies: Sequence[float], elapsed: float) -> Dict[str, float]:
+    """Throughput and p50/p95/p99 in ms of requests that took latencies seconds"""
+    return {
+        "requests_per_s": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def print_table(results: Results) -> None:
+    metrics = list(dict.fromkeys(metric for row in results.values() for metric in row))
+    print(f"{'benchmark':<28}" + "".join(f"{metric:>16}" for metric in metrics))
+    for name, row in results.items():
+        print(
+            f"{name:<28}"
+            + "".join(
+                f"{row[metric]:>16.2f}" if metric in row else f"{'':>16}"
+                for metric in metrics
+            )
+        )
+
+
+def load_baseline(section: str, path: Path = BASELINE_PATH) -> Results:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get(section, {})
+
+
+def save_baseline(section: str, results: Results, path: Path = BASELINE_PATH) -> None:
+    """Store results as the baseline of section, keeping the other sections"""
+    baseline = json.loads(path.read_text()) if path.exists() else {}
+    baseline[section] = {
+        name: {metric: round(value, 2) for metric, value in row.items()}
+        for name, row in results.items()
+    }
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def regressions(results: Results, baseline: Results, tolerance: float) -> List[str]:
+    """Describe every metric more than tolerance worse than its baseline"""
+    found = []
+    for name, row in results.items():
+        for metric, value in row.items():
+            base = baseline.get(name, {}).get(metric)
+            if not base:
+                continue
+            if metric in LOWER_IS_BETTER:
+                change = value / base - 1
+            else:
+                change = 1 - value / base
+            if change > tolerance:
+                found.append(
+                    f"{name} {metric}: {value:.2f} vs baseline {base:.2f} "
+                    f"({change:.0%} worse)"
+                )
+    return found
+
+
+def check_baseline(section: str, results: Results, tolerance: float, save: bool) -> int:
+    """Print regressions against the stored baseline, or save results as it
+
+    Returns the exit status: 1 when something regressed.
+    """
+    if save:
+        save_baseline(section, results)
+        print(f"Saved {section} baseline to {BASELINE_PATH}")
+        return 0
+    baseline = load_baseline(section)
+    if not baseline:
+        print(f"No {section} baseline yet, store one with --save-baseline")
+        return 0
+    found = regressions(results, baseline, tolerance)
+    for regression in found:
+        print(f"REGRESSION {regression}")
+    if not found:
+        print(f"No regressions beyond {tolerance:.0%} of the {section} baseline")
+    return 1 if found else 0
@@ -0,0 +1,92 @@
+"""Throughput of python -m app.server from 1 to N workers
+
+    python -m benchmarks.scaling --workers 1,2,4 --fake-redis
+    python -m benchmarks.scaling --scenario price-history
+
+Each worker count gets a fresh server in front of the same fake CoinGecko,
+loaded like benchmarks.load. Cached reads are CPU bound in the workers, so
+requests per second should grow with the workers until the cores run out;
+fakeredis is single-threaded and caps the gain, a real Redis does not.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+from typing import List
+from benchmarks.load import (
+    add_arguments,
+    app_env,
+    load_client,
+    parse_args,
+    run_scenario,
+    scenario_paths,
+    start_dependencies,
+    start_process,
+    stop_processes,
+    wait_until_ready,
+)
+from benchmarks.report import Results, check_baseline, print_table
+
+
+async def run(args: argparse.Namespace) -> Results:
+    processes: List[subprocess.Popen] = []
+    results: Results = {}
+    try:
+        upstream_url = await start_dependencies(args, processes)
+        paths = scenario_paths(args)[args.scenario]
+        app_url = f"http://127.0.0.1:{args.port}"
+        single = None
+        for workers in [int(count) for count in args.workers.split(",")]:
+            server = start_process(
+                ["-m", "app.server"],
+                {
+                    **app_env(args, upstream_url),
+                    "SERVER_HOST": "127.0.0.1",
+                    "SERVER_PORT": str(args.port),
+                    "SERVER_WORKERS": str(workers),
+                },
+            )
+            try:
+                await wait_until_ready(f"{app_url}/")
+                async with load_client(app_url, args.concurrency) as client:
+                    # The warm-up period also lets the last workers come up
+                    row = await run_scenario(
+                        client,
+                        paths,
+                        args.concurrency,
+                        args.duration,
+                        args.warmup,
+                        args.seed,
+                    )
+            finally:
+                stop_processes([server])
+            single = single or row["requests_per_s"]
+            row["speedup"] = row["requests_per_s"] / single if single else 0.0
+            results[f"{args.scenario} x{workers}"] = row
+        return results
+    finally:
+        stop_processes(processes)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--workers", default="1,2,4", help="comma-separated worker counts"
+    )
+    parser.add_argument(
+        "--scenario",
+        choices=("current-price", "price-history"),
+        default="current-price",
+    )
+    add_arguments(parser)
+    args = parse_args(parser)
+
+    print(f"{os.cpu_count()} CPUs")
+    results = asyncio.run(run(args))
+    print_table(results)
+    return check_baseline("scaling", results, args.tolerance, args.save_baseline)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
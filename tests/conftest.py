@@ -1,14 +1,18 @@
 import os
 import sys
 from pathlib import Path
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from app.main import app
-from app.db.session import get_db, SessionLocal
+from app.db.session import get_async_db, get_async_session_factory
 from app.core.config import get_settings
 from app.db.models import Base
+from app.cache.local_cache import get_local_cache
 
 # Add the project root directory to Python path
 project_root = str(Path(__file__).parent.parent)
@@ -19,6 +23,7 @@ settings = get_settings()
 
 # Test database name
 TEST_DB_NAME = f"{settings.POSTGRES_DB}_test"
+TEST_ASYNC_DB_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_SERVER}:{settings.POSTGRES_PORT}/{TEST_DB_NAME}"
 
 
 def create_test_database():
@@ -59,35 +64,72 @@ def test_engine():
 
 
 @pytest.fixture(scope="function")
-def test_db(test_engine):
-    """Create a test database session"""
-    connection = test_engine.connect()
-    transaction = connection.begin()
-    session = Session(bind=connection)
+async def test_db(test_engine):
+    """Create an async test database session rolled back after the test"""
+    engine = create_async_engine(TEST_ASYNC_DB_URL, poolclass=NullPool)
+    connection = await engine.connect()
+    transaction = await connection.begin()
+    # Service commits only release savepoints inside the outer transaction
+    session = AsyncSession(
+        bind=connection,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
 
     try:
         yield session
     finally:
-        session.close()
-        transaction.rollback()
-        connection.close()
+        await session.close()
+        await transaction.rollback()
+        await connection.close()
+        await engine.dispose()
 
 
 @pytest.fixture(scope="function")
-def client(test_db):
+def client(test_engine, monkeypatch):
     """Create a test client with a test database"""
-
-    def override_get_db():
-        try:
-            yield test_db
-        finally:
-            test_db.close()
-
-    app.dependency_overrides[get_db] = override_get_db
+    # Warm-up goes through the app's own engine rather than the test database
+    monkeypatch.setattr("app.main.settings.WARMUP_ENABLED", False)
+    # Sessions are opened inside the app's event loop, so connections are not pooled
+    engine = create_async_engine(TEST_ASYNC_DB_URL, poolclass=NullPool)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: session_factory
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
+    with test_engine.begin() as conn:
+        conn.execute(text("TRUNCATE price_points, price_candles, price_coverage"))
+
+
+@pytest.fixture(autouse=True)
+def clear_local_cache():
+    """Start every test with an empty L1 cache, values and errors alike"""
+    get_local_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breaker(monkeypatch):
+    """Start every test with a fresh, closed CoinGecko circuit breaker"""
+    monkeypatch.setattr("app.core.circuit_breaker._breaker", None)
+
+
+@pytest.fixture
+def session_factory(test_db):
+    """Session factory handing out the test session"""
+
+    @asynccontextmanager
+    async def factory():
+        yield test_db
+
+    return factory
+
 
 @pytest.fixture
 def mock_redis(monkeypatch):
@@ -96,18 +138,36 @@ def mock_redis(monkeypatch):
     class MockRedis:
         def __init__(self):
             self.cache = {}
+            self.published = []
 
         async def get(self, key: str):
             return self.cache.get(key)
 
-        async def set(self, key: str, value: any):
+        async def get_many(self, keys: list):
+            return [self.cache.get(key) for key in keys]
+
+        async def set(self, key: str, value: any, ttl: int = None):
             self.cache[key] = value
 
+        async def set_many(self, items: dict, ttl: int = None):
+            self.cache.update(items)
+
+        async def get_raw_many(self, keys: list):
+            return await self.get_many(keys)
+
+        async def set_raw_many(self, items: dict, ttl: int = None):
+            self.cache.update(items)
+
         async def delete(self, key: str):
             if key in self.cache:
                 del self.cache[key]
 
+        async def publish(self, channel: str, message: str):
+            self.published.append((channel, message))
+
     monkeypatch.setattr("app.cache.redis_cache.RedisCache", MockRedis)
+    monkeypatch.setattr("app.services.price_service.RedisCache", MockRedis)
+    monkeypatch.setattr("app.services.price_poller.RedisCache", MockRedis)
     return MockRedis()
 
 
@@ -116,17 +176,30 @@ def mock_coingecko(monkeypatch):
     """Mock CoinGecko API responses"""
 
     class MockCoinGecko:
-        async def get_current_price(self):
-            from app.services.coingecko_service import CoinGeckoService
-
-            real_service = CoinGeckoService()
-            return await real_service.get_current_price()
+        async def get_current_prices(self, assets: list, currencies: list):
+            # Shaped like /simple/price, without leaving the machine
+            last_updated_at = int(datetime.now(timezone.utc).timestamp())
+            return {
+                asset: {
+                    **{currency: 50000.0 for currency in currencies},
+                    "last_updated_at": last_updated_at,
+                }
+                for asset in assets
+            }
 
-        async def get_price_history_range(self, from_timestamp: int, to_timestamp: int):
+        async def get_price_history_range(
+            self,
+            from_timestamp: int,
+            to_timestamp: int,
+            asset: str = "bitcoin",
+            currency: str = "usd",
+        ):
+            # Ranges are fetched as whole cache buckets, which can start before
+            # the requested window but end at the current time
             return {
                 "prices": [
-                    [from_timestamp, 50000.0],
-                    [from_timestamp + 1800000, 50100.0],
+                    [to_timestamp - 1800000, 50000.0],
+                    [to_timestamp - 900000, 50100.0],
                 ]
             }
 
@@ -0,0 +1,82 @@
+import json
+import numpy as np
+import pytest
+from datetime import datetime, timezone
+from app.services import analytics_service
+from app.services.analytics_service import AnalyticsService
+from app.services.indicators import sma
+
+HOUR = 3600000
+TEN_MINUTES = 600000
+
+
+@pytest.fixture
+def stepped_coingecko(monkeypatch):
+    """CoinGecko returning a point every ten minutes of any range"""
+
+    class SteppedCoinGecko:
+        async def get_price_history_range(
+            self, from_timestamp: int, to_timestamp: int, **series
+        ):
+            start = from_timestamp - from_timestamp % TEN_MINUTES + TEN_MINUTES
+            return {
+                "prices": [
+                    [ts, 100.0 + ts // TEN_MINUTES % 7]
+                    for ts in range(start, to_timestamp, TEN_MINUTES)
+                ]
+            }
+
+    monkeypatch.setattr("app.services.price_service.CoinGeckoService", SteppedCoinGecko)
+
+
+@pytest.mark.asyncio
+async def test_get_indicator_extends_cached_buckets(
+    test_db, mock_redis, stepped_coingecko, monkeypatch
+):
+    """Test later requests only read intervals stored after the cached buckets"""
+    monkeypatch.setattr(analytics_service.settings, "ANALYTICS_BUCKET_POINTS", 4)
+    real_now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    # Half an hour into an interval, so the last one is still unsettled
+    now = real_now - 2 * 86400000
+    now = now - now % HOUR + HOUR // 2
+    from_timestamp = now - 10 * HOUR
+
+    service = AnalyticsService(test_db)
+    monkeypatch.setattr(service, "_now", lambda: now)
+    await service.get_indicator_json("sma", from_timestamp, now, 3, interval="1h")
+
+    reads = []
+    get_price_candles = service.repository.get_price_candles
+
+    async def recording_get_price_candles(from_ts, to_ts, *args):
+        reads.append(from_ts)
+        return await get_price_candles(from_ts, to_ts, *args)
+
+    monkeypatch.setattr(
+        service.repository, "get_price_candles", recording_get_price_candles
+    )
+    later = now + 3 * HOUR
+    monkeypatch.setattr(service, "_now", lambda: later)
+    result = json.loads(
+        await service.get_indicator_json("sma", from_timestamp, later, 3, interval="1h")
+    )
+
+    # Only intervals that settled since were read, plus the window - 1 intervals
+    # warming up a bucket that started meanwhile
+    assert min(reads) >= now - now % HOUR - 2 * HOUR
+
+    fresh = AnalyticsService(test_db)
+    monkeypatch.setattr(fresh, "_now", lambda: later)
+    assert result == json.loads(
+        await fresh.get_indicator_json("sma", from_timestamp, later, 3, interval="1h")
+    )
+
+    rows = await get_price_candles(from_timestamp - 3 * HOUR, later, HOUR)
+    closes = np.array([row.close for row in reversed(rows)])
+    expected = sma(closes, 3)[-len(result["values"]) :][::-1]
+    assert result["indicator"] == "sma"
+    assert result["interval"] == HOUR
+    assert [v["timestamp"] for v in result["values"]] == [
+        row.timestamp for row in rows[: len(result["values"])]
+    ]
+    np.testing.assert_allclose([v["value"] for v in result["values"]], expected)
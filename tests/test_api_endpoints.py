@@ -1,3 +1,4 @@
+import json
 import pytest
 from datetime import datetime, timezone
 
@@ -30,3 +31,117 @@ def test_get_price_history_range(client, mock_redis, mock_coingecko):
     assert "prices" in data
     assert isinstance(data["prices"], list)
     assert len(data["prices"]) == 2  # We expect 2 price points from our mock
+
+
+def test_get_price_history_etag(client, mock_redis, mock_coingecko):
+    """Test cached history is revalidated with ETag and If-None-Match"""
+    # A settled range, so the second request is served from stored points
+    to_timestamp = int(datetime.now(timezone.utc).timestamp() * 1000) - 2 * 86400000
+    url = (
+        f"/api/v1/price-history?from_timestamp={to_timestamp - 3600000}"
+        f"&to_timestamp={to_timestamp}"
+    )
+
+    first = client.get(url)
+    etag = first.headers["etag"]
+    assert first.headers["content-type"] == "application/json"
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    changed = client.get(url, headers={"If-None-Match": '"stale"'})
+    assert changed.status_code == 200
+    assert changed.content == first.content
+
+
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_export_price_history(client, mock_redis, mock_coingecko, export_format):
+    """Test price history export streams one row per price point"""
+    to_timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
+    from_timestamp = to_timestamp - 3600000  # 1 hour ago
+
+    response = client.get(
+        f"/api/v1/price-history/export?from_timestamp={from_timestamp}"
+        f"&to_timestamp={to_timestamp}&format={export_format}"
+    )
+    assert response.status_code == 200
+
+    lines = response.text.splitlines()
+    if export_format == "csv":
+        assert response.headers["content-type"].startswith("text/csv")
+        assert lines.pop(0) == "timestamp,price"
+        rows = [line.split(",") for line in lines]
+    else:
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [list(json.loads(line).values()) for line in lines]
+
+    assert len(rows) == 2  # We expect 2 price points from our mock
+    assert [float(price) for _, price in rows] == [50100.0, 50000.0]
+
+
+def test_export_price_history_rejects_unknown_format(client):
+    """Test export rejects unsupported formats"""
+    response = client.get(
+        "/api/v1/price-history/export?from_timestamp=1749752399"
+        "&to_timestamp=1749838799&format=xml"
+    )
+    assert response.status_code == 400
+
+
+def test_get_indicator(client, mock_redis, mock_coingecko):
+    """Test an analytics indicator is served with one value per interval"""
+    to_timestamp = int(datetime.now(timezone.utc).timestamp() * 1000) - 2 * 86400000
+    response = client.get(
+        f"/api/v1/analytics/log_return?from_timestamp={to_timestamp - 6 * 3600000}"
+        f"&to_timestamp={to_timestamp}&interval=1h&window=2"
+    )
+    assert response.status_code == 200
+    assert "etag" in response.headers
+
+    data = response.json()
+    assert data["indicator"] == "log_return"
+    assert data["interval"] == 3600000
+    assert data["window"] == 2
+    timestamps = [value["timestamp"] for value in data["values"]]
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert all(timestamp % 3600000 == 0 for timestamp in timestamps)
+
+
+@pytest.mark.parametrize(
+    "indicator,extra", [("rsi", ""), ("sma", "&window=1"), ("sma", "&interval=3h")]
+)
+def test_get_indicator_rejects_invalid_params(client, indicator, extra):
+    """Test analytics validates the indicator, window and interval"""
+    response = client.get(
+        f"/api/v1/analytics/{indicator}?from_timestamp=1749752399"
+        f"&to_timestamp=1749838799{extra}"
+    )
+    assert response.status_code == 400
+
+
+def test_get_current_prices_rejects_invalid_assets(client):
+    """Test /current-prices validates the requested assets"""
+    response = client.get("/api/v1/current-prices?assets=bitcoin,BAD%20ID")
+    assert response.status_code == 400
+
+
+def test_price_stream_rejects_too_many_pairs(client):
+    """Test a stream of more pairs than PRICE_STREAM_MAX_PAIRS is refused"""
+    assets = ",".join(f"coin-{i}" for i in range(11))
+    currencies = ",".join(f"fiat-{i}" for i in range(10))
+    response = client.get(
+        f"/api/v1/price-stream?assets={assets}&currencies={currencies}"
+    )
+    assert response.status_code == 400
+
+
+def test_cache_stats(client):
+    """Test cache statistics report both tiers"""
+    response = client.get("/api/v1/cache-stats")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert {"hits", "misses", "evictions", "entries", "bytes"} <= set(data["l1"])
+    assert set(data["redis"]) == {"hits", "misses"}
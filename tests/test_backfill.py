@@ -0,0 +1,87 @@
+import pytest
+from datetime import datetime, timezone
+from app.db.repository import AsyncPriceRepository
+from app.services.backfill import Backfill, parse_time, plan_segments
+from app.services.coverage import DAY_MS, FIVE_MINUTES_MS, HOUR_MS
+
+
+@pytest.fixture
+def hourly_coingecko(monkeypatch):
+    """Mock CoinGecko returning hourly points, failing chunks listed in fail"""
+
+    class HourlyCoinGecko:
+        requested = []
+        fail = set()
+
+        async def get_price_history_range(
+            self, from_timestamp: int, to_timestamp: int, **series
+        ):
+            HourlyCoinGecko.requested.append((from_timestamp, to_timestamp))
+            if (from_timestamp, to_timestamp) in HourlyCoinGecko.fail:
+                raise RuntimeError("upstream error")
+            first = from_timestamp - from_timestamp % HOUR_MS + HOUR_MS
+            return {
+                "prices": [
+                    [ts, 100.0] for ts in range(first, to_timestamp + 1, HOUR_MS)
+                ]
+            }
+
+    monkeypatch.setattr("app.services.backfill.CoinGeckoService", HourlyCoinGecko)
+    return HourlyCoinGecko
+
+
+def test_plan_segments_uses_finest_granularity():
+    """Test auto granularity fetches the last day at 5 minutes, the rest hourly"""
+    now = 1_750_000_000_000
+
+    assert plan_segments(now - 10 * DAY_MS, now, now, None) == [
+        ((now - 10 * DAY_MS, now - DAY_MS - 1), HOUR_MS),
+        ((now - DAY_MS, now), FIVE_MINUTES_MS),
+    ]
+    assert plan_segments(now - 10 * DAY_MS, now, now, DAY_MS) == [
+        ((now - 10 * DAY_MS, now), DAY_MS)
+    ]
+
+
+def test_parse_time():
+    """Test backfill bounds accept Unix seconds, milliseconds and ISO dates"""
+    assert parse_time("1750000000") == 1_750_000_000_000
+    assert parse_time("1750000000000") == 1_750_000_000_000
+    assert parse_time("2025-06-15T15:06:40") == 1_750_000_000_000
+
+
+@pytest.mark.asyncio
+async def test_backfill_resumes_from_checkpoints(
+    test_db, session_factory, hourly_coingecko
+):
+    """Test a backfill fetches 90-day chunks and a rerun only retries failures"""
+    now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    to_timestamp = now - 10 * DAY_MS
+    from_timestamp = to_timestamp - 200 * DAY_MS
+    chunks = [
+        (from_timestamp, from_timestamp + 90 * DAY_MS),
+        (from_timestamp + 90 * DAY_MS + 1, from_timestamp + 180 * DAY_MS + 1),
+        (from_timestamp + 180 * DAY_MS + 2, to_timestamp),
+    ]
+    hourly_coingecko.fail = {chunks[1]}
+
+    backfill = Backfill(session_factory, granularity=HOUR_MS, batch_size=500)
+    stats = await backfill.run(from_timestamp, to_timestamp)
+
+    assert sorted(hourly_coingecko.requested) == chunks
+    assert stats.chunks == 2
+    assert stats.failed == 1
+    assert stats.inserted == stats.fetched > 0
+
+    hourly_coingecko.requested.clear()
+    hourly_coingecko.fail = set()
+    stats = await Backfill(session_factory, granularity=HOUR_MS).run(
+        from_timestamp, to_timestamp
+    )
+
+    assert hourly_coingecko.requested == [chunks[1]]
+    assert stats.failed == 0
+    stored = await AsyncPriceRepository(test_db).get_price_range(
+        from_timestamp, to_timestamp
+    )
+    assert len(stored) == 200 * 24
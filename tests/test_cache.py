@@ -0,0 +1,116 @@
+import asyncio
+import json
+import pytest
+from app.cache.local_cache import LocalCache
+from app.cache.redis_cache import CacheInvalidationListener, RedisCache
+from app.cache.serializers import get_serializer
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+def test_serializer_round_trip(name):
+    """Test each cache serializer restores a price history payload"""
+    serializer = get_serializer(name)
+    payload = {
+        "prices": [
+            {"timestamp": 1749981787521, "price": 104941.085},
+            {"timestamp": 1749978205180, "price": 105211.979},
+        ]
+    }
+
+    data = serializer.dumps(payload)
+
+    assert isinstance(data, bytes)
+    assert serializer.loads(data) == payload
+
+
+def test_unknown_serializer():
+    """Test an unknown serializer name is rejected"""
+    with pytest.raises(ValueError):
+        get_serializer("pickle")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_local_cache_expires_and_evicts():
+    """Test L1 entries expire per key and the LRU stays within both bounds"""
+    clock = FakeClock()
+    local = LocalCache(max_entries=3, max_bytes=100, clock=clock)
+
+    local.set("short", 1, ttl=1, size=10)
+    local.set("a", 2, ttl=60, size=10)
+    local.set("b", 3, ttl=60, size=10)
+    clock.now = 2
+    assert local.get("short") is None
+
+    local.set("c", 4, ttl=60, size=10)
+    local.get("a")
+    local.set("d", 5, ttl=60, size=10)
+    # b was least recently used once a was read
+    assert [local.get(key) for key in "abcd"] == [2, None, 4, 5]
+
+    local.set("large", 6, ttl=60, size=85)
+    assert local.get("large") == 6 and local.get("a") is None
+    assert local.bytes <= 100 and len(local) <= 3
+    local.set("too-large", 7, ttl=60, size=101)
+    assert local.get("too-large") is None
+
+    info = local.info()
+    assert info["evictions"] == 3
+    assert (info["hits"], info["misses"]) == (5, 4)
+
+
+def test_local_cache_negative_entries_and_fill():
+    """Test errors are replayed until they expire and stale fills are dropped"""
+    clock = FakeClock()
+    local = LocalCache(max_entries=10, max_bytes=1000, clock=clock)
+    error = ValueError("upstream down")
+
+    local.set_error("key", error, ttl=5)
+    assert local.get_error("key") is error
+    assert local.get("key") is None
+    clock.now = 5
+    assert local.get_error("key") is None
+
+    generation = local.generation
+    local.invalidate("key")
+    local.fill("key", 1, ttl=60, size=1, generation=generation)
+    assert local.get("key") is None
+    local.fill("key", 1, ttl=60, size=1, generation=local.generation)
+    assert local.get("key") == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_serves_l1_and_invalidates_across_processes():
+    """Test L1 hits skip Redis and invalidations from other processes drop keys"""
+    cache = RedisCache()
+    listener = CacheInvalidationListener(cache.local)
+    listener.start()
+    try:
+        await asyncio.wait_for(listener.subscribed.wait(), 5)
+        await cache.set("l1-test", {"price": 1.0})
+        await cache.redis_client.delete("l1-test")
+        # Still served from L1, and our own invalidation message was ignored
+        assert await cache.get("l1-test") == {"price": 1.0}
+
+        await cache.redis_client.set("l1-test", b'{"price": 2.0}')
+        await cache.redis_client.publish(
+            settings.CACHE_INVALIDATION_CHANNEL,
+            json.dumps({"origin": "another-worker", "keys": ["l1-test"]}),
+        )
+        for _ in range(100):
+            if await cache.get("l1-test") == {"price": 2.0}:
+                break
+            await asyncio.sleep(0.01)
+        assert await cache.get("l1-test") == {"price": 2.0}
+    finally:
+        await listener.stop()
+        await cache.redis_client.delete("l1-test")
@@ -0,0 +1,73 @@
+import httpx
+import pytest
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.exceptions import CircuitOpenError, CoinGeckoAPIError
+from app.core.rate_limiter import RateGovernor, TokenBucket
+from app.services.coingecko_service import CoinGeckoService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_and_lets_one_trial_through():
+    """Test the breaker opens after repeated failures and recovers via a trial"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record(False)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 10
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one trial at a time
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    clock.now = 20
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.info() == {
+        "state": "closed",
+        "failures": 0,
+        "opened": 2,
+        "rejected": 2,
+    }
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_without_calling_upstream(monkeypatch):
+    """Test CoinGecko is no longer called once its errors opened the breaker"""
+    monkeypatch.setattr(
+        "app.services.coingecko_service.settings.COINGECKO_MAX_RETRIES", 0
+    )
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(502)
+
+    service = CoinGeckoService(
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        governor=RateGovernor(TokenBucket(rate=1000, capacity=100)),
+        breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60),
+    )
+
+    for _ in range(3):
+        with pytest.raises(CoinGeckoAPIError):
+            await service.get_current_prices(["bitcoin"], ["usd"])
+    with pytest.raises(CircuitOpenError):
+        await service.get_current_prices(["bitcoin"], ["usd"])
+    assert len(requests) == 3
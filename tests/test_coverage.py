@@ -0,0 +1,84 @@
+import pytest
+from app.services.coverage import (
+    DAY_MS,
+    FIVE_MINUTES_MS,
+    HOUR_MS,
+    bucket_starts,
+    granularity_for_range,
+    merge_intervals,
+    missing_intervals,
+    split_interval,
+)
+from app.services.downsampling import interval_for_max_points
+
+NOW = 1_750_000_000_000
+
+
+def test_granularity_for_range():
+    """Test granularity follows CoinGecko's automatic range granularity"""
+    assert granularity_for_range(NOW - HOUR_MS, NOW, NOW) == FIVE_MINUTES_MS
+    # A one day window that is not recent only has hourly data
+    assert granularity_for_range(NOW - 3 * DAY_MS, NOW - 2 * DAY_MS, NOW) == HOUR_MS
+    assert granularity_for_range(NOW - 30 * DAY_MS, NOW, NOW) == HOUR_MS
+    assert granularity_for_range(NOW - 365 * DAY_MS, NOW, NOW) == DAY_MS
+
+
+def test_merge_intervals():
+    """Test overlapping and touching intervals are merged"""
+    assert merge_intervals([(20, 30), (0, 10), (11, 15), (25, 40)]) == [
+        (0, 15),
+        (20, 40),
+    ]
+
+
+def test_missing_intervals():
+    """Test only the uncovered parts of a range are returned"""
+    assert missing_intervals(0, 100, []) == [(0, 100)]
+    assert missing_intervals(0, 100, [(-10, 200)]) == []
+    assert missing_intervals(0, 100, [(10, 20), (50, 60)]) == [
+        (0, 9),
+        (21, 49),
+        (61, 100),
+    ]
+    assert missing_intervals(0, 100, [(0, 40), (90, 150)]) == [(41, 89)]
+
+
+def test_split_interval():
+    """Test long intervals are split into chunks of at most max_span"""
+    assert split_interval((0, 100), None) == [(0, 100)]
+    assert split_interval((0, 100), 40) == [(0, 40), (41, 81), (82, 100)]
+
+
+def test_bucket_starts():
+    """Test buckets are epoch aligned and cover both ends of the range"""
+    assert bucket_starts(HOUR_MS + 10, 3 * HOUR_MS, HOUR_MS) == [
+        HOUR_MS,
+        2 * HOUR_MS,
+        3 * HOUR_MS,
+    ]
+    assert bucket_starts(HOUR_MS, 2 * HOUR_MS - 1, HOUR_MS) == [HOUR_MS]
+
+
+def test_interval_for_max_points():
+    """Test max_points picks the smallest interval that fits"""
+    assert interval_for_max_points(0, DAY_MS - 1, 24) == HOUR_MS
+    assert interval_for_max_points(0, DAY_MS - 1, 23) == 2 * HOUR_MS
+    assert interval_for_max_points(0, 7 * DAY_MS - 1, 1) == 7 * DAY_MS
+
+
+def test_interval_for_max_points_unaligned_range():
+    """Test buckets are counted as aligned to the epoch, not to the range"""
+    # 00:30 to 02:29 touches the 00:00, 01:00 and 02:00 hours
+    assert interval_for_max_points(HOUR_MS // 2, 5 * HOUR_MS // 2 - 1, 2) == (
+        2 * HOUR_MS
+    )
+    assert interval_for_max_points(HOUR_MS // 2, 5 * HOUR_MS // 2 - 1, 3) == HOUR_MS
+    # Six days across a week boundary touch two weeks
+    week = 7 * DAY_MS
+    assert interval_for_max_points(week - 3 * DAY_MS, week + 3 * DAY_MS - 1, 2) == (
+        week
+    )
+    with pytest.raises(ValueError):
+        interval_for_max_points(week - 3 * DAY_MS, week + 3 * DAY_MS - 1, 1)
+    with pytest.raises(ValueError):
+        interval_for_max_points(0, 365 * DAY_MS, 1)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from app.schemas.price import INDICATOR_NAMES
+from app.services.indicators import (
+    INDICATORS,
+    drawdown,
+    ema,
+    extend,
+    log_returns,
+    rolling_volatility,
+    sma,
+)
+
+PRICES = 50000.0 + np.cumsum(np.random.default_rng(7).normal(0, 100, 3000))
+
+
+def test_indicators_match_schema():
+    """Test every indicator the API accepts has a kernel and vice versa"""
+    assert tuple(INDICATORS) == INDICATOR_NAMES
+
+
+def test_kernels_match_naive_loops():
+    """Test vectorized kernels against the textbook per-price definitions"""
+    window = 24
+    returns = np.log(PRICES[1:] / PRICES[:-1])
+    values = {
+        "log_return": log_returns(PRICES),
+        "sma": sma(PRICES, window),
+        "volatility": rolling_volatility(PRICES, window),
+        "drawdown": drawdown(PRICES, window),
+    }
+
+    for i in range(len(PRICES)):
+        start = i - window + 1
+        if i == 0:
+            assert np.isnan(values["log_return"][0])
+        else:
+            assert values["log_return"][i] == pytest.approx(returns[i - 1])
+        if start < 0:
+            assert np.isnan(values["sma"][i])
+            assert np.isnan(values["drawdown"][i])
+        else:
+            recent = PRICES[start : i + 1]
+            assert values["sma"][i] == pytest.approx(recent.mean())
+            assert values["drawdown"][i] == pytest.approx(PRICES[i] / recent.max() - 1)
+        if i < window:
+            assert np.isnan(values["volatility"][i])
+        else:
+            assert values["volatility"][i] == pytest.approx(
+                returns[i - window : i].std(ddof=1)
+            )
+
+    # A short window spans several closed-form blocks, checking the carry
+    for span in (3, window):
+        alpha = 2 / (span + 1)
+        expected = [PRICES[0]]
+        for price in PRICES[1:]:
+            expected.append(alpha * price + (1 - alpha) * expected[-1])
+        np.testing.assert_allclose(ema(PRICES, span), expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("name", INDICATORS)
+def test_extend_matches_full_computation(name):
+    """Test extending from state in chunks gives the values of one pass"""
+    window = 20
+    full, _ = extend(name, window, PRICES)
+
+    parts = []
+    state = None
+    for chunk in np.array_split(PRICES, [5, 6, 300, 1200]):
+        values, state = extend(name, window, chunk, state)
+        parts.append(values)
+        assert len(state.tail) <= INDICATORS[name].lookback(window)
+
+    np.testing.assert_allclose(np.concatenate(parts), full, rtol=1e-12)
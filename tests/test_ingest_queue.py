@@ -0,0 +1,71 @@
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+from app.db.repository import AsyncPriceRepository
+from app.services.ingest_queue import IngestQueue
+
+NOW = 1_700_000_000_000
+
+
+@pytest.mark.asyncio
+async def test_rows_are_deduplicated_and_flushed_at_batch_size(
+    test_db, session_factory
+):
+    """Test repeats are buffered once and a full batch is stored without waiting"""
+    queue = IngestQueue(session_factory, batch_size=2, flush_interval=60)
+    queue.start()
+    try:
+        await queue.put([("bitcoin", "usd", NOW, 50000.0)])
+        await queue.put([("bitcoin", "usd", NOW, 50000.0)])
+        assert queue.info()["pending"] == 1
+
+        await queue.put([("bitcoin", "eur", NOW, 46000.0)])
+        for _ in range(100):
+            if queue.flushed:
+                break
+            await asyncio.sleep(0.01)
+        assert queue.info() == {"pending": 0, "flushed": 2, "dropped": 0}
+    finally:
+        await queue.stop()
+
+    repository = AsyncPriceRepository(test_db)
+    assert (await repository.get_latest_price("bitcoin", "usd")).price == 50000.0
+    assert (await repository.get_latest_price("bitcoin", "eur")).price == 46000.0
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_buffered_rows(test_db, session_factory):
+    """Test rows below the batch size are stored on shutdown"""
+    queue = IngestQueue(session_factory, batch_size=100, flush_interval=60)
+    queue.start()
+    await queue.put([("bitcoin", "usd", NOW, 50000.0)])
+    assert await AsyncPriceRepository(test_db).get_latest_price() is None
+
+    await queue.stop()
+    assert (await AsyncPriceRepository(test_db).get_latest_price()).price == 50000.0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure_then_drops():
+    """Test put waits for room while the database is down, then drops its rows"""
+
+    @asynccontextmanager
+    async def failing_session():
+        raise ConnectionError("database is down")
+        yield
+
+    queue = IngestQueue(
+        failing_session, batch_size=10, flush_interval=60, max_rows=2, put_timeout=0.05
+    )
+    await queue.put([("bitcoin", "usd", NOW, 1.0), ("bitcoin", "usd", NOW + 1, 2.0)])
+
+    with pytest.raises(ConnectionError):
+        await queue.flush()
+    # Failed rows are kept for the next flush
+    assert queue.info()["pending"] == 2
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await queue.put([("bitcoin", "usd", NOW + 2, 3.0), ("bitcoin", "eur", NOW, 4.0)])
+    assert loop.time() - started >= 0.05
+    assert queue.info() == {"pending": 2, "flushed": 0, "dropped": 2}
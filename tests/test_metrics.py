@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+from app.core.rate_limiter import RateGovernor, TokenBucket
+from app.services.coingecko_service import CoinGeckoService
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint(client, mock_redis, mock_coingecko):
+    """Test /metrics exposes stage timings, cache tiers, the DB pool and ingestion"""
+    to_timestamp = int(datetime.now(timezone.utc).timestamp() * 1000) - 2 * 86400000
+    stages_before = _sample(
+        "pricefetch_stage_seconds_count", stage="history_cache_read"
+    )
+    ingested_before = _sample("pricefetch_rows_ingested_total", path="insert")
+
+    response = client.get(
+        f"/api/v1/price-history?from_timestamp={to_timestamp - 3600000}"
+        f"&to_timestamp={to_timestamp}"
+    )
+    assert response.status_code == 200
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    body = metrics.text
+    for name in (
+        'pricefetch_stage_seconds_bucket{le="0.005",stage="history_load"}',
+        'pricefetch_cache_hit_ratio{tier="redis"}',
+        'pricefetch_db_pool_connections{state="checked_out"}',
+        "pricefetch_db_pool_saturation",
+    ):
+        assert name in body
+
+    assert (
+        _sample("pricefetch_stage_seconds_count", stage="history_cache_read")
+        == stages_before + 1
+    )
+    assert _sample("pricefetch_rows_ingested_total", path="insert") == (
+        ingested_before + 2
+    )
+
+
+@pytest.mark.asyncio
+async def test_upstream_requests_counted_by_status(monkeypatch):
+    """Test every CoinGecko attempt is counted under its status, errors included"""
+    monkeypatch.setattr("app.core.rate_limiter.settings.COINGECKO_BACKOFF_BASE", 0)
+    responses = iter(
+        [httpx.ConnectError("refused"), httpx.Response(503), httpx.Response(200)]
+    )
+
+    def handler(request):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        if response.status_code == 200:
+            return httpx.Response(200, json={"bitcoin": {"usd": 1.0}})
+        return response
+
+    before = {
+        status: _sample("pricefetch_upstream_requests_total", status=status)
+        for status in ("error", "503", "200")
+    }
+    latency_before = _sample("pricefetch_upstream_request_seconds_count")
+
+    service = CoinGeckoService(
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        governor=RateGovernor(TokenBucket(rate=1000, capacity=100)),
+    )
+    await service.get_current_prices(["bitcoin"], ["usd"])
+
+    for status, count in before.items():
+        assert _sample("pricefetch_upstream_requests_total", status=status) == count + 1
+    assert _sample("pricefetch_upstream_request_seconds_count") == latency_before + 3
@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy import select, text
+from app.db import models
+from app.db.partitions import (
+    compact_partition,
+    ensure_partitions,
+    is_compacted,
+    list_partitions,
+    month_partition,
+    month_partitions,
+)
+from app.db.repository import AsyncPriceRepository
+from app.services.coverage import DAY_MS, HOUR_MS
+from app.services.retention import run_retention
+
+JAN_2024 = 1_704_067_200_000  # 2024-01-01T00:00:00Z
+FEB_2024 = 1_706_745_600_000
+
+
+async def partition_of(db, timestamp):
+    result = await db.execute(
+        text("SELECT tableoid::regclass::text FROM price_points WHERE timestamp = :ts"),
+        {"ts": timestamp},
+    )
+    return result.scalar()
+
+
+def test_month_partitions():
+    """Test monthly partitions are UTC month bounds in milliseconds"""
+    assert month_partition(JAN_2024 + 10 * DAY_MS) == (
+        "price_points_p202401",
+        JAN_2024,
+        FEB_2024,
+    )
+    assert [p.name for p in month_partitions(JAN_2024 - 1, FEB_2024)] == [
+        "price_points_p202312",
+        "price_points_p202401",
+        "price_points_p202402",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_moves_rows_out_of_default(test_db):
+    """Test creating a partition takes over rows parked in the default one"""
+    repository = AsyncPriceRepository(test_db)
+    await repository.insert_price_points([(JAN_2024 + HOUR_MS, 1.0)])
+    assert await partition_of(test_db, JAN_2024 + HOUR_MS) == "price_points_default"
+
+    created = await ensure_partitions(test_db, JAN_2024, FEB_2024 - 1)
+    assert await ensure_partitions(test_db, JAN_2024, FEB_2024 - 1) == []
+
+    assert [p.name for p in created] == ["price_points_p202401"]
+    assert await list_partitions(test_db) == created
+    assert await partition_of(test_db, JAN_2024 + HOUR_MS) == "price_points_p202401"
+
+
+@pytest.mark.asyncio
+async def test_compact_partition_keeps_hourly_candles(test_db):
+    """Test compaction thins the partition and leaves the hourly rollups intact"""
+    await ensure_partitions(test_db, JAN_2024, JAN_2024)
+    repository = AsyncPriceRepository(test_db)
+    minute = 60_000
+    await repository.insert_price_points(
+        [(JAN_2024 + i * 10 * minute, float(i)) for i in range(12)]
+    )
+    await repository.insert_price_points([(JAN_2024, 7.0)], asset="ethereum")
+
+    await compact_partition(test_db, month_partition(JAN_2024), HOUR_MS)
+
+    stored = await repository.get_price_range(JAN_2024, FEB_2024)
+    assert [(p.timestamp, p.price) for p in stored] == [
+        (JAN_2024 + HOUR_MS + 50 * minute, 11.0),
+        (JAN_2024 + 50 * minute, 5.0),
+    ]
+    candles = (
+        await test_db.execute(
+            select(models.PriceCandle)
+            .where(
+                models.PriceCandle.asset == "bitcoin",
+                models.PriceCandle.interval_ms == HOUR_MS,
+            )
+            .order_by(models.PriceCandle.timestamp)
+        )
+    ).scalars()
+    assert [
+        (c.timestamp, c.open, c.high, c.low, c.close, c.count) for c in candles
+    ] == [
+        (JAN_2024, 0.0, 5.0, 0.0, 5.0, 6),
+        (JAN_2024 + HOUR_MS, 6.0, 11.0, 6.0, 11.0, 6),
+    ]
+    assert await is_compacted(test_db, month_partition(JAN_2024))
+
+
+@pytest.mark.asyncio
+async def test_run_retention(test_db, session_factory):
+    """Test retention premakes partitions and only compacts expired months once"""
+    await ensure_partitions(test_db, JAN_2024, FEB_2024)
+    now = FEB_2024 + 100 * DAY_MS
+
+    compacted = await run_retention(session_factory, now=now)
+    assert await run_retention(session_factory, now=now) == []
+
+    assert [p.name for p in compacted] == ["price_points_p202401"]
+    names = {p.name for p in await list_partitions(test_db)}
+    assert {"price_points_p202405", "price_points_p202408"} <= names
+
+
+@pytest.mark.asyncio
+async def test_run_retention_partitions_old_months(test_db, session_factory):
+    """Test history filled for a month without a partition gets one and is compacted"""
+    jun_2023 = 1_685_577_600_000
+    repository = AsyncPriceRepository(test_db)
+    await repository.insert_price_points(
+        [(jun_2023 + i * HOUR_MS // 2, 1.0 + i) for i in range(48)]
+    )
+    assert await partition_of(test_db, jun_2023) == "price_points_default"
+
+    compacted = await run_retention(session_factory, now=FEB_2024)
+
+    assert [p.name for p in compacted] == ["price_points_p202306"]
+    # The last point of the hour is kept
+    assert await partition_of(test_db, jun_2023 + HOUR_MS // 2) == (
+        "price_points_p202306"
+    )
+    count = await test_db.execute(text("SELECT count(*) FROM price_points_default"))
+    assert count.scalar() == 0
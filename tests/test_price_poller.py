@@ -0,0 +1,67 @@
+import pytest
+from datetime import datetime, timezone
+from app.db.repository import AsyncPriceRepository
+from app.services.price_poller import PricePoller
+from app.services.price_service import PriceService, current_price_cache_key
+
+
+@pytest.fixture
+def fixed_coingecko(monkeypatch):
+    """Mock CoinGecko returning a settable current price"""
+
+    class FixedCoinGecko:
+        last_updated_at = int(datetime.now(timezone.utc).timestamp())
+        price = 50000.0
+
+        async def get_current_prices(self, assets, currencies):
+            return {
+                "bitcoin": {
+                    "usd": FixedCoinGecko.price,
+                    "last_updated_at": FixedCoinGecko.last_updated_at,
+                }
+            }
+
+    monkeypatch.setattr("app.services.price_poller.CoinGeckoService", FixedCoinGecko)
+    return FixedCoinGecko
+
+
+@pytest.mark.asyncio
+async def test_poll_batches_new_prices(
+    test_db, mock_redis, fixed_coingecko, session_factory
+):
+    """Test the poller caches every poll and inserts new prices in batches"""
+    poller = PricePoller(session_factory=session_factory, interval=1, batch_size=2)
+
+    await poller.poll_once()
+    await poller.poll_once()  # same last_updated_at, not queued again
+    assert len(poller.pending) == 1
+    cache_key = current_price_cache_key("bitcoin", "usd")
+    assert poller.cache.cache[cache_key]["price"] == 50000.0
+    # Only the new price is announced to the live stream
+    assert len(poller.cache.published) == 1
+
+    fixed_coingecko.last_updated_at += 30
+    fixed_coingecko.price = 50100.0
+    await poller.poll_once()
+
+    assert poller.pending == []
+    assert len(poller.cache.published) == 2
+    stored = await AsyncPriceRepository(test_db).get_price_range(0, 2**62)
+    assert [p.price for p in stored] == [50100.0, 50000.0]
+
+
+@pytest.mark.asyncio
+async def test_current_price_falls_back_to_stale_db_value(
+    test_db, mock_redis, monkeypatch
+):
+    """Test polled mode serves the latest stored price marked stale on a cache miss"""
+    monkeypatch.setattr(
+        "app.services.price_service.settings.PRICE_POLLER_MODE", "external"
+    )
+    now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    await AsyncPriceRepository(test_db).create_price_point(now - 600000, 49000.0)
+
+    result = await PriceService(test_db).get_current_price()
+
+    assert result.price == 49000.0
+    assert result.stale is True
@@ -0,0 +1,72 @@
+import json
+import pytest
+from pydantic_core import to_json
+from app.core.price_series import PriceSeries
+from app.db.repository import AsyncPriceRepository
+
+
+def test_from_market_chart_drops_invalid_points():
+    """Test vectorized parsing keeps only complete numeric points"""
+    series = PriceSeries.from_market_chart(
+        {"prices": [[1000, 1.5], [2000, None], [None, 2.0], [3000.0, "3.5"]]}
+    )
+    assert list(series) == [(1000, 1.5), (3000, 3.5)]
+
+    # Ragged payloads take the point by point path with the same rules
+    series = PriceSeries.from_market_chart(
+        {"prices": [[1000, 1.5], [2000], [3000, "bad"], [4000, 4.0, "extra"]]}
+    )
+    assert list(series) == [(1000, 1.5), (4000, 4.0)]
+
+    assert len(PriceSeries.from_market_chart({"prices": None})) == 0
+    assert len(PriceSeries.from_market_chart({})) == 0
+
+
+def test_merge_filters_and_splits():
+    """Test merging deduplicates by timestamp and buckets split at bounds"""
+    first = PriceSeries.from_rows([(3000, 3.0), (1000, 1.0)])
+    second = PriceSeries.from_rows([(1000, 9.0), (2000, 2.0), (5000, 5.0)])
+
+    merged = PriceSeries.merge(first, second)
+    assert list(merged) == [(1000, 1.0), (2000, 2.0), (3000, 3.0), (5000, 5.0)]
+    assert list(merged.between(2000, 4000)) == [(2000, 2.0), (3000, 3.0)]
+    assert list(merged[::-1][:2]) == [(5000, 5.0), (3000, 3.0)]
+
+    buckets = merged.split([0, 2000, 4000], 2000)
+    assert [list(bucket) for bucket in buckets] == [
+        [(1000, 1.0)],
+        [(2000, 2.0), (3000, 3.0)],
+        [(5000, 5.0)],
+    ]
+    # Buckets need not be contiguous
+    assert [len(b) for b in merged.split([0, 4000], 1000)] == [0, 0]
+
+
+def test_json_round_trip():
+    """Test the JSON encoding matches the API's price point objects"""
+    series = PriceSeries.from_rows([(1749981787521, 104941.085), (1749978205180, 0.1)])
+
+    data = series.to_json()
+
+    points = [
+        {"timestamp": 1749981787521, "price": 104941.085},
+        {"timestamp": 1749978205180, "price": 0.1},
+    ]
+    assert json.loads(data) == points
+    # Same bytes as encoding the objects, so cached buckets and ETags carry over
+    assert data == to_json(points)
+    assert PriceSeries.from_json(data) == series
+    assert PriceSeries.empty().to_json() == b"[]"
+
+
+@pytest.mark.asyncio
+async def test_repository_round_trip(test_db):
+    """Test a series is inserted as a sequence of points and read back as one"""
+    repository = AsyncPriceRepository(test_db)
+    series = PriceSeries.from_rows([(2000, 2.0), (1000, 1.0), (3000, 3.0)])
+
+    assert await repository.insert_price_points(series[:2]) == 2
+    assert await repository.insert_price_points(series, use_copy=True) == 1
+
+    stored = await repository.get_price_series(0, 5000)
+    assert stored == series.sorted()
@@ -1,6 +1,17 @@
+import asyncio
+import json
 import pytest
 from datetime import datetime, timezone
-from app.services.price_service import PriceService
+from app.cache.local_cache import get_local_cache
+from app.core.exceptions import CircuitOpenError, CoinGeckoAPIError
+from app.db.repository import AsyncPriceRepository
+from app.schemas.price import CurrentPriceResponse
+from app.services import price_service
+from app.services.price_service import (
+    PriceService,
+    current_price_cache_key,
+    current_price_cache_value,
+)
 
 
 @pytest.mark.asyncio
@@ -29,3 +40,226 @@ async def test_get_price_history_range(test_db, mock_redis, mock_coingecko):
     assert "prices" in result
     assert isinstance(result["prices"], list)
     assert len(result["prices"]) == 2  # We expect 2 price points from our mock
+
+
+@pytest.mark.asyncio
+async def test_get_price_history_range_fetches_only_missing_intervals(
+    test_db, mock_redis, monkeypatch
+):
+    """Test an overlapping range only asks CoinGecko for the uncovered part"""
+    requested = []
+
+    class RecordingCoinGecko:
+        async def get_price_history_range(
+            self, from_timestamp: int, to_timestamp: int, **series
+        ):
+            requested.append((from_timestamp, to_timestamp))
+            return {"prices": [[from_timestamp, 50000.0], [to_timestamp, 50100.0]]}
+
+    monkeypatch.setattr(
+        "app.services.price_service.CoinGeckoService", RecordingCoinGecko
+    )
+    service = PriceService(test_db)
+    now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    hour = 3600000
+    # Ranges are loaded as whole hour buckets at 5-minute granularity
+    first_bucket = (now - 3 * hour) - (now - 3 * hour) % hour
+
+    await service.get_price_history_range(now - 3 * hour, now - 1 * hour)
+    result = await service.get_price_history_range(now - 4 * hour, now - 2 * hour)
+
+    assert requested == [
+        (first_bucket, first_bucket + 3 * hour - 1),
+        (first_bucket - hour, first_bucket - 1),
+    ]
+    assert [p.timestamp for p in result.prices] == [first_bucket, first_bucket - 1]
+
+    # Cache hits splice the stored JSON, trimming only the edge buckets
+    body = await service.get_price_history_json(now - 4 * hour + 1, now - 1 * hour)
+    assert len(requested) == 2
+    assert json.loads(body) == {
+        "prices": [
+            {"timestamp": first_bucket, "price": 50000.0},
+            {"timestamp": first_bucket - 1, "price": 50100.0},
+        ]
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_price_history_range_downsampled(test_db, mock_redis, monkeypatch):
+    """Test interval downsampling returns OHLC candles per bucket"""
+    ten_minutes = 600000
+    fetched = []
+
+    class SteppedCoinGecko:
+        async def get_price_history_range(
+            self, from_timestamp: int, to_timestamp: int, **series
+        ):
+            points = [
+                [ts, float(ts // ten_minutes % 7)]
+                for ts in range(
+                    from_timestamp - from_timestamp % ten_minutes + ten_minutes,
+                    to_timestamp,
+                    ten_minutes,
+                )
+            ]
+            fetched.extend(points)
+            return {"prices": points}
+
+    monkeypatch.setattr("app.services.price_service.CoinGeckoService", SteppedCoinGecko)
+    service = PriceService(test_db)
+    now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    hour = 3600000
+
+    result = await service.get_price_history_range(
+        now - 4 * hour, now - 1 * hour, interval="1h"
+    )
+
+    assert result.interval == hour
+    assert len(result.candles) == 4
+    for candle in result.candles:
+        prices = [
+            p for ts, p in fetched if candle.timestamp <= ts < candle.timestamp + hour
+        ]
+        assert candle.open == prices[0]
+        assert candle.close == prices[-1]
+        assert candle.high == max(prices)
+        assert candle.low == min(prices)
+        assert candle.count == len(prices)
+    assert [p.timestamp for p in result.prices] == [c.timestamp for c in result.candles]
+
+
+@pytest.mark.asyncio
+async def test_get_current_prices_batches_assets(test_db, mock_redis, monkeypatch):
+    """Test several assets and currencies are filled by one upstream request"""
+    requested = []
+    last_updated_at = int(datetime.now(timezone.utc).timestamp())
+
+    class BatchCoinGecko:
+        async def get_current_prices(self, assets, currencies):
+            requested.append((assets, currencies))
+            return {
+                asset: {
+                    **{currency: 100.0 * (i + 1) for currency in currencies},
+                    "last_updated_at": last_updated_at,
+                }
+                for i, asset in enumerate(assets)
+                if asset != "unknown-coin"
+            }
+
+    monkeypatch.setattr("app.services.price_service.CoinGeckoService", BatchCoinGecko)
+    service = PriceService(test_db)
+
+    result = await service.get_current_prices(
+        ["ethereum", "unknown-coin"], ["usd", "eur"]
+    )
+    cached = await service.get_current_prices(["ethereum"], ["eur"])
+
+    # Tracked bitcoin/usd rides along with the requested pairs
+    assert requested == [(["bitcoin", "ethereum", "unknown-coin"], ["usd", "eur"])]
+    assert [(p.asset, p.currency, p.price) for p in result] == [
+        ("ethereum", "usd", 200.0),
+        ("ethereum", "eur", 200.0),
+    ]
+    assert cached[0].price == 200.0
+    stored = await service.repository.get_latest_price("bitcoin", "eur")
+    assert stored.price == 100.0
+
+
+@pytest.mark.asyncio
+async def test_upstream_errors_are_replayed(test_db, mock_redis, monkeypatch):
+    """Test an upstream failure is cached briefly instead of refetched per request"""
+    calls = []
+
+    class FailingCoinGecko:
+        async def get_current_prices(self, assets, currencies):
+            calls.append(assets)
+            raise CoinGeckoAPIError("API error: 500")
+
+    monkeypatch.setattr("app.services.price_service.CoinGeckoService", FailingCoinGecko)
+    service = PriceService(test_db)
+
+    for _ in range(3):
+        with pytest.raises(CoinGeckoAPIError):
+            await service.get_current_price()
+    assert len(calls) == 1
+
+    monkeypatch.setattr("app.services.price_service.settings.CACHE_NEGATIVE_TTL", 0)
+    get_local_cache().clear()
+    with pytest.raises(CoinGeckoAPIError):
+        await service.get_current_price()
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_pairs_are_not_refetched(test_db, mock_redis, monkeypatch):
+    """Test a pair CoinGecko does not know skips upstream for CACHE_NEGATIVE_TTL"""
+    calls = []
+
+    class PartialCoinGecko:
+        async def get_current_prices(self, assets, currencies):
+            calls.append(assets)
+            return {"bitcoin": {"usd": 100.0, "last_updated_at": 1750000000}}
+
+    monkeypatch.setattr("app.services.price_service.CoinGeckoService", PartialCoinGecko)
+    service = PriceService(test_db)
+
+    for _ in range(3):
+        assert await service.get_current_prices(["unknown-coin"], ["usd"]) == []
+    assert len(calls) == 1
+
+    get_local_cache().clear()
+    assert await service.get_current_prices(["unknown-coin"], ["usd"]) == []
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_current_price_falls_back_to_stored_price(
+    test_db, mock_redis, monkeypatch
+):
+    """Test an upstream failure serves the latest stored price marked stale"""
+
+    class FailingCoinGecko:
+        async def get_current_prices(self, assets, currencies):
+            raise CircuitOpenError("CoinGecko circuit breaker is open")
+
+    monkeypatch.setattr("app.services.price_service.CoinGeckoService", FailingCoinGecko)
+    now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    await AsyncPriceRepository(test_db).create_price_point(now - 60000, 49000.0)
+
+    result = await PriceService(test_db).get_current_price()
+
+    assert result == CurrentPriceResponse(
+        price=49000.0, timestamp=now - 60000, stale=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_soft_expired_price_is_refreshed_in_background(
+    test_db, mock_redis, session_factory, monkeypatch
+):
+    """Test a price past its soft TTL is served at once and refetched behind it"""
+    calls = []
+
+    class SlowCoinGecko:
+        async def get_current_prices(self, assets, currencies):
+            calls.append(assets)
+            await asyncio.sleep(0.05)
+            return {"bitcoin": {"usd": 51000.0, "last_updated_at": 1750000000}}
+
+    monkeypatch.setattr("app.services.price_service.CoinGeckoService", SlowCoinGecko)
+    service = PriceService(test_db, session_factory)
+    now = int(datetime.now(timezone.utc).timestamp() * 1000)
+    cached = CurrentPriceResponse(price=50000.0, timestamp=now - 120000)
+    await service.cache.set(
+        current_price_cache_key("bitcoin", "usd"),
+        current_price_cache_value(cached, now - 120000),
+    )
+
+    assert await service.get_current_price() == cached
+    assert await service.get_current_price() == cached
+    await asyncio.gather(*price_service._refreshes.values())
+
+    assert len(calls) == 1
+    latest = await AsyncPriceRepository(test_db).get_latest_price()
+    assert (latest.timestamp, latest.price) == (1750000000000, 51000.0)
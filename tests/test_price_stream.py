@@ -0,0 +1,126 @@
+import asyncio
+import json
+import pytest
+from app.cache.redis_cache import RedisCache
+from app.schemas.price import CurrentPriceResponse
+from app.services.price_stream import (
+    DROPPED_EVENT,
+    KEEP_ALIVE_EVENT,
+    RETRY_EVENT,
+    PriceBroadcaster,
+    publish_prices,
+    stream_events,
+)
+
+BTC_USD = ("bitcoin", "usd")
+
+
+def update(timestamp: int, price: float, asset: str = "bitcoin") -> dict:
+    return {"asset": asset, "currency": "usd", "price": price, "timestamp": timestamp}
+
+
+def events(subscription) -> list:
+    received = []
+    while not subscription.queue.empty():
+        event = subscription.queue.get_nowait()
+        received.append(event and json.loads(event.split(b"data: ")[1]))
+    return received
+
+
+def test_broadcaster_sends_each_change_once():
+    """Test updates reach the pair's subscribers once, and new ones get the latest"""
+    broadcaster = PriceBroadcaster(queue_size=8)
+    first = broadcaster.subscribe([BTC_USD])
+    second = broadcaster.subscribe([BTC_USD])
+    other = broadcaster.subscribe([("ethereum", "usd")])
+
+    assert broadcaster.publish(update(2000, 50100.0)) == 2
+    assert broadcaster.publish(update(2000, 50100.0)) == 0  # repeated
+    assert broadcaster.publish(update(1000, 50000.0)) == 0  # older
+
+    assert events(first) == [update(2000, 50100.0)]
+    assert events(second) == [update(2000, 50100.0)]
+    assert events(other) == []
+    late = broadcaster.subscribe([BTC_USD])
+    assert events(late) == [update(2000, 50100.0)]
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_dropped():
+    """Test a client whose queue is full is disconnected, the others are not"""
+    broadcaster = PriceBroadcaster(max_subscribers=2, queue_size=2)
+    slow = broadcaster.subscribe([BTC_USD])
+    fast = broadcaster.subscribe([BTC_USD])
+    assert broadcaster.subscribe([BTC_USD]) is None
+
+    # Room for one change per pair plus queue_size more
+    for timestamp in range(1, 5):
+        broadcaster.publish(update(timestamp, 50000.0 + timestamp))
+        events(fast)
+
+    assert broadcaster.info() == {"subscribers": 1, "dropped": 1, "pairs": 1}
+    assert [event async for event in stream_events(broadcaster, slow)] == [
+        RETRY_EVENT,
+        DROPPED_EVENT,
+    ]
+    # The freed slot can be taken again
+    assert broadcaster.subscribe([BTC_USD]) is not None
+
+
+@pytest.mark.asyncio
+async def test_subscriber_to_more_pairs_than_queue_size():
+    """Test a stream of more pairs than queue_size starts and keeps up"""
+    broadcaster = PriceBroadcaster(queue_size=2)
+    assets = [f"coin-{i}" for i in range(20)]
+    for asset in assets:
+        broadcaster.publish(update(1000, 1.0, asset))
+    subscription = broadcaster.subscribe([(asset, "usd") for asset in assets])
+
+    for asset in assets:
+        assert broadcaster.publish(update(2000, 2.0, asset)) == 1
+    assert broadcaster.info()["dropped"] == 0
+
+    stream = stream_events(broadcaster, subscription)
+    assert await stream.__anext__() == RETRY_EVENT
+    body = await stream.__anext__()
+    assert body.count(b"event: price") == 40
+    assert b"dropped" not in body
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_events_batches_queued_events():
+    """Test queued events go out in one write and quiet periods get keep-alives"""
+    broadcaster = PriceBroadcaster(queue_size=8)
+    subscription = broadcaster.subscribe([BTC_USD])
+    broadcaster.publish(update(1000, 50000.0))
+    broadcaster.publish(update(2000, 50100.0))
+
+    stream = stream_events(broadcaster, subscription, heartbeat=0.01)
+    assert await stream.__anext__() == RETRY_EVENT
+    assert (await stream.__anext__()).count(b"event: price") == 2
+    assert await stream.__anext__() == KEEP_ALIVE_EVENT
+    await stream.aclose()
+    assert broadcaster.info()["subscribers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_published_prices_reach_every_worker():
+    """Test prices published to Redis are fanned out by the listening broadcaster"""
+    broadcaster = PriceBroadcaster(queue_size=8)
+    subscription = broadcaster.subscribe([BTC_USD])
+    broadcaster.start()
+    try:
+        await asyncio.wait_for(broadcaster.subscribed.wait(), 5)
+        await publish_prices(
+            RedisCache(),
+            {BTC_USD: CurrentPriceResponse(price=50000.0, timestamp=1000)},
+        )
+        event = await asyncio.wait_for(subscription.queue.get(), 5)
+    finally:
+        await broadcaster.stop()
+
+    assert json.loads(event.split(b"data: ")[1]) == {
+        **update(1000, 50000.0),
+        "stale": False,
+    }
@@ -0,0 +1,158 @@
+import asyncio
+import httpx
+import pytest
+from app.core.exceptions import CoinGeckoAPIError, CoinGeckoRateLimitError
+from app.core.rate_limiter import Priority, RateGovernor, TokenBucket
+from app.services.coingecko_service import CoinGeckoService, parse_retry_after
+
+
+def make_service(responses, governor=None):
+    """CoinGeckoService answering from a list of (status, headers, json) tuples"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        status, headers, body = responses[len(requests) - 1]
+        return httpx.Response(status, headers=headers, json=body)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    governor = governor or RateGovernor(TokenBucket(rate=1000, capacity=100))
+    return CoinGeckoService(client=client, governor=governor), requests
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_burst():
+    """Test the bucket hands out capacity tokens, then asks callers to wait"""
+    bucket = TokenBucket(rate=1, capacity=2)
+
+    assert await bucket.try_acquire() == 0
+    assert await bucket.try_acquire() == 0
+    assert 0 < await bucket.try_acquire() <= 1
+
+    await bucket.block(5)
+    assert await bucket.try_acquire() > 4
+
+
+@pytest.mark.asyncio
+async def test_governor_serves_interactive_before_backfill():
+    """Test queued interactive requests get tokens ahead of backfill"""
+    governor = RateGovernor(TokenBucket(rate=20, capacity=1))
+    await governor.acquire(Priority.INTERACTIVE)
+    granted = []
+
+    async def acquire(priority):
+        await governor.acquire(priority)
+        granted.append(priority)
+
+    await asyncio.gather(
+        acquire(Priority.BACKFILL),
+        acquire(Priority.BACKFILL),
+        acquire(Priority.INTERACTIVE),
+    )
+
+    assert granted == [Priority.INTERACTIVE, Priority.BACKFILL, Priority.BACKFILL]
+
+
+@pytest.mark.asyncio
+async def test_governor_times_out():
+    """Test a waiter gives up after its timeout without consuming a token"""
+    governor = RateGovernor(TokenBucket(rate=1, capacity=1))
+    await governor.acquire()
+
+    with pytest.raises(CoinGeckoRateLimitError):
+        await governor.acquire(timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_request_retries_after_rate_limit():
+    """Test a 429 is retried once Retry-After has passed"""
+    service, requests = make_service(
+        [
+            (429, {"Retry-After": "0"}, {}),
+            (200, {}, {"bitcoin": {"usd": 1.0}}),
+        ]
+    )
+
+    assert await service.get_current_prices(["bitcoin"], ["usd"]) == {
+        "bitcoin": {"usd": 1.0}
+    }
+    assert len(requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_interactive_request_gives_up_on_long_retry_after():
+    """Test a long Retry-After fails at once but blocks every other caller"""
+    bucket = TokenBucket(rate=1000, capacity=100)
+    service, requests = make_service(
+        [(429, {"Retry-After": "120"}, {})], governor=RateGovernor(bucket)
+    )
+
+    with pytest.raises(CoinGeckoRateLimitError) as exc_info:
+        await service.get_current_prices(["bitcoin"], ["usd"])
+    assert exc_info.value.retry_after == 120
+    assert len(requests) == 1
+    assert await bucket.try_acquire() > 100
+
+
+@pytest.mark.asyncio
+async def test_interactive_wait_for_slot_is_bounded_by_budget(monkeypatch):
+    """Test waiting on an empty bucket gives up once the request budget is spent"""
+    monkeypatch.setattr(
+        "app.services.coingecko_service.settings.COINGECKO_INTERACTIVE_BUDGET", 0.1
+    )
+    governor = RateGovernor(TokenBucket(rate=0.01, capacity=1))
+    await governor.acquire()
+    service, requests = make_service([], governor=governor)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    with pytest.raises((CoinGeckoAPIError, CoinGeckoRateLimitError)):
+        await service.get_current_prices(["bitcoin"], ["usd"])
+    assert loop.time() - started < 0.5
+    assert requests == []
+
+
+@pytest.mark.asyncio
+async def test_interactive_request_keeps_connect_timeout(monkeypatch):
+    """Test the budget caps the request timeouts without losing the connect one"""
+    monkeypatch.setattr(
+        "app.services.coingecko_service.settings.COINGECKO_CONNECT_TIMEOUT", 1.0
+    )
+    service, requests = make_service([(200, {}, {})])
+
+    await service.get_current_prices(["bitcoin"], ["usd"])
+    timeout = requests[0].extensions["timeout"]
+    assert timeout["connect"] == 1.0
+    assert 1.0 < timeout["read"] <= 5.0
+
+
+@pytest.mark.asyncio
+async def test_request_retries_server_errors(monkeypatch):
+    """Test 5xx responses are retried up to COINGECKO_MAX_RETRIES"""
+    monkeypatch.setattr(
+        "app.services.coingecko_service.settings.COINGECKO_MAX_RETRIES", 2
+    )
+    monkeypatch.setattr("app.core.rate_limiter.settings.COINGECKO_BACKOFF_BASE", 0)
+    service, requests = make_service([(503, {}, {})] * 3)
+
+    with pytest.raises(CoinGeckoAPIError):
+        await service.get_current_prices(["bitcoin"], ["usd"])
+    assert len(requests) == 3
+
+
+@pytest.mark.asyncio
+async def test_request_does_not_retry_client_errors():
+    """Test a 4xx other than 429 fails immediately"""
+    service, requests = make_service([(404, {}, {})])
+
+    with pytest.raises(CoinGeckoAPIError):
+        await service.get_current_prices(["unknown"], ["usd"])
+    assert len(requests) == 1
+
+
+def test_parse_retry_after():
+    """Test Retry-After accepts seconds and HTTP dates"""
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
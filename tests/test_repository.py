@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import delete, select
+from app.db import models
+from app.db.repository import AsyncPriceRepository, rollup_interval
+from app.services.coverage import DAY_MS, HOUR_MS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_copy", [False, True])
+async def test_insert_price_points_skips_stored(test_db, use_copy):
+    """Test both ingest paths insert new points once and count only new rows"""
+    repository = AsyncPriceRepository(test_db)
+    await repository.insert_price_points([(1000, 1.0)], use_copy=use_copy)
+
+    inserted = await repository.insert_price_points(
+        [(1000, 9.0), (2000, 2.0), (3000, 3.0), (3000, 3.5)], use_copy=use_copy
+    )
+    # The same timestamps for another asset are a separate series
+    other = await repository.insert_price_points(
+        [(1000, 5.0)], asset="ethereum", use_copy=use_copy
+    )
+
+    assert inserted == 2
+    assert other == 1
+    stored = await repository.get_price_range(0, 5000)
+    assert [(p.timestamp, p.price) for p in stored] == [
+        (3000, 3.0),
+        (2000, 2.0),
+        (1000, 1.0),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_price_points_batch_without_read_back(test_db, monkeypatch):
+    """Test large batches go through COPY and read-back can be skipped"""
+    monkeypatch.setattr("app.db.repository.settings.INGEST_COPY_THRESHOLD", 10)
+    repository = AsyncPriceRepository(test_db)
+    points = [(ts, float(ts)) for ts in range(100)]
+
+    assert await repository.create_price_points_batch(points, return_rows=False) == []
+    assert len(await repository.create_price_points_batch(points)) == 100
+
+
+async def rollups(db, interval_ms):
+    result = await db.execute(
+        select(models.PriceCandle)
+        .where(models.PriceCandle.interval_ms == interval_ms)
+        .order_by(models.PriceCandle.timestamp)
+    )
+    return [
+        (c.timestamp, c.open, c.high, c.low, c.close, c.price_sum, c.count)
+        for c in result.scalars()
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_copy", [False, True])
+async def test_insert_price_points_updates_rollups(test_db, use_copy):
+    """Test each batch merges its new points into the 1m/1h/1d rollups"""
+    repository = AsyncPriceRepository(test_db)
+    minute = 60_000
+    await repository.insert_price_points(
+        [(10_000, 5.0), (30_000, 7.0), (minute, 1.0)], use_copy=use_copy
+    )
+    # Earlier and later points than stored ones, plus an already stored one
+    await repository.insert_price_points(
+        [(0, 6.0), (50_000, 2.0), (30_000, 100.0)], use_copy=use_copy
+    )
+    await repository.create_price_point(HOUR_MS, 3.0)
+
+    assert await rollups(test_db, minute) == [
+        (0, 6.0, 7.0, 2.0, 2.0, 20.0, 4),
+        (minute, 1.0, 1.0, 1.0, 1.0, 1.0, 1),
+        (HOUR_MS, 3.0, 3.0, 3.0, 3.0, 3.0, 1),
+    ]
+    assert await rollups(test_db, HOUR_MS) == [
+        (0, 6.0, 7.0, 1.0, 1.0, 21.0, 5),
+        (HOUR_MS, 3.0, 3.0, 3.0, 3.0, 3.0, 1),
+    ]
+    assert await rollups(test_db, DAY_MS) == [(0, 6.0, 7.0, 1.0, 3.0, 24.0, 6)]
+
+
+@pytest.mark.asyncio
+async def test_get_price_candles_reads_rollups_when_aligned(test_db):
+    """Test aligned ranges are served from rollups with the same candles as raw"""
+    repository = AsyncPriceRepository(test_db)
+    points = [(ts, float(ts % 7)) for ts in range(0, 3 * DAY_MS, 17 * 60_000)]
+    await repository.insert_price_points(points)
+
+    assert rollup_interval(4 * HOUR_MS, 0, 3 * DAY_MS - 1) == HOUR_MS
+    assert rollup_interval(7 * DAY_MS, 0, 7 * DAY_MS - 1) == DAY_MS
+    assert rollup_interval(4 * HOUR_MS, 1, 3 * DAY_MS - 1) is None
+
+    candles = await repository.get_price_candles(0, 3 * DAY_MS - 1, 4 * HOUR_MS)
+    raw = await repository.get_price_candles(0, 3 * DAY_MS - 2, 4 * HOUR_MS)
+    assert len(candles) == 18
+    assert [tuple(c) for c in candles] == pytest.approx([tuple(c) for c in raw])
+
+    # Without raw points only the rollup path still has candles
+    await test_db.execute(delete(models.CurrentPrice))
+    assert len(await repository.get_price_candles(0, 3 * DAY_MS - 1, DAY_MS)) == 3
+    assert await repository.get_price_candles(0, 3 * DAY_MS - 2, DAY_MS) == []
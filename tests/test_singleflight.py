@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from app.cache.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_fetch():
+    """Test concurrent calls for one key run the fetch once"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+
+    assert calls == 1
+    assert results == [1] * 10
+    assert not flight.in_flight("key")
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_cached():
+    """Test waiters all see the error and the next call fetches again"""
+    flight = SingleFlight()
+
+    async def failing_fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        *(flight.do("key", failing_fetch) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def fetch():
+        return "ok"
+
+    assert await flight.do("key", fetch) == "ok"
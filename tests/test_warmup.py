@@ -0,0 +1,32 @@
+import pytest
+from app.services import warmup
+
+
+@pytest.mark.asyncio
+async def test_prime_current_prices(session_factory, mock_redis, mock_coingecko):
+    """Test warm-up reads every tracked pair, fetching what is not cached"""
+    assert await warmup.prime_current_prices(session_factory) == 1
+
+
+@pytest.mark.asyncio
+async def test_warm_up_failures_do_not_stop_startup(
+    session_factory, mock_redis, mock_coingecko, monkeypatch, caplog
+):
+    """Test an unreachable dependency is logged and the other steps still run"""
+    primed = []
+
+    async def unreachable(connections: int) -> None:
+        raise ConnectionError("unreachable")
+
+    async def prime(factory) -> int:
+        primed.append(factory)
+        return 1
+
+    monkeypatch.setattr(warmup, "connect_database", unreachable)
+    monkeypatch.setattr(warmup, "connect_redis", unreachable)
+    monkeypatch.setattr(warmup, "prime_current_prices", prime)
+
+    await warmup.warm_up(session_factory)
+    assert primed == [session_factory]
+    assert "Warm-up of database failed: unreachable" in caplog.text
+    assert "Warm-up of redis failed: unreachable" in caplog.text